@@ -15,6 +15,11 @@ import sys
 from fiscalberry.common.fiscalberry_logger import getLogger
 logger = getLogger("AndroidService")
 
+from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+
+# Antes de que el servicio importe escpos: cargar solo los perfiles de impresora en uso
+prepare_escpos_capabilities()
+
 from fiscalberry.common.service_controller import ServiceController
 from fiscalberry.common.Configberry import Configberry
 
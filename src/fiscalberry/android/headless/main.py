@@ -18,6 +18,11 @@ setup_crash_reporting()
 
 # Import from common (REUTILIZADO de desktop)
 from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+
+# Antes de que el servicio importe escpos: cargar solo los perfiles de impresora en uso
+prepare_escpos_capabilities()
+
 from fiscalberry.common.service_controller import ServiceController
 from fiscalberry.common.Configberry import Configberry
 from fiscalberry.common.discover import send_discover
@@ -112,6 +112,10 @@ def main():
     
     # Verificar si el comercio está adoptado
     configberry = Configberry()
+
+    # Antes de que algo importe escpos: cargar solo los perfiles de impresora en uso
+    from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+    prepare_escpos_capabilities()
     
     if not configberry.is_comercio_adoptado():
         uuid_value = configberry.get("SERVIDOR", "uuid", fallback="")
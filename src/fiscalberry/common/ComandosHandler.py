@@ -5,18 +5,35 @@ import json
 import threading
 import time
 import queue
+import concurrent.futures
+import copy
+from collections import OrderedDict
 from fiscalberry.common.FiscalberryComandos import FiscalberryComandos
 from fiscalberry.common.Configberry import Configberry
 from fiscalberry.common.fiscalberry_logger import getLogger
-from fiscalberry.common.EscPComandos import EscPComandos
 from fiscalberry.common.rabbitmq.error_publisher import publish_error
 from fiscalberry.common.printer_error_detector import PrinterErrorDetector, analyze_printer_response
-from escpos import printer
-from queue import Queue
+from fiscalberry.common.print_scheduler import (PrintScheduler, PrintJob, DEFAULT_AGING, DEFAULT_PARK_TIMEOUT,
+                                               DEFAULT_PREPARE_WORKERS, DEFAULT_WORKER_IDLE_TIMEOUT, lane_key)
+from fiscalberry.common.printer_spec import get_printer_specs, PrinterSpecError
+from fiscalberry.common.printer_groups import PrinterGroupDispatcher
+from fiscalberry.common.printer_failover import failover_cause, FailoverError
+from fiscalberry.common.print_spool import get_print_spool, DEFAULT_MAX_AGE
+from fiscalberry.common.job_dedup import get_job_dedup, job_key
+from fiscalberry.common.express_commands import is_express, run_express, NON_ACTION_KEYS
+from fiscalberry.common.circuit_breaker import get_circuit_breakers, CircuitOpenError
+from fiscalberry.common.printer_error_detector import PrinterErrorType
+from fiscalberry.common.printer_health import get_printer_health, ONLINE
+from fiscalberry.common.station_router import get_station_router
+from fiscalberry.common.print_pipeline import (DriverError, BatchError, render_ticket, transmit, printer_session,
+                                               batch_documents, render_batch, transmit_batch, SharedRender)
 import traceback
 
 configberry = Configberry()
 
+# Specs de impresoras compiladas al cargar config.ini
+printer_specs = get_printer_specs()
+
 
 logger = getLogger()
 
@@ -39,23 +56,49 @@ def set_interval(func, sec):
     return t
 
 
-class DriverError(Exception):
+class TraductorException(Exception):
     pass
 
 
-class TraductorException(Exception):
-    pass
+# Capacidad total de trabajos pendientes (sumando todas las impresoras)
+MAX_QUEUED_JOBS = 500
+
+# Pool adaptativo de workers (SERVIDOR.min_workers / max_workers): crece cuando
+# hay impresoras esperando y todos los workers están transmitiendo, y se achica
+# cuando sobran workers sin trabajo por SERVIDOR.worker_idle_timeout segundos
+DEFAULT_MIN_WORKERS = 1
+DEFAULT_MAX_WORKERS = 8
+
+# Umbral de tiempo para considerar una comanda como trabada
+STUCK_JOB_THRESHOLD = 30.0  # 30 segundos
+
+# Tiempo máximo que send_command (API bloqueante) espera la impresión
+PRINT_TIMEOUT = 30
+
+# Vencimiento por defecto de un trabajo encolado (segundos, SERVIDOR.job_ttl).
+# Un trabajo que no empezó a imprimirse en ese tiempo se descarta.
+DEFAULT_JOB_TTL = 300
 
+# Spool persistente: los trabajos aceptados sobreviven a reinicios y caídas
+# (se abre en start_print_service; None si está deshabilitado)
+print_spool = None
+
+# Trabajos recientes: los duplicados reciben el resultado del original
+job_dedup = get_job_dedup()
+
+# Un circuit breaker por impresora: si no responde, los trabajos fallan en el acto
+circuit_breakers = get_circuit_breakers()
+
+# Estado de las impresoras verificado en segundo plano (getStatus, getPrinterInfo)
+printer_health = get_printer_health()
+
+# Tipos de error que cuentan como impresora inaccesible para el circuit breaker
+CONNECTION_ERROR_TYPES = {PrinterErrorType.COMMUNICATION_ERROR, PrinterErrorType.OFFLINE}
 
-# Cola de trabajos de impresión optimizada - mayor capacidad y procesamiento más rápido  
-print_queue = Queue(maxsize=500)  # Aumentar capacidad para mayor throughput
 
-# Worker threads pool para procesamiento paralelo
-worker_threads = []
-MAX_WORKERS = 3  # Número de workers concurrentes
 def report_queue_status():
     """Monitorea el estado de la cola y alerta sobre problemas de acumulación"""
-    qsize = print_queue.qsize()
+    qsize = print_scheduler.qsize()
     
     # Alertar sobre cola ocupada (más de 50 comandas)
     if qsize > 50:
@@ -67,12 +110,13 @@ def report_queue_status():
             # Publicar alerta crítica de cola sobrecargada
             publish_error(
                 error_type="QUEUE_OVERLOADED",
-                error_message=f"Print queue has {qsize} pending jobs (capacity: 500)",
+                error_message=f"Print queue has {qsize} pending jobs (capacity: {MAX_QUEUED_JOBS})",
                 context={
                     "queue_size": qsize,
-                    "max_capacity": 500,
-                    "utilization_percent": (qsize / 500) * 100,
-                    "active_workers": MAX_WORKERS
+                    "max_capacity": MAX_QUEUED_JOBS,
+                    "utilization_percent": (qsize / MAX_QUEUED_JOBS) * 100,
+                    "workers": print_scheduler.pool_status(),
+                    "printers": print_scheduler.lanes_status()
                 }
             )
         
@@ -85,126 +129,338 @@ def report_queue_status():
                 error_message=f"Print queue critically overloaded with {qsize} jobs",
                 context={
                     "queue_size": qsize,
-                    "max_capacity": 500,
-                    "utilization_percent": (qsize / 500) * 100,
+                    "max_capacity": MAX_QUEUED_JOBS,
+                    "utilization_percent": (qsize / MAX_QUEUED_JOBS) * 100,
                     "warning": "Queue may start rejecting new jobs soon"
                 }
             )
     
     threading.Timer(30.0, report_queue_status).start()  # Reportar cada 30 segundos
 
-def process_print_jobs(worker_id=0):
-    """Worker optimizado para procesar trabajos de impresión con detección de comandas trabadas"""
+def process_print_job(job: PrintJob, worker_id=0):
+    """Procesa un trabajo de impresión de la cola de su impresora con detección de comandas trabadas"""
 
-    
-    # Umbral de tiempo para considerar una comanda como trabada
-    STUCK_JOB_THRESHOLD = 30.0  # 30 segundos
-    
-    while True:
-        try:
-            # Obtener trabajo con timeout para permitir shutdown limpio
-            job_data = print_queue.get(timeout=1.0)
-            if job_data is None:
-                logger.info(f"Worker {worker_id} received shutdown signal")
-                break
-            
-            jsonTicket, q = job_data
-            printer_name = jsonTicket.get('printerName', 'unknown')
+    jsonTicket = job.ticket
+    printer_name = job.lane_key
+
+    if job.cancelled:
+        job.reply({"success": False, "error": "Trabajo cancelado", "cancelled": True, "processing_time": 0})
+        return False
+
+    start_time = time.time()
+    try:
+        result = runTraductor(jsonTicket, job)
+        if isinstance(result, PrintJob):
+            # desviado a la impresora de respaldo: responde cuando ella lo imprima
+            return True
+        processing_time = time.time() - start_time
+        
+        # Respuesta optimizada sin nested dicts innecesarios
+        job.reply({"success": True, "result": result, "processing_time": processing_time})
+        
+        # Detectar trabajos lentos (pueden indicar problemas)
+        if processing_time > 5.0:
+            logger.warning(f"Slow print job completed in {processing_time:.2f}s by worker {worker_id} for printer '{printer_name}'")
             
-            start_time = time.time()
-            try:
-                result = runTraductor(jsonTicket, q)
-                processing_time = time.time() - start_time
-                
-                # Respuesta optimizada sin nested dicts innecesarios
-                q.put({"success": True, "result": result, "processing_time": processing_time})
-                
-                # Detectar trabajos lentos (pueden indicar problemas)
-                if processing_time > 5.0:
-                    logger.warning(f"Slow print job completed in {processing_time:.2f}s by worker {worker_id} for printer '{printer_name}'")
-                    
-                    # Alertar si el trabajo está cerca de trabarse
-                    if processing_time > 15.0:
-                        publish_error(
-                            error_type="SLOW_PRINT_JOB",
-                            error_message=f"Print job took {processing_time:.2f}s to complete",
-                            context={
-                                "worker_id": worker_id,
-                                "printer_name": printer_name,
-                                "processing_time": processing_time,
-                                "queue_size": print_queue.qsize()
-                            }
-                        )
-                
-                # Detectar comandas trabadas (timeout excedido)
-                elif processing_time > STUCK_JOB_THRESHOLD:
-                    logger.error(f"STUCK JOB DETECTED: Print job took {processing_time:.2f}s (threshold: {STUCK_JOB_THRESHOLD}s)")
-                    
-                    publish_error(
-                        error_type="STUCK_PRINT_JOB",
-                        error_message=f"Print job got stuck for {processing_time:.2f}s",
-                        context={
-                            "worker_id": worker_id,
-                            "printer_name": printer_name,
-                            "processing_time": processing_time,
-                            "threshold": STUCK_JOB_THRESHOLD,
-                            "queue_size": print_queue.qsize()
-                        }
-                    )
-                    
-            except Exception as e:
-                processing_time = time.time() - start_time
-                error_msg = str(e)
-                logger.error(f"Worker {worker_id} print job failed in {processing_time:.2f}s: {error_msg}")
-                
-                # Publicar error de trabajo fallido
+            # Alertar si el trabajo está cerca de trabarse
+            if processing_time > 15.0:
                 publish_error(
-                    error_type="PRINT_JOB_FAILED",
-                    error_message=f"Print job failed: {error_msg}",
+                    error_type="SLOW_PRINT_JOB",
+                    error_message=f"Print job took {processing_time:.2f}s to complete",
                     context={
                         "worker_id": worker_id,
                         "printer_name": printer_name,
                         "processing_time": processing_time,
-                        "error": error_msg
-                    },
-                    exception=e
+                        "queue_size": print_scheduler.qsize()
+                    }
                 )
-                
-                q.put({"success": False, "error": error_msg, "processing_time": processing_time})
-
-            print_queue.task_done()
+        return True
+
+    except CircuitOpenError as e:
+        # ya se alertó al abrirse el circuito, no publicar un error por trabajo
+        logger.warning(f"Worker {worker_id}: {e}")
+        job.reply({"success": False, "error": str(e), "processing_time": time.time() - start_time})
+        return False
+
+    except JobDroppedError as e:
+        logger.warning(f"Worker {worker_id}: {e}")
+        job.reply({"success": False, "error": str(e), "expired": job.expired(), "cancelled": job.cancelled,
+                   "processing_time": time.time() - start_time})
+        return False
             
-        except queue.Empty:
-            # Timeout normal, continuar loop
-            continue
-        except Exception as e:
-            logger.error(f"Worker {worker_id} unexpected error: {e}")
-            
-            publish_error(
-                error_type="WORKER_CRITICAL_ERROR",
-                error_message=f"Worker {worker_id} encountered critical error",
-                context={"worker_id": worker_id},
-                exception=e
-            )
-            continue
+    except Exception as e:
+        processing_time = time.time() - start_time
+        error_msg = str(e)
+        logger.error(f"Worker {worker_id} print job failed in {processing_time:.2f}s: {error_msg}")
+        
+        # Publicar error de trabajo fallido
+        publish_error(
+            error_type="PRINT_JOB_FAILED",
+            error_message=f"Print job failed: {error_msg}",
+            context={
+                "worker_id": worker_id,
+                "printer_name": printer_name,
+                "processing_time": processing_time,
+                "error": error_msg
+            },
+            exception=e
+        )
+        
+        reply = {"success": False, "error": error_msg, "processing_time": processing_time}
+        if isinstance(e, BatchError):
+            # lote: qué documentos se llegaron a imprimir
+            reply["result"] = e.results
+        job.reply(reply)
+        return False
+
+
+def report_stuck_job(job: PrintJob, elapsed):
+    """Watchdog: el trabajo sigue imprimiéndose después de STUCK_JOB_THRESHOLD."""
+    publish_error(
+        error_type="STUCK_PRINT_JOB",
+        error_message=f"Print job stuck for {elapsed:.2f}s and still running",
+        context={
+            "job_id": job.job_id,
+            "printer_name": job.lane_key,
+            "processing_time": elapsed,
+            "threshold": STUCK_JOB_THRESHOLD,
+            "queue_size": print_scheduler.qsize()
+        }
+    )
+
+
+def job_deadline(jsonTicket):
+    """Vencimiento de un trabajo: clave "ttl" del mensaje o SERVIDOR.job_ttl (0 = sin vencimiento)."""
+    ttl = jsonTicket.get("ttl")
+    if ttl is None:
+        ttl = configberry.get("SERVIDOR", "job_ttl", fallback=DEFAULT_JOB_TTL)
+    try:
+        ttl = float(ttl)
+    except (TypeError, ValueError):
+        logger.warning(f"ttl inválido {ttl!r}, usando {DEFAULT_JOB_TTL}s")
+        ttl = DEFAULT_JOB_TTL
+    return time.time() + ttl if ttl > 0 else None
+
+
+def spool_ticket(jsonTicket):
+    """
+    Ticket a guardar en el spool, o None si no se guarda.
+
+    Los comandos de control no se guardan: un cajón no debe abrirse solo al
+    reiniciar. De un lote se guardan solo sus documentos imprimibles.
+    """
+    if "batch" not in jsonTicket:
+        return None if is_express(jsonTicket) else jsonTicket
+    documents = [document for document in jsonTicket["batch"] if not is_express(document)]
+    return dict(jsonTicket, batch=documents) if documents else None
+
+
+def track_in_spool(job: PrintJob):
+    """Marca el trabajo como terminado en el spool cuando se resuelve (impreso, fallido, vencido o cancelado)."""
+    if print_spool and job.spool_seq is not None:
+        job.future.add_done_callback(lambda f: print_spool.complete(job.spool_seq))
+
+
+def printer_concurrency(printerName):
+    """Cantidad de trabajos simultáneos permitidos para una impresora (clave 'concurrency' en su sección)."""
+    try:
+        return printer_specs.get(printerName).concurrency
+    except Exception:
+        # impresora inexistente o mal configurada: runTraductor reporta el error
+        return 1
+
+
+def priority_aging():
+    """Segundos de espera para que un trabajo suba un nivel de prioridad (SERVIDOR.priority_aging)."""
+    try:
+        return float(configberry.get("SERVIDOR", "priority_aging", fallback=DEFAULT_AGING))
+    except ValueError:
+        logger.warning(f"priority_aging inválido, usando {DEFAULT_AGING}s")
+        return DEFAULT_AGING
+
+
+def park_timeout():
+    """Segundos que un trabajo espera a una impresora caída antes de responder (SERVIDOR.parked_job_timeout)."""
+    try:
+        return float(configberry.get("SERVIDOR", "parked_job_timeout", fallback=DEFAULT_PARK_TIMEOUT))
+    except ValueError:
+        logger.warning(f"parked_job_timeout inválido, usando {DEFAULT_PARK_TIMEOUT}s")
+        return DEFAULT_PARK_TIMEOUT
+
+
+def on_printer_health(name, health):
+    """Cuando una impresora vuelve, despachar los trabajos que la esperaban."""
+    if health.status == ONLINE:
+        print_scheduler.resume()
+
 
-# Iniciar workers optimizados
-for i in range(MAX_WORKERS):
-    worker = threading.Thread(target=process_print_jobs, args=(i,), daemon=True)
-    worker.start()
-    worker_threads.append(worker)
+def prepare_workers():
+    """Threads que renderizan por adelantado el próximo trabajo de cada impresora (SERVIDOR.prepare_workers, 0 desactiva)."""
+    try:
+        return int(configberry.get("SERVIDOR", "prepare_workers", fallback=DEFAULT_PREPARE_WORKERS))
+    except ValueError:
+        logger.warning(f"prepare_workers inválido, usando {DEFAULT_PREPARE_WORKERS}")
+        return DEFAULT_PREPARE_WORKERS
+
+
+def has_offline_backup(printerName):
+    """La impresora tiene una impresora de respaldo para cuando está fuera de línea."""
+    try:
+        spec = printer_specs.get(printerName)
+    except Exception:
+        return False
+    return spec.backup is not None and "offline" in spec.failover_on
+
+
+def worker_pool_bounds():
+    """Límites del pool de workers: (SERVIDOR.min_workers, SERVIDOR.max_workers, SERVIDOR.worker_idle_timeout)."""
+    try:
+        min_workers = int(configberry.get("SERVIDOR", "min_workers", fallback=DEFAULT_MIN_WORKERS))
+        max_workers = int(configberry.get("SERVIDOR", "max_workers", fallback=DEFAULT_MAX_WORKERS))
+        idle_timeout = float(configberry.get("SERVIDOR", "worker_idle_timeout", fallback=DEFAULT_WORKER_IDLE_TIMEOUT))
+    except ValueError:
+        logger.warning(f"Límites del pool de workers inválidos, usando {DEFAULT_MIN_WORKERS}-{DEFAULT_MAX_WORKERS}")
+        return DEFAULT_MIN_WORKERS, DEFAULT_MAX_WORKERS, DEFAULT_WORKER_IDLE_TIMEOUT
+    return max(0, min_workers), max(1, min_workers, max_workers), idle_timeout
+
+
+def prerender_job(job: PrintJob):
+    """
+    Renderiza un trabajo encolado mientras su impresora imprime el anterior.
+
+    Trabaja sobre una copia de las acciones, sin modificar job.ticket.
+
+    Returns:
+        RenderedTicket (lista de render_batch en un lote), o None si el trabajo
+        no se renderiza (comandos de control o impresora Fiscalberry remota)
+    """
+    if is_express(job.ticket):
+        return None
+    spec = printer_specs.get(job.printer_name)
+    if spec.driver_name == "Fiscalberry":
+        return None
+    if "batch" in job.ticket:
+        return render_batch(spec, batch_documents(job.ticket), job.ticket.get("cut") == "single")
+    if job.shared_render is not None:
+        return job.shared_render.get(spec)
+    actions = {key: value for key, value in job.ticket.items() if key not in NON_ACTION_KEYS}
+    return render_ticket(spec, actions)
+
+
+def take_prerendered(job: PrintJob):
+    """
+    Resultado del render adelantado de un trabajo, esperándolo si está en curso.
+
+    Returns:
+        RenderedTicket, o None si no se adelantó, todavía no había empezado
+        (se cancela y se renderiza en el worker) o falló
+    """
+    prepared = job.prepared if job is not None else None
+    if prepared is None or prepared.cancel():
+        return None
+    try:
+        return prepared.result()
+    except Exception as e:
+        logger.warning(f"Render adelantado del trabajo {job.job_id} falló, se renderiza de nuevo: {e}")
+        return None
+
+
+# Planificador con una cola por impresora (por prioridad) y workers compartidos
+min_workers, max_workers, worker_idle_timeout = worker_pool_bounds()
+print_scheduler = PrintScheduler(
+    handler=process_print_job,
+    min_workers=min_workers,
+    max_workers=max_workers,
+    idle_timeout=worker_idle_timeout,
+    max_jobs=MAX_QUEUED_JOBS,
+    concurrency_for=printer_concurrency,
+    aging=priority_aging(),
+    stuck_after=STUCK_JOB_THRESHOLD,
+    on_stuck=report_stuck_job,
+    # no despachar a impresoras caídas: sus trabajos esperan a que vuelvan
+    # (salvo que tengan respaldo para ese caso: se despachan y se desvían)
+    available=lambda key: not printer_health.is_down(key) or has_offline_backup(key),
+    park_timeout=park_timeout(),
+    # doble buffer: renderizar el próximo trabajo mientras se transmite el actual
+    prepare=prerender_job,
+    prepare_workers=prepare_workers(),
+)
+
+_start_lock = threading.Lock()
+_started = False
+
+
+def member_available(printerName):
+    """Una impresora de un grupo puede recibir trabajos: no está caída ni con el circuito abierto."""
+    return not printer_health.is_down(printerName) and circuit_breakers.get(printerName).retry_after() == 0
+
+
+def printer_group(printerName):
+    """Spec del grupo si printerName es un grupo de impresoras (driver Group), si no None."""
+    if not isinstance(printerName, str):
+        return None
+    try:
+        spec = printer_specs.get(printerName)
+    except Exception:
+        # impresora inexistente o mal configurada: runTraductor reporta el error
+        return None
+    return spec if spec.driver_name == "Group" else None
+
+
+# Grupos de impresoras: cada trabajo va a la impresora del grupo con menos espera
+printer_groups = PrinterGroupDispatcher(printer_specs, load=print_scheduler.load, available=member_available)
+
+def start_print_service():
+    """
+    Compila las impresoras, abre el spool, inicia los workers, reencola lo que
+    quedó sin imprimir e inicia el informe periódico de la cola.
+
+    Lo llama ServiceController al iniciar el servicio: importar este módulo
+    no inicia threads ni abre el spool. Las llamadas siguientes no hacen nada.
+    """
+    global _started, print_spool
+    with _start_lock:
+        if _started:
+            return
+        _started = True
+
+        # los errores de configuración se reportan al iniciar, no en el primer ticket
+        printer_specs.all()
+
+        print_spool = get_print_spool()
 
-# Iniciar el informe periódico
-report_queue_status()
+        # Iniciar workers optimizados
+        print_scheduler.start()
 
+        # Reencolar lo que quedó sin imprimir en el último cierre
+        replay_spooled_jobs()
 
+        printer_health.add_listener(on_printer_health)
+        printer_health.start()
 
+        # Iniciar el informe periódico
+        report_queue_status()
+
+
+
+
+
+class JobDroppedError(Exception):
+    """El trabajo venció o se canceló mientras se renderizaba."""
+    pass
+
+
+def runTraductor(jsonTicket, job=None):
+    # antes de tocar el ticket: el render adelantado lo puede estar leyendo
+    prerendered = take_prerendered(job)
 
-def runTraductor(jsonTicket, queue):
     printerName = jsonTicket.pop('printerName')
+    # prioridad y vencimiento ya se usaron al encolar, no son acciones de impresión
+    jsonTicket.pop('priority', None)
+    jsonTicket.pop('ttl', None)
 
     try:
-        dictSectionConf = configberry.get_config_for_printer(printerName)
+        spec = printer_specs.get(printerName)
     except KeyError as e:
         error_msg = f"Printer not found in configuration: '{printerName}'"
         logger.error(error_msg)
@@ -239,125 +495,83 @@ def runTraductor(jsonTicket, queue):
         return {"error": f"Error de configuración: {str(e)}"}
 
 
-    driverName = dictSectionConf.pop("driver", "Dummy")
-    driverName = driverName.lower()
+    driverName = spec.driver_name
 
-    driverOps = dictSectionConf
-
-    if driverName == "Fiscalberry".lower():
+    if driverName == "Fiscalberry":
         try:
             comando = FiscalberryComandos()
-            host = driverOps.get('host', 'localhost')
-            printerName = driverOps.get('printerName', printerName)
+            host = spec.driver_ops.get('host', 'localhost')
+            printerName = spec.driver_ops.get('printerName', printerName)
             jsonTicket['printerName'] = printerName
-            result = comando.run(host, jsonTicket)
-            return queue.put(result)
+            return comando.run(host, jsonTicket)
         except Exception as e:
             logger.error(f"Error FiscalberryComandos: {e}")
-            return queue.put({"error": f"Error en FiscalberryComandos: {str(e)}"})
-
-    if driverName == "Win32Raw".lower():
-        driverName = "Win32Raw"
-        driver = printer.Win32Raw
-
-        if not driver.is_usable():
-            raise DriverError(f"Driver {driverName} no disponible")
-
-
-    elif driverName == "Usb".lower():
-        driverName = "Usb"
-
-        # convertir de string eJ: 0x82 a int
-        if 'out_ep' in driverOps:
-            driverOps['out_ep'] = int(driverOps['out_ep'], 16)
-
-        if 'in_ep' in driverOps:
-            driverOps['in_ep'] = int(driverOps['in_ep'], 16)
-
-        driverOps['idProduct'] = int(driverOps['idProduct'], 16)
-        driverOps['idVendor'] = int(driverOps['idVendor'], 16)
-
-
-    elif driverName == "Network".lower():
-        # printer.Network(host='', port=9100, timeout=60, *args, **kwargs)[source]
-        if 'port' in driverOps:
-            driverOps['port'] = int(driverOps['port'])
-        driverName = "Network"
-
-    elif driverName == "Serial".lower():
-        # printer.Serial(devfile='', baudrate=9600, bytesize=8, timeout=1, parity=None, stopbits=None, xonxoff=False, dsrdtr=True, *args, **kwargs)
-        driverName = "Serial"
-
-    elif driverName == "Bluetooth".lower():
-        # Bluetooth printer for Android
-        # BluetoothPrinter(mac_address='XX:XX:XX:XX:XX:XX', timeout=10)
-
-        
-        # Validar MAC address
-        if 'mac_address' not in driverOps and 'macAddress' not in driverOps:
-            raise DriverError("MAC address requerida para Bluetooth: use 'mac_address' en config")
-        
-        # Normalizar nombre de parámetro
-        if 'macAddress' in driverOps:
-            driverOps['mac_address'] = driverOps.pop('macAddress')
-        
-        # Importar driver Bluetooth custom
-        from fiscalberry.common.bluetooth_printer import BluetoothPrinter
-        driver_class = BluetoothPrinter
-        driverName = "Bluetooth"
-
-    elif driverName == "File".lower():
-        # (devfile='', auto_flush=True
-        # printer.File(devfile='', auto_flush=True, *args, **kwargs)[source]
-        driverName = "File"
-
-    elif driverName == "Dummy".lower():
-        # printer.Dummy(*args, **kwargs)[source]
-        driverName = "Dummy"
-
-
-    elif driverName == "Cups".lower():
-        # printer.CupsPrinter(printer_name='', *args, **kwargs)[source]
-        driverName = "CupsPrinter"
-
-
-    elif driverName == "LP".lower():
-        # printer.LP(printer_name='', *args, **kwargs)[source]
-        driverName = "LP"
-
-
-    else:
-        raise DriverError(f"Invalid driver: {driver}")
-    
-    # Manejar drivers custom (ej: Bluetooth) que ya tienen driver_class asignado
-    if driverName == "Bluetooth":
-        # Ya está configurado arriba con BluetoothPrinter
-        pass
-    else:
-        try:
-            driver_class = getattr(printer, driverName)
-            if not callable(driver_class):
-                raise DriverError(f"Driver {driverName} is not callable")
-        except AttributeError:
-            raise DriverError(f"Driver {driverName} not found in printer module")
-        except Exception as e:
-            raise DriverError(f"Error loading driver {driverName}: {e}")
-
-    # Extraer columns antes de crear el driver (no es un parámetro del driver)
-    columns = driverOps.pop('columns', None)
-    
+            return {"error": f"Error en FiscalberryComandos: {str(e)}"}
+
+    batch = "batch" in jsonTicket
+    express = not batch and is_express(jsonTicket)
+    rerouted = job.rerouted if job is not None else None
+    # ticket intacto para renderizarlo de nuevo en la impresora de respaldo
+    # (los lotes, los comandos de control y los trabajos ya desviados no se desvían)
+    failover_ticket = (copy.deepcopy(jsonTicket) if spec.backup and rerouted is None and not batch and not express
+                       else None)
+    rendered = None
+    if not express:
+        # Etapa 1: renderizar a bytes sin ocupar la conexión (si no se hizo por adelantado)
+        if batch:
+            documents = batch_documents(jsonTicket)
+            single_cut = jsonTicket.get("cut") == "single"
+            rendered = prerendered if prerendered is not None else render_batch(spec, documents, single_cut)
+        elif prerendered is not None:
+            rendered = prerendered
+        elif job is not None and job.shared_render is not None:
+            # fan-out: otro destino con el mismo formato ya lo renderizó (o lo está haciendo)
+            rendered = job.shared_render.get(spec)
+        else:
+            rendered = render_ticket(spec, jsonTicket)
+        if job is not None and (job.cancelled or job.expired()):
+            raise JobDroppedError(f"Trabajo {job.job_id} para '{printerName}' "
+                                  f"{'cancelado' if job.cancelled else 'vencido'} antes de transmitirse")
+
+    if failover_ticket is not None:
+        # sin papel, tapa abierta o caída según la última verificación: directo al respaldo
+        problem = printer_health.problem(lane_key(printerName))
+        if problem in spec.failover_on:
+            return run_failover(spec, failover_ticket, rendered, problem, f"Impresora con {problem}", job)
+
+    # Falla en el acto si la impresora viene fallando (lanza CircuitOpenError)
+    breaker = circuit_breakers.get(lane_key(printerName))
     try:
-        driver = driver_class(**driverOps)
-    except Exception as e:
-        raise DriverError(f"Error creando driver {driverName}: {e}")
+        breaker.check()
+    except CircuitOpenError as e:
+        if failover_ticket is not None and "offline" in spec.failover_on:
+            return run_failover(spec, failover_ticket, rendered, "offline", e, job)
+        raise
 
     try:
-        comando = EscPComandos(driver, columns=columns)
-        result = comando.run(jsonTicket)
+        if job is not None:
+            job.transmit_started = time.time()
+        if batch:
+            # Lote: todos los documentos en una sola sesión, resultado por documento
+            result = transmit_batch(spec, documents, rendered, single_cut)
+        elif express:
+            # Cajón, buzzer y estado: bytes precodificados, sin renderizar
+            result = run_express_ticket(spec, jsonTicket)
+        else:
+            # Etapa 2: transmitir el buffer en una sola escritura
+            transmit(spec, rendered.data)
+            result = rendered.result
+        if job is not None:
+            job.transmit_finished = time.time()
         
+        breaker.record_success()
+        printer_health.report(lane_key(printerName), True)
         analyze_printer_response(result, printerName)
         
-        return {"message": "Impresión exitosa", "result": result}
+        response = {"message": "Impresión exitosa", "result": result}
+        if rerouted is not None:
+            response["rerouted"] = rerouted
+        return response
     except Exception as e:
         error_msg = f"Print error: {str(e)}"
         logging.error(error_msg)
@@ -369,23 +583,246 @@ def runTraductor(jsonTicket, queue):
             context={
                 "printer_name": printerName,
                 "driver": driverName,
-                "driver_ops": driverOps,
+                "driver_ops": dict(spec.driver_ops),
                 "command": jsonTicket
             }
         )
+
+        cause = e.cause if isinstance(e, BatchError) else e
+        if isinstance(cause, (DriverError, OSError)) or error_type in CONNECTION_ERROR_TYPES:
+            breaker.record_failure(e)
+            printer_health.report(lane_key(printerName), False, e)
+        else:
+            # la impresora respondió; el error es del contenido del ticket
+            breaker.record_success()
+
+        reason = failover_cause(error_type, isinstance(cause, (DriverError, OSError)))
+        if failover_ticket is not None and reason in spec.failover_on:
+            return run_failover(spec, failover_ticket, rendered, reason, e, job)
         
         raise e
 
 
 
+def run_express_ticket(spec, jsonTicket):
+    """Envía comandos de control (openDrawer, buzzer, getStatus) directo por la conexión."""
+    with printer_session(spec) as driver:
+        return run_express(driver, jsonTicket)
+
+
+def run_failover(spec, jsonTicket, rendered, reason, error, job=None):
+    """
+    Manda a la impresora de respaldo un ticket que no se pudo imprimir en la suya.
+
+    Un trabajo del planificador se encola en la impresora de respaldo, así
+    respeta su límite de concurrencia, y se responde cuando ella lo imprime.
+    Sin trabajo se imprime en el momento.
+
+    Args:
+        spec: PrinterSpec de la impresora original (con backup)
+        jsonTicket: Acciones del ticket, sin modificar por el render
+        rendered: Render para la impresora original (None si no se llegó a hacer)
+        reason: Causa del desvío ("paper_out", "cover_open", "offline", ...)
+        error: Error o descripción de la falla original
+        job: PrintJob en curso (None fuera del planificador)
+
+    Returns:
+        PrintJob encolado en la impresora de respaldo, o sin job la respuesta
+        de runTraductor con "rerouted" {"from", "to", "reason"}
+
+    Raises:
+        JobDroppedError: Si el trabajo se canceló o venció
+        FailoverError: Si la impresora de respaldo no está disponible o no pudo imprimir
+    """
+    if job is not None and (job.cancelled or job.expired()):
+        raise JobDroppedError(f"Trabajo {job.job_id} para '{spec.name}' "
+                              f"{'cancelado' if job.cancelled else 'vencido'} antes de desviarse")
+
+    rerouted = {"from": spec.name, "to": spec.backup, "reason": reason}
+    try:
+        backup = printer_specs.get(spec.backup)
+        if backup.driver_name in ("Fiscalberry", "Group"):
+            raise PrinterSpecError(f"driver {backup.driver_name} no soportado como respaldo")
+        if rendered is not None and backup.render_key != spec.render_key:
+            # otro ancho o perfil: se renderiza para la impresora de respaldo
+            rendered = None
+        breaker = circuit_breakers.get(backup.name)
+        breaker.check()
+        if printer_health.is_down(backup.name):
+            raise DriverError(f"impresora '{backup.name}' fuera de línea")
+
+        if job is not None:
+            backup_job = PrintJob(backup.name, dict(jsonTicket, printerName=backup.name),
+                                  priority=job.priority, deadline=job.deadline)
+            backup_job.rerouted = rerouted
+            # si la de respaldo también cae mientras espera, se avisa igual que en la original
+            backup_job.on_parked, job.on_parked = job.on_parked, None
+            if rendered is not None:
+                # mismo formato: la de respaldo transmite el render ya hecho
+                backup_job.prepared = concurrent.futures.Future()
+                backup_job.prepared.set_result(rendered)
+            print_scheduler.submit(backup_job)
+            backup_job.future.add_done_callback(lambda f: finish_failover(job, backup_job, error))
+            return backup_job
+
+        if rendered is None:
+            rendered = render_ticket(backup, jsonTicket)
+        try:
+            transmit(backup, rendered.data)
+        except (DriverError, OSError) as e:
+            breaker.record_failure(e)
+            raise
+        breaker.record_success()
+        printer_health.report(backup.name, True)
+    except Exception as e:
+        logger.error(f"Failover de '{spec.name}' a '{spec.backup}' falló: {e}")
+        raise FailoverError(f"{error} (respaldo '{spec.backup}': {e})") from e
+
+    report_failover(rerouted, error)
+    return {"message": "Impresión exitosa", "result": rendered.result, "rerouted": rerouted}
+
+
+def finish_failover(job: PrintJob, backup_job: PrintJob, error):
+    """Responde el trabajo original con el resultado de la impresora de respaldo."""
+    response = backup_job.future.result()
+    rerouted = backup_job.rerouted
+    if response.get("success"):
+        report_failover(rerouted, error, job)
+        job.reply(response)
+        return
+
+    logger.error(f"Failover de '{rerouted['from']}' a '{rerouted['to']}' falló: {response.get('error')}")
+    job.reply(dict(response, error=f"{error} (respaldo '{rerouted['to']}': {response.get('error')})"))
+
+
+def report_failover(rerouted, error, job: PrintJob = None):
+    """Registra y publica un ticket impreso en la impresora de respaldo."""
+    logger.warning(f"Ticket desviado de '{rerouted['from']}' a '{rerouted['to']}' ({rerouted['reason']}): {error}")
+    publish_error(
+        error_type="PRINTER_FAILOVER",
+        error_message=f"Print job rerouted from '{rerouted['from']}' to '{rerouted['to']}' ({rerouted['reason']})",
+        context={
+            "printer_name": rerouted["from"],
+            "backup": rerouted["to"],
+            "reason": rerouted["reason"],
+            "error": str(error),
+            "job_id": job.job_id if job is not None else None
+        }
+    )
+
+
+def replay_spooled_jobs():
+    """Reencola en orden los trabajos del spool que no terminaron antes del último cierre."""
+    if not print_spool:
+        return
+
+    try:
+        max_age = float(configberry.get("SERVIDOR", "spool_max_age", fallback=DEFAULT_MAX_AGE))
+    except ValueError:
+        max_age = DEFAULT_MAX_AGE
+
+    pending, expired = print_spool.pending(max_age=max_age)
+    for seq in expired:
+        print_spool.complete(seq)
+    if expired:
+        logger.warning(f"Spool: {len(expired)} trabajos sin terminar descartados por antigüedad (> {max_age:.0f}s)")
+        publish_error(
+            error_type="SPOOL_JOBS_EXPIRED",
+            error_message=f"{len(expired)} unfinished print jobs discarded on startup",
+            context={"jobs": expired, "max_age": max_age}
+        )
+    print_spool.compact()
+
+    for seq, printer_name, ticket, key in pending:
+        job = PrintJob(printer_name, ticket, deadline=job_deadline(ticket))
+        job.spool_seq = seq
+        track_in_spool(job)
+        if key:
+            # Si el mensaje original se reentrega, recibe el resultado de la reimpresión
+            response = concurrent.futures.Future()
+            job_dedup.claim(key, response)
+            job.future.add_done_callback(
+                lambda f, response=response: response.set_result(
+                    {"rta": f.result().get("result")} if f.result().get("success")
+                    else {"rta": "", "err": f.result().get("error")}
+                )
+            )
+        try:
+            print_scheduler.submit(job)
+        except queue.Full:
+            logger.error(f"Spool: cola llena, no se pudo reencolar el trabajo {seq} para '{printer_name}'")
+            job.reply({"success": False, "error": "Print queue full"})
+            break
+        job.future.add_done_callback(
+            lambda f, seq=seq, name=printer_name: logger.info(
+                f"Spool: trabajo {seq} para '{name}' reimpreso: {'OK' if f.result().get('success') else f.result().get('error')}"
+            )
+        )
+
+    if pending:
+        logger.info(f"Spool: {len(pending)} trabajos sin terminar reencolados")
+
+
+
 class ComandosHandler:
     """Convierte un JSON a Comando Fiscal Para Cualquier tipo de Impresora fiscal"""
 
     traductores = {}
 
     def send_command(self, comando):
-        response = {}
-        
+        """
+        Procesa un comando y espera su respuesta (API bloqueante).
+
+        Envoltorio de submit_command para los llamadores que necesitan la
+        respuesta en el mismo thread. Espera como máximo PRINT_TIMEOUT segundos.
+        """
+        future = self.submit_command(comando)
+        try:
+            return future.result(timeout=PRINT_TIMEOUT)
+        except concurrent.futures.TimeoutError:
+            printer_name = getattr(future, "printer_name", "unknown")
+            error_msg = f"Print TIMEOUT for '{printer_name}' ({PRINT_TIMEOUT}s) - Job may be stuck"
+            logger.error(error_msg)
+
+            # Nadie espera ya la respuesta: si todavía está en cola no se imprime
+            if self.cancel_command(future):
+                error_msg += " (cancelled)"
+            
+            # Publicar alerta de timeout (comanda trabada)
+            publish_error(
+                error_type="PRINT_TIMEOUT",
+                error_message=error_msg,
+                context={
+                    "printer_name": printer_name,
+                    "timeout_seconds": PRINT_TIMEOUT,
+                    "queue_size": print_scheduler.qsize()
+                }
+            )
+            
+            return {"rta": "", "err": error_msg}
+
+    def submit_command(self, comando, callback=None, message_id=None) -> concurrent.futures.Future:
+        """
+        Encola un comando sin bloquear y devuelve un Future con la respuesta.
+
+        La respuesta tiene el mismo formato que send_command ({"rta": ...} o
+        {"err": ...}). Los trabajos de impresión se completan desde el worker
+        de su impresora; el resto de los comandos se resuelven en el acto.
+
+        Args:
+            comando: JSON (str, bytes o dict) con el comando
+            callback: Opcional, callback(respuesta) al completarse. Se ejecuta en
+                el thread que completa el trabajo, por lo que debe ser rápido.
+            message_id: Opcional, id del mensaje (message_id / correlation_id).
+                Un trabajo repetido con el mismo id no se vuelve a imprimir.
+
+        Returns:
+            concurrent.futures.Future: Future con el dict de respuesta
+        """
+        future = concurrent.futures.Future()
+        if callback:
+            future.add_done_callback(lambda f: callback(f.result()))
+
         try:
             if isinstance(comando, str):
                 jsonMes = json.loads(comando, strict=False)
@@ -396,172 +833,418 @@ class ComandosHandler:
             else:
                 raise TypeError(f"Tipo no soportado: {type(comando).__name__}")
             
-            response = self.__json_to_comando(jsonMes)
+            self.__json_to_comando(jsonMes, future, message_id)
             
-        except TypeError as e:
+        except Exception as e:
+            self.__finish(future, self.__command_error(comando, e))
+
+        return future
+
+    def cancel_command(self, future) -> bool:
+        """
+        Cancela un trabajo de impresión encolado con submit_command.
+
+        Args:
+            future: Future devuelto por submit_command
+
+        Returns:
+            bool: True si el trabajo se canceló (o se marcó, si ya se estaba imprimiendo)
+        """
+        job_ids = getattr(future, "job_ids", None)
+        if job_ids is not None:
+            # lote: un trabajo por impresora
+            return any([print_scheduler.cancel(job_id) for job_id in job_ids])
+        job_id = getattr(future, "job_id", None)
+        if job_id is None:
+            return False
+        return print_scheduler.cancel(job_id)
+
+    def __command_error(self, comando, e):
+        """Arma la respuesta de error de un comando y lo publica."""
+        if isinstance(e, TypeError):
+            error_type = "INVALID_COMMAND_ERROR"
             errtxt = "Invalid command data type: %s" % e
-            logger.exception(errtxt)
-            response["err"] = errtxt
-            
-            # Publicar error a RabbitMQ
-            publish_error(
-                error_type="INVALID_COMMAND_ERROR",
-                error_message=errtxt,
-                context={"comando": str(comando)[:500]},
-                exception=e
-            )
-            
-        except TraductorException as e:
+        elif isinstance(e, TraductorException):
+            error_type = "TRANSLATOR_ERROR"
             errtxt = "Command translation error: %s" % str(e)
-            logger.exception(errtxt)
-            response["err"] = errtxt
-            
-            # Publicar error a RabbitMQ
-            publish_error(
-                error_type="TRANSLATOR_ERROR",
-                error_message=errtxt,
-                context={"comando": str(comando)[:500]},
-                exception=e
-            )
-            
-        except KeyError as e:
+        elif isinstance(e, KeyError):
+            error_type = "INVALID_COMMAND_ERROR"
             errtxt = "Invalid command for printer type: %s" % e
-            logger.exception(errtxt)
-            response["err"] = errtxt
+        else:
+            error_type = "UNKNOWN_ERROR"
+            errtxt = "Unknown error: " + repr(e) + " - " + str(e)
+
+        logger.exception(errtxt)
+        
+        # Publicar error a RabbitMQ
+        publish_error(
+            error_type=error_type,
+            error_message=errtxt,
+            context={"comando": str(comando)[:500]},
+            exception=e
+        )
+
+        return {"err": errtxt}
+
+    def __finish(self, future, response):
+        if "err" in response:
+            logger.error(f"Error: {response.get('err')}")
+        if not future.done():
+            future.set_result(response)
+
+    def __print_response(self, printer_name, result):
+        """Convierte el resultado de un trabajo de impresión en la respuesta del comando."""
+        rta = {"rta": ""}
+
+        if isinstance(result, dict):
+            if not result.get("success", True):
+                error_msg = result.get("error", "Error desconocido en la impresión")
+                logger.error(f"Print job failed: {error_msg}")
+                
+                # Publicar error de impresión fallida
+                publish_error(
+                    error_type="PRINT_JOB_ERROR",
+                    error_message=error_msg,
+                    context={
+                        "printer_name": printer_name,
+                        "processing_time": result.get("processing_time", 0)
+                    }
+                )
+                
+                rta["err"] = error_msg
+                if result.get("result") is not None:
+                    # lote: resultado de cada documento aunque haya fallado la sesión
+                    rta["rta"] = result["result"]
+            else:
+                processing_time = result.get("processing_time", 0)
+                if processing_time > 0:
+                    logger.info(f"Print OK: '{printer_name}' ({processing_time:.2f}s)")
+                else:
+                    logger.info(f"Print OK: '{printer_name}'")
+                rta["rta"] = result.get("result", result)
+        else:
+            logger.info(f"Print OK: '{printer_name}'")
+            rta["rta"] = result
+
+        return rta
+
+    def __deferred_response(self, printer_name):
+        """Respuesta de un trabajo que quedó esperando a una impresora caída."""
+        message = f"Impresora '{printer_name}' no disponible: el trabajo se imprimirá cuando vuelva"
+        logger.warning(message)
+        return {"rta": {"deferred": True, "message": message}}
+
+    def __submit_print_job(self, jsonTicket, future, message_id=None, shared_render=None):
+        """Encola el ticket en la cola de su impresora y completa `future` al terminar."""
+        printer_name = jsonTicket.get('printerName')
+        future.printer_name = printer_name
+        # clave de orden de los grupos: no es una acción de impresión
+        order_key = jsonTicket.pop('orderKey', None)
+
+        # los comandos de control solo se deduplican por message_id (ver job_dedup)
+        key = job_key(jsonTicket, message_id, content_hash=not is_express(jsonTicket))
+        is_new, original = job_dedup.claim(key, future)
+        if not is_new:
+            # Reentrega o doble envío: devolver el resultado del trabajo original
+            logger.warning(f"Trabajo duplicado para '{printer_name}' ({key[:20]}), no se reimprime")
+            original.add_done_callback(lambda f: self.__finish(future, f.result()))
+            return
+
+        group = printer_group(printer_name)
+        if group is not None:
+            # Grupo: el trabajo va a la impresora con menos espera
+            try:
+                member = printer_groups.select(group, order_key)
+            except PrinterSpecError as e:
+                self.__finish(future, {"rta": "", "err": str(e)})
+                return
+            logger.info(f"Grupo '{group.name}': trabajo asignado a '{member}'")
+            jsonTicket['printerName'] = printer_name = member
+
+        # Log con JSON compacto del ticket
+        ticket_copy = {k: v for k, v in jsonTicket.items() if k != 'printerName'}
+        logger.info(f"Imprimiendo: '{printer_name}' {json.dumps(ticket_copy, ensure_ascii=False)}")
+
+        # Verificar capacidad de cola antes de agregar
+        current_queue_size = print_scheduler.qsize()
+        if current_queue_size > MAX_QUEUED_JOBS * 0.8:  # 80% de capacidad
+            logger.warning(f"Print queue near capacity: {current_queue_size}/{MAX_QUEUED_JOBS}")
+        
+        job = PrintJob(printer_name, jsonTicket, deadline=job_deadline(jsonTicket))
+        job.shared_render = shared_render
+        future.job_id = job.job_id
+        try:
+            # Guardar en disco antes de aceptarlo (se reimprime si el proceso se cae).
+            # Los comandos de control no: un cajón no debe abrirse solo al reiniciar.
+            spooled = spool_ticket(jsonTicket) if print_spool else None
+            if spooled is not None:
+                job.spool_seq = print_spool.append(printer_name, spooled, job_key=key)
+                track_in_spool(job)
+                # Si la impresora está caída, responder sin esperarla: el trabajo
+                # queda en la cola y en el spool y se imprime cuando vuelva
+                job.on_parked = lambda job: self.__finish(future, self.__deferred_response(printer_name))
+
+            # Agregar trabajo sin bloqueo a la cola de su impresora
+            print_scheduler.submit(job)
+            if group is not None:
+                printer_groups.track(group.name, member, job, order_key)
+                # la respuesta indica qué impresora del grupo lo imprimió
+                job.future.add_done_callback(
+                    lambda f: self.__finish(future, dict(self.__print_response(printer_name, f.result()),
+                                                         printerName=member))
+                )
+            else:
+                job.future.add_done_callback(
+                    lambda f: self.__finish(future, self.__print_response(printer_name, f.result()))
+                )
+                
+        except queue.Full:
+            if print_spool:
+                print_spool.complete(job.spool_seq)
+            if group is not None:
+                printer_groups.release(group.name, member, order_key)
+            error_msg = f"Print queue full ({current_queue_size}/{MAX_QUEUED_JOBS}). Cannot queue job for '{printer_name}'"
+            logger.error(error_msg)
             
-            # Publicar error a RabbitMQ
+            # Publicar alerta de cola llena
             publish_error(
-                error_type="INVALID_COMMAND_ERROR",
-                error_message=errtxt,
-                context={"comando": str(comando)[:500]},
-                exception=e
+                error_type="QUEUE_FULL",
+                error_message=error_msg,
+                context={
+                    "printer_name": printer_name,
+                    "queue_size": current_queue_size,
+                    "max_capacity": MAX_QUEUED_JOBS
+                }
             )
             
+            self.__finish(future, {"rta": "", "err": error_msg})
+            
         except Exception as e:
-            errtxt = "Unknown error: " + repr(e) + " - " + str(e)
-            logger.exception(errtxt)
-            response["err"] = errtxt
+            if print_spool:
+                print_spool.complete(job.spool_seq)
+            if group is not None:
+                printer_groups.release(group.name, member, order_key)
+            error_msg = f"Print queue error: {e}"
+            logger.error(error_msg, exc_info=True)
             
-            # Publicar error a RabbitMQ
+            # Publicar error de cola
             publish_error(
-                error_type="UNKNOWN_ERROR",
-                error_message=errtxt,
-                context={"comando": str(comando)[:500]},
+                error_type="QUEUE_ERROR",
+                error_message=error_msg,
+                context={"printer_name": printer_name},
                 exception=e
             )
+            
+            self.__finish(future, {"rta": "", "err": error_msg})
 
-        if "err" in response:
-            logger.error(f"Error: {response.get('err')}")
-        return response
+    def __submit_batch(self, envelope, future, message_id=None):
+        """
+        Encola un lote de documentos y completa `future` con el resultado de cada uno.
+
+        Los documentos de una misma impresora van en un solo trabajo, que se
+        transmite en una sola sesión. El lote acepta "cut": "each" (cada
+        documento con su corte, por defecto) o "single" (un solo corte al
+        final de cada impresora), y "priority"/"ttl" para todos sus trabajos.
+
+        La respuesta es {"rta": [...]} con {"printerName", "rta"} o
+        {"printerName", "err"} por documento, en el orden del lote, y "err"
+        si alguno falló.
+        """
+        documents = envelope.get("batch")
+        if not isinstance(documents, list) or not documents or \
+                not all(isinstance(document, dict) and document.get("printerName") for document in documents):
+            raise TraductorException("batch debe ser una lista de documentos con printerName")
+        if any(isinstance(document["printerName"], list) for document in documents):
+            raise TraductorException("En un lote cada documento va a una sola impresora")
+        cut = envelope.get("cut", "each")
+        if cut not in ("each", "single"):
+            raise TraductorException(f"cut inválido: {cut!r} (each o single)")
+
+        # impresora -> índices de sus documentos, en el orden del lote
+        groups = OrderedDict()
+        for index, document in enumerate(documents):
+            name = document["printerName"]
+            group_key = json.dumps(name, sort_keys=True) if isinstance(name, dict) else name
+            groups.setdefault(group_key, (name, []))[1].append(index)
+
+        future.printer_name = ", ".join(str(name) for name, _ in groups.values())
+        parts = []
+        for group_key, (name, indexes) in groups.items():
+            ticket = {"printerName": name, "batch": [documents[index] for index in indexes], "cut": cut}
+            for option in ("priority", "ttl", "orderKey"):
+                if option in envelope:
+                    ticket[option] = envelope[option]
+            group_future = concurrent.futures.Future()
+            self.__submit_print_job(ticket, group_future, f"{message_id}#{group_key}" if message_id else None)
+            parts.append((indexes, group_future))
+
+        self.__gather(future, parts, [document["printerName"] for document in documents],
+                      "documentos del lote", self.__batch_results)
+
+    def __submit_fanout(self, jsonTicket, future, message_id=None):
+        """
+        Encola el mismo ticket para varias impresoras ("printerName": [...]).
+
+        Cada destino es un trabajo independiente en la cola de su impresora
+        (con su propio circuit breaker, spool y control de duplicados: un
+        reintento del mensaje reimprime solo los destinos que fallaron), pero
+        el ticket se renderiza una sola vez por formato distinto.
 
-    def __json_to_comando(self, jsonTicket):
+        La respuesta es {"rta": [...]} con {"printerName", "rta"} o
+        {"printerName", "err"} por destino y "err" si alguno falló.
+        """
+        targets = []
+        for target in jsonTicket["printerName"]:
+            if not target or not isinstance(target, (str, dict)):
+                raise TraductorException(f"printerName inválido en la lista: {target!r}")
+            if target not in targets:
+                targets.append(target)
+        if not targets:
+            raise TraductorException("printerName es una lista vacía")
+
+        shared_render = None if is_express(jsonTicket) else SharedRender(jsonTicket)
+        future.printer_name = ", ".join(str(target) for target in targets)
+        parts = []
+        for index, target in enumerate(targets):
+            ticket = copy.deepcopy(jsonTicket)
+            ticket["printerName"] = target
+            target_key = json.dumps(target, sort_keys=True) if isinstance(target, dict) else target
+            target_future = concurrent.futures.Future()
+            self.__submit_print_job(ticket, target_future, f"{message_id}#{target_key}" if message_id else None,
+                                    shared_render=shared_render)
+            parts.append(([index], target_future))
+
+        self.__gather(future, parts, targets, "impresoras", self.__target_results)
+
+    def __submit_routed(self, jsonTicket, future, message_id=None):
+        """
+        Divide una comanda por estación ("route": true) y encola cada parte.
+
+        Los ítems se asignan a estaciones según la sección [Estaciones] de
+        config.ini (ver station_router); cada estación recibe su sub-comanda
+        como un trabajo independiente en su cola, así las estaciones imprimen
+        en paralelo. El printerName del mensaje, si viene, recibe los ítems
+        sin estación.
+
+        La respuesta es {"rta": [...]} con {"printerName", "rta"} o
+        {"printerName", "err"} por estación y "err" si alguna falló.
+        """
+        actions = [key for key in jsonTicket if key not in NON_ACTION_KEYS and key not in ("route", "orderKey")]
+        if actions != ["printComanda"]:
+            raise TraductorException("route solo se puede usar con printComanda")
+        params = jsonTicket["printComanda"]
+        if not isinstance(params, dict) or not isinstance(params.get("comanda"), dict):
+            raise TraductorException("printComanda sin comanda")
+        fallback = jsonTicket.get("printerName")
+        if fallback is not None and not isinstance(fallback, str):
+            raise TraductorException("Con route, printerName debe ser una sola impresora")
+
+        try:
+            split = get_station_router().split(params["comanda"], fallback)
+        except Exception as e:
+            raise TraductorException(str(e))
+        if not split:
+            raise TraductorException("La comanda no tiene ítems ni estación por defecto")
+
+        stations = list(split)
+        future.printer_name = ", ".join(stations)
+        parts = []
+        for index, station in enumerate(stations):
+            ticket = {"printerName": station, "printComanda": dict(params, comanda=split[station])}
+            for option in ("priority", "ttl", "orderKey"):
+                if option in jsonTicket:
+                    ticket[option] = jsonTicket[option]
+            station_future = concurrent.futures.Future()
+            self.__submit_print_job(ticket, station_future, f"{message_id}#{station}" if message_id else None)
+            parts.append(([index], station_future))
+
+        self.__gather(future, parts, stations, "estaciones", self.__target_results)
+
+    @staticmethod
+    def __target_results(response, count):
+        """Resultado de un destino del fan-out (respuesta de su trabajo)."""
+        rta = response.get("rta")
+        error = response.get("err") or (rta.get("error") if isinstance(rta, dict) else None)
+        if error:
+            return [{"err": error}]
+        return [{"rta": rta}]
+
+    def __gather(self, future, parts, labels, unit, extract):
+        """
+        Completa `future` cuando terminan todos los trabajos de un lote o fan-out.
+
+        Args:
+            future: Future del comando original
+            parts: [(índices, future del trabajo)] de cada trabajo encolado
+            labels: printerName de cada índice
+            unit: Qué se cuenta en el mensaje de error ("impresoras", ...)
+            extract: extract(respuesta, cantidad) -> resultado de cada índice del trabajo
+        """
+        results = [None] * len(labels)
+        remaining = [len(parts)]
+        lock = threading.Lock()
+
+        def part_done(indexes, response):
+            for index, result in zip(indexes, extract(response, len(indexes))):
+                results[index] = dict(result, printerName=labels[index])
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            rta = {"rta": results}
+            failed = sum(1 for result in results if "err" in result)
+            if failed:
+                rta["err"] = f"{failed} de {len(results)} {unit} con error"
+            self.__finish(future, rta)
+
+        future.job_ids = [part_future.job_id for _, part_future in parts
+                          if getattr(part_future, "job_id", None) is not None]
+        for indexes, part_future in parts:
+            part_future.add_done_callback(lambda f, indexes=indexes: part_done(indexes, f.result()))
+
+    @staticmethod
+    def __batch_results(response, count):
+        """Resultado por documento de la respuesta del trabajo de una impresora del lote."""
+        rta = response.get("rta")
+        if isinstance(rta, dict) and isinstance(rta.get("result"), list) and len(rta["result"]) == count:
+            return rta["result"]
+        if isinstance(rta, list) and len(rta) == count:
+            return rta
+        error = response.get("err") or (rta.get("error") if isinstance(rta, dict) else None)
+        if error:
+            return [{"err": error}] * count
+        return [{"rta": rta}] * count
+
+    def __json_to_comando(self, jsonTicket, future, message_id=None):
         """Leer y procesar una factura en formato JSON 
         ``jsonTicket`` factura a procesar
+        ``future`` se completa con la respuesta del comando
+        ``message_id`` id del mensaje para descartar duplicados
         """
-        traductor = None
-
         rta = {"rta": ""}
         try:
 
             # si no se pasa el nombre de la impresora, se toma la primera# seleccionar impresora
             # esto se debe ejecutar antes que cualquier otro comando
-            if 'printerName' in jsonTicket:
-                printer_name = jsonTicket.get('printerName')
-                # Log con JSON compacto del ticket
-                ticket_copy = {k: v for k, v in jsonTicket.items() if k != 'printerName'}
-                logger.info(f"Imprimiendo: '{printer_name}' {json.dumps(ticket_copy, ensure_ascii=False)}")
+            if 'batch' in jsonTicket and 'printerName' not in jsonTicket:
+                # Lote de documentos: una sesión por impresora
+                self.__submit_batch(jsonTicket, future, message_id)
+                return
 
-                # Procesamiento optimizado con cola de alta velocidad
-                q = Queue()
-                
-                # Verificar capacidad de cola antes de agregar
-                current_queue_size = print_queue.qsize()
-                if current_queue_size > 400:  # 80% de capacidad
-                    logger.warning(f"Print queue near capacity: {current_queue_size}/500")
-                
-                try:
-                    # Agregar trabajo sin bloqueo
-                    print_queue.put_nowait((jsonTicket, q))
-                    
-                    # Timeout de 30 segundos para detectar comandas trabadas
-                    result = q.get(timeout=30)
-                    
-                    if isinstance(result, dict):
-                        if not result.get("success", True):
-                            error_msg = result.get("error", "Error desconocido en la impresión")
-                            logger.error(f"Print job failed: {error_msg}")
-                            
-                            # Publicar error de impresión fallida
-                            publish_error(
-                                error_type="PRINT_JOB_ERROR",
-                                error_message=error_msg,
-                                context={
-                                    "printer_name": printer_name,
-                                    "processing_time": result.get("processing_time", 0)
-                                }
-                            )
-                            
-                            rta["err"] = error_msg
-                        else:
-                            processing_time = result.get("processing_time", 0)
-                            if processing_time > 0:
-                                logger.info(f"Print OK: '{printer_name}' ({processing_time:.2f}s)")
-                            else:
-                                logger.info(f"Print OK: '{printer_name}'")
-                            rta["rta"] = result.get("result", result)
-                    else:
-                        logger.info(f"Print OK: '{printer_name}'")
-                        rta["rta"] = result
-                        
-                except queue.Full:
-                    error_msg = f"Print queue full ({current_queue_size}/500). Cannot queue job for '{printer_name}'"
-                    logger.error(error_msg)
-                    
-                    # Publicar alerta de cola llena
-                    publish_error(
-                        error_type="QUEUE_FULL",
-                        error_message=error_msg,
-                        context={
-                            "printer_name": printer_name,
-                            "queue_size": current_queue_size,
-                            "max_capacity": 500
-                        }
-                    )
-                    
-                    rta["err"] = error_msg
-                    
-                except queue.Empty:
-                    error_msg = f"Print TIMEOUT for '{printer_name}' (30s) - Job may be stuck"
-                    logger.error(error_msg)
-                    
-                    # Publicar alerta de timeout (comanda trabada)
-                    publish_error(
-                        error_type="PRINT_TIMEOUT",
-                        error_message=error_msg,
-                        context={
-                            "printer_name": printer_name,
-                            "timeout_seconds": 30,
-                            "queue_size": print_queue.qsize()
-                        }
-                    )
-                    
-                    rta["err"] = error_msg
-                    
-                except Exception as e:
-                    error_msg = f"Print queue error: {e}"
-                    logger.error(error_msg, exc_info=True)
-                    
-                    # Publicar error de cola
-                    publish_error(
-                        error_type="QUEUE_ERROR",
-                        error_message=error_msg,
-                        context={"printer_name": printer_name},
-                        exception=e
-                    )
-                    
-                    rta["err"] = error_msg
+            if jsonTicket.get('route'):
+                # Comanda dividida por estación: cada estación imprime sus ítems en paralelo
+                self.__submit_routed(jsonTicket, future, message_id)
+                return
 
-            
+            if isinstance(jsonTicket.get('printerName'), list):
+                # Fan-out: el mismo ticket a varias impresoras, renderizado una vez por formato
+                self.__submit_fanout(jsonTicket, future, message_id)
+                return
+
+            if 'printerName' in jsonTicket:
+                # Procesamiento sin bloqueo: el worker de la impresora completa el future
+                self.__submit_print_job(jsonTicket, future, message_id)
+                return
 
             # Acciones de comando genericos de Status y Control
             elif 'getStatus' in jsonTicket:
@@ -595,20 +1278,13 @@ class ComandosHandler:
             else:
                 raise TraductorException("No se pasó un comando válido")
 
-            # cerrar el driver
-            if traductor and traductor.comando:
-                traductor.comando.close()
-
         except Exception as e:
-            # cerrar el driver
-            if traductor and traductor.comando:
-                traductor.comando.close()
             logging.error(format(e))
             
             raise TraductorException(
                 "Error en el comando %s" % e)
 
-        return rta
+        self.__finish(future, rta)
 
     def _upgrade(self):
         ret = self.fbApp.upgradeGitPull()
@@ -619,11 +1295,17 @@ class ComandosHandler:
         return rta
 
     def _getPrinterInfo(self, printerName):
+        health = printer_health.get(printerName)
         rta = {
             "printerName": printerName,
             "action": "getPrinterInfo",
-            "rta": configberry.get_config_for_printer(printerName)
+            "rta": configberry.get_config_for_printer(printerName),
+            "status": health.to_dict() if health else None
         }
+        group = printer_group(printerName)
+        if group is not None:
+            # métricas de cada impresora del grupo
+            rta["members"] = printer_groups.status(group.name)
         return rta
 
     def _rebootFiscalberry(self):
@@ -673,13 +1355,18 @@ class ComandosHandler:
         return rta
 
     def _getStatus(self, *args):
-
+        """Estado de cada impresora configurada según el monitor (sin tocar los dispositivos)."""
         rta = {"action": "getStatus", "rta": {}}
-        for tradu in self.traductores:
-            if self.traductores[tradu]:
-                rta["rta"][tradu] = "ONLINE"
-            else:
-                rta["rta"][tradu] = "OFFLINE"
+        for name, spec in printer_specs.all().items():
+            if spec.driver_name == "Group":
+                # un grupo está en línea si alguna de sus impresoras puede imprimir
+                members = printer_groups.members(spec)
+                rta["rta"][name] = "ONLINE" if any(member_available(member) for member in members) else "OFFLINE"
+                continue
+            health = printer_health.get(name)
+            rta["rta"][name] = health.status.upper() if health else "UNKNOWN"
+        # tamaño y utilización del pool de workers de impresión
+        rta["workers"] = print_scheduler.pool_status()
         return rta
 
     def _handleSocketError(self, err, jsonTicket, traductor):
@@ -1,12 +1,64 @@
 import configparser
+import functools
 import os
+import threading
+import time
 import uuid
 import platformdirs
 import platform
+from types import MappingProxyType
 
 
 appname = 'Fiscalberry'
 
+# Cada cuántos segundos, como máximo, se verifica si config.ini cambió en disco
+SNAPSHOT_CHECK_INTERVAL = 1.0
+
+
+def _with_config_lock(method):
+    """Serializa los métodos que modifican el ConfigParser compartido."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._snapshot_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ConfigSnapshot:
+    """
+    Copia inmutable de config.ini en memoria.
+
+    Se construye una sola vez por versión del archivo y se comparte entre threads:
+    las lecturas no tocan el disco ni el ConfigParser.
+    """
+
+    __slots__ = ("_data", "signature")
+
+    def __init__(self, parser: configparser.ConfigParser, signature=None):
+        self._data = MappingProxyType({
+            s: MappingProxyType(dict(parser.items(s))) for s in parser.sections()
+        })
+        self.signature = signature
+
+    def sections(self):
+        return list(self._data)
+
+    def has_section(self, section):
+        return section in self._data
+
+    def section(self, section):
+        """Claves de una sección (solo lectura). KeyError si no existe."""
+        return self._data[section]
+
+    def get(self, section, key, fallback=None):
+        values = self._data.get(section)
+        if values is None:
+            return fallback
+        return values.get(key, fallback)
+
+    def to_dict(self):
+        return {s: dict(values) for s, values in self._data.items()}
+
 
 class Configberry:
     config = configparser.ConfigParser()
@@ -17,6 +69,10 @@ class Configberry:
     
     _listeners = []
 
+    _snapshot = None
+    _snapshot_checked_at = 0.0
+    _snapshot_lock = threading.RLock()
+
     def __new__(cls):
 
         if not cls._instance:
@@ -47,18 +103,51 @@ class Configberry:
 
 
     def getJSON(self):
-        jsondata = {}
-        for s in self.sections():
-            jsondata.setdefault(s, {})
-            for (k, data) in self.config.items(s):
-                jsondata[s].setdefault(k, data)
-        return jsondata
+        return self.snapshot().to_dict()
 
     def items(self):
         return self.config.items()
 
     def sections(self):
-        return self.config.sections()
+        return self.snapshot().sections()
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.configFilePath)
+            return (st.st_mtime_ns, st.st_ino, st.st_size)
+        except (OSError, TypeError):
+            return None
+
+    def _reload(self):
+        """Relee config.ini y publica un nuevo snapshot."""
+        with self._snapshot_lock:
+            signature = self._file_signature()
+            if signature is not None:
+                self.config.read(self.configFilePath)
+            self._snapshot = ConfigSnapshot(self.config, signature)
+            self._snapshot_checked_at = time.monotonic()
+            return self._snapshot
+
+    def snapshot(self) -> ConfigSnapshot:
+        """
+        Devuelve el snapshot vigente de la configuración.
+
+        Solo se relee config.ini si cambió su mtime, inode o tamaño, y esa
+        verificación se hace como máximo una vez cada SNAPSHOT_CHECK_INTERVAL.
+        """
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL:
+            return snap
+
+        with self._snapshot_lock:
+            snap = self._snapshot
+            if snap is not None and now - self._snapshot_checked_at < SNAPSHOT_CHECK_INTERVAL:
+                return snap
+            if snap is None or self._file_signature() != snap.signature:
+                return self._reload()
+            self._snapshot_checked_at = now
+            return snap
 
     def findByMac(self, mac):
         "Busca entre todas las sections por la mac"
@@ -81,6 +170,7 @@ class Configberry:
             return False
         
 
+    @_with_config_lock
     def writeKeyForSection(self, section, key, value):
         self.config.read(self.configFilePath)
         oldval = self.config.get(section, key, value)
@@ -91,7 +181,7 @@ class Configberry:
         with open(self.configFilePath, 'w') as configfile:
             self.config.write(configfile)
             configfile.close()
-        self.config.read(self.configFilePath)
+        self._reload()
         self.notify_listeners()
         return 1
 
@@ -106,6 +196,7 @@ class Configberry:
        
 
 
+    @_with_config_lock
     def set(self, section: str, kwargs: dict):
         """
         Sets the configuration parameters for a given section and saves the changes to the configuration file.
@@ -161,7 +252,7 @@ class Configberry:
                         self.config.write(configfile)
                     
                     # Recargar la configuración después de escribir
-                    self.config.read(self.configFilePath) 
+                    self._reload()
                     
                     # Verificar si se guardó correctamente (opcional, pero bueno para robustez)
                     # for key, value in kwargs.items():
@@ -191,7 +282,7 @@ class Configberry:
                             os.replace(self.configFilePath + ".bak", self.configFilePath)
                             print("Restored config from backup.")
                             # Recargar la configuración desde el backup restaurado
-                            self.config.read(self.configFilePath) 
+                            self._reload()
                         except Exception as restore_error:
                              print(f"FATAL: Could not restore backup: {restore_error}")
                     return False # Indicar fallo
@@ -209,6 +300,7 @@ class Configberry:
             # No intentar restaurar backup aquí si el error fue antes de saveBackup()
             return False
 
+    @_with_config_lock
     def storeConfig(self):
         print(f"Reinicializando config file: {self.configFilePath}")
         self.config.read(self.configFilePath)
@@ -228,7 +320,7 @@ class Configberry:
             
             print(f"Error writing config file: {e}")
         
-        self.config.read(self.configFilePath)
+        self._reload()
                 
         self.notify_listeners()
         
@@ -296,7 +388,7 @@ class Configberry:
             self.resetConfigFile() # This method should handle writing the config
         
         # Reload config after potential reset to ensure it's current
-        self.config.read(configFile)
+        self._reload()
 
         # menos el primero que es el de SERVIDOR, mostrar el el resto en consola ya que son las impresoras
         for s in self.sections()[1:]:
@@ -362,15 +454,13 @@ class Configberry:
             }
             return ret
         else:
-            printerName = printerName
-            dictConf = {s: dict(self.config.items(s)) for s in self.config.sections()}
-            return dictConf[printerName]
+            # copia de la sección: el llamador puede modificarla
+            return dict(self.snapshot().section(printerName))
 
     def get_actual_config(self):
-        dictConf = {s: dict(self.config.items(s)) for s in self.config.sections()}
-
-        return dictConf
+        return self.snapshot().to_dict()
 
+    @_with_config_lock
     def delete_section(self, section):
         
         self.config.read(self.configFilePath)
@@ -379,7 +469,7 @@ class Configberry:
             self.config.remove_section(section)
             with open(self.configFilePath, 'w') as configfile:
                 self.config.write(configfile)
-            self.config.read(self.configFilePath)
+            self._reload()
             self.notify_listeners()
             return True
         else:
@@ -387,8 +477,7 @@ class Configberry:
             return False
     
     def get(self, section, key, fallback=None):
-        self.config.read( self.configFilePath )
-        return self.config.get(section, key, fallback=fallback)
+        return self.snapshot().get(section, key, fallback=fallback)
     
     def is_comercio_adoptado(self):
         """
@@ -400,7 +489,7 @@ class Configberry:
         False en caso contrario.
         """
         # Verificar si existe la sección Paxaprinter
-        if not self.config.has_section("Paxaprinter"):
+        if not self.snapshot().has_section("Paxaprinter"):
             return False
         
         # Verificar si tiene un tenant configurado
@@ -7,6 +7,8 @@ import base64
 from fiscalberry.common.fiscalberry_logger import getLogger
 from fiscalberry.common.rabbitmq.error_publisher import publish_error
 from fiscalberry.common.printer_error_detector import PrinterErrorDetector, analyze_printer_response
+from fiscalberry.common.block_cache import render_cached
+from fiscalberry.common.qr_codes import print_qr
 from escpos.escpos import EscposIO
 from escpos.constants import QR_ECLEVEL_H,CD_KICK_2
 
@@ -345,7 +347,7 @@ class EscPComandos():
 
         qrcode = kwargs.get("qr", None)
         if qrcode:
-            printer.qr(qrcode, size=5)
+            print_qr(escpos, qrcode, size=5)
             printer.ln()
 
         qrcodeml = kwargs.get("qr-mercadopago", None)
@@ -357,7 +359,7 @@ class EscPComandos():
             escpos.writelines(u' \\    /  ')
             escpos.writelines(u'  \\  /   ')
             escpos.writelines(u'   \\/    ')
-            printer.qr(qrcodeml, size=5)
+            print_qr(escpos, qrcodeml, size=5)
             printer.ln()
     
     def printFacturaElectronica(self, escpos: EscposIO, **kwargs):
@@ -396,21 +398,14 @@ class EscPComandos():
         inicioActividades = encabezado.get('inicio_actividades')
         tipoResponsabilidad = encabezado.get('tipo_responsable')
 
-        printer.set(font='a', height=1, bold=True, align='center')
-        printer.text(f"{ nombreComercio }\n\n")
-
-        printer.set(font='a', height=1, align='left', normal_textsize=True)
-        printer.text(f"{ razonSocial }\n")
-        printer.text(f"CUIT: { cuitComercio }\n")        
-
-        if ingresosBrutos:
-            printer.text(f"Ingresos Brutos: {ingresosBrutos}\n")
-        printer.text(f"{ domicilioComercial }\n")
-        printer.text(f"Inicio de actividades: {inicioActividades}\n")
-        printer.text(f"{ tipoResponsabilidad }\n")        
-
-        printer.set(font='a', height=1, align='center')
-        printer.text("-" * self.total_cols + "\n")
+        # El bloque del comercio es igual en todas las facturas: se renderiza una vez y se cachea
+        datosComercio = [nombreComercio, razonSocial, cuitComercio, ingresosBrutos,
+                         domicilioComercial, inicioActividades, tipoResponsabilidad]
+        render_cached(
+            escpos,
+            ("comercio", json.dumps(datosComercio, default=str), self.total_cols),
+            lambda io: self._printDatosComercio(io.printer, *datosComercio)
+        )
 
         # 2- IDENTIFICACIÓN DEL COMPROBANTE
         tipoComprobante = encabezado.get('tipo_comprobante')
@@ -631,7 +626,7 @@ class EscPComandos():
         
         if qrcode:
             data = "https://www.afip.gob.ar/fe/qr/?p=" + qrcode.decode().replace("\n", "")
-            printer.qr(data, QR_ECLEVEL_H, size=3)
+            print_qr(escpos, data, QR_ECLEVEL_H, size=3)
 
         printer.set(font='a', height=1, align='center')
         caeTxt = f"CAE: {cae}"
@@ -815,7 +810,14 @@ class EscPComandos():
         self.__preFillTrailer = setTrailer
 
     def _setTrailer(self, escpos: EscposIO, setTrailer):
-        #print(self.printer)
+        # Las líneas de trailer se repiten en cada ticket: se cachean ya renderizadas
+        render_cached(
+            escpos,
+            ("trailer", json.dumps(setTrailer, default=str), self.total_cols),
+            lambda io: self._printTrailer(io, setTrailer)
+        )
+
+    def _printTrailer(self, escpos: EscposIO, setTrailer):
         printer = escpos.printer
         for trailerLine in setTrailer:
             if trailerLine:
@@ -823,6 +825,25 @@ class EscPComandos():
 
             printer.ln()
 
+    def _printDatosComercio(self, printer, nombreComercio, razonSocial, cuitComercio, ingresosBrutos,
+                            domicilioComercial, inicioActividades, tipoResponsabilidad):
+        """Bloque 1 de la factura electrónica: datos del comercio."""
+        printer.set(font='a', height=1, bold=True, align='center')
+        printer.text(f"{ nombreComercio }\n\n")
+
+        printer.set(font='a', height=1, align='left', normal_textsize=True)
+        printer.text(f"{ razonSocial }\n")
+        printer.text(f"CUIT: { cuitComercio }\n")        
+
+        if ingresosBrutos:
+            printer.text(f"Ingresos Brutos: {ingresosBrutos}\n")
+        printer.text(f"{ domicilioComercial }\n")
+        printer.text(f"Inicio de actividades: {inicioActividades}\n")
+        printer.text(f"{ tipoResponsabilidad }\n")        
+
+        printer.set(font='a', height=1, align='center')
+        printer.text("-" * self.total_cols + "\n")
+
     def _printTransparenciaFiscal(self, escpos: EscposIO, encabezado, ivas, otros_impuestos=0):
         """Imprime sección Transparencia Fiscal al Consumidor (Ley 27.743)
         
@@ -1,4 +1,3 @@
-import requests
 import json
 from fiscalberry.common.fiscalberry_logger import getLogger
 
@@ -15,6 +14,8 @@ class FiscalberryComandos():
 
 	def run(self, host, jsonData):
 		"""Envia comando a impresora"""
+		# requests solo hace falta con el driver Fiscalberry: no cargarlo al arrancar
+		import requests
 
 		logger.debug(f"Conectando a la URL {host}")
 		headers = {'Content-type': 'application/json'}
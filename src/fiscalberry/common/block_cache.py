@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""
+Cache de bloques de ticket ya renderizados.
+
+El bloque con los datos del comercio de una factura y las líneas de trailer
+son iguales en casi todos los tickets de un local. Se renderizan una vez a
+bytes ESC/POS (sobre una impresora Dummy con el mismo perfil y codificación
+que la real) y los tickets siguientes solo copian esos bytes, sin repetir
+las llamadas a set()/text() ni la codificación del texto.
+
+La clave incluye el contenido del bloque, el ancho en columnas, el perfil de
+la impresora y el codepage vigente (o fijo) al insertarlo, así los bytes copiados son
+exactamente los que se hubieran generado renderizando el bloque en el lugar.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple
+
+from escpos.escpos import EscposIO
+from escpos.magicencode import MagicEncode
+from escpos.printer import Dummy
+
+from fiscalberry.common.codepage_encoder import PinnedMagicEncode
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Cantidad máxima de bloques guardados
+DEFAULT_BLOCK_CACHE_SIZE = 256
+
+
+class RenderedBlockCache:
+    """Cache LRU de bloques renderizados: clave -> (bytes, codificación al terminar)."""
+
+    def __init__(self, max_entries: int = DEFAULT_BLOCK_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: Tuple[bytes, Optional[str]]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def status(self):
+        return {"entries": len(self._entries), "max_entries": self.max_entries,
+                "hits": self.hits, "misses": self.misses}
+
+
+def _block_renderer(printer) -> Dummy:
+    """Dummy con el perfil, la configuración de codificación y el codepage vigente de `printer`."""
+    block = Dummy()
+    block.profile = printer.profile
+    magic = printer.magic
+    if isinstance(magic, PinnedMagicEncode):
+        block.magic = PinnedMagicEncode(block, magic.codepage, encoding=magic.encoding,
+                                        defaultsymbol=magic.defaultsymbol, encoder=magic.encoder)
+        return block
+    block.magic = MagicEncode(
+        block,
+        encoding=magic.encoding,
+        disabled=magic.disabled,
+        defaultsymbol=magic.defaultsymbol,
+        encoder=magic.encoder,
+    )
+    return block
+
+
+def render_cached(escpos: EscposIO, key: Tuple[Any, ...], render: Callable[[EscposIO], Any],
+                  cache: Optional[RenderedBlockCache] = None):
+    """
+    Imprime un bloque estático desde la cache, renderizándolo la primera vez.
+
+    Args:
+        escpos: EscposIO del ticket donde se escribe el bloque
+        key: Contenido del bloque y todo lo que cambie su formato (columnas)
+        render: render(escpos) imprime el bloque sobre el EscposIO que recibe.
+            Solo puede depender de `key`.
+        cache: Cache a usar (por defecto la de bloques, get_block_cache())
+    """
+    if cache is None:
+        cache = get_block_cache()
+    if not cache.enabled:
+        render(escpos)
+        return
+
+    printer = escpos.printer
+    magic = printer.magic
+    full_key = (key, tuple(sorted(escpos.params.items())), printer.profile.profile_data.get("name"),
+                magic.disabled, magic.encoding, getattr(magic, "codepage", None))
+
+    entry = cache.get(full_key)
+    if entry is None:
+        block = _block_renderer(printer)
+        render(EscposIO(block, autocut=False, autoclose=False, **escpos.params))
+        entry = (block.output, block.magic.encoding)
+        cache.put(full_key, entry)
+
+    data, encoding = entry
+    printer._raw(data)
+    if encoding is not None:
+        # el bloque dejó la impresora en este codepage; el texto que sigue lo tiene que saber
+        magic.encoding = encoding
+
+
+_block_cache_instance = None
+_block_cache_lock = threading.Lock()
+
+
+def get_block_cache() -> RenderedBlockCache:
+    """
+    Obtiene la instancia singleton de la cache de bloques.
+
+    Returns:
+        RenderedBlockCache: Con capacidad SERVIDOR.block_cache_size (0 la desactiva)
+    """
+    global _block_cache_instance
+
+    if _block_cache_instance is not None:
+        return _block_cache_instance
+
+    with _block_cache_lock:
+        if _block_cache_instance is None:
+            size = DEFAULT_BLOCK_CACHE_SIZE
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                size = int(Configberry().get("SERVIDOR", "block_cache_size", fallback=DEFAULT_BLOCK_CACHE_SIZE))
+            except Exception as e:
+                logger.warning(f"block_cache_size inválido, usando {DEFAULT_BLOCK_CACHE_SIZE}: {e}")
+            _block_cache_instance = RenderedBlockCache(size)
+        return _block_cache_instance
@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Circuit breaker por impresora.
+
+Cuando una impresora falla varias veces seguidas por problemas de conexión
+(desenchufada, apagada, cable USB suelto) el circuito se abre: los trabajos
+siguientes fallan en el acto en lugar de ocupar un worker durante todo el
+timeout de conexión. Pasado `reset_timeout` el circuito queda semiabierto y
+deja pasar un único trabajo de prueba; si funciona se cierra, si falla se
+vuelve a abrir.
+"""
+
+import threading
+import time
+from typing import Any, Dict
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.rabbitmq.error_publisher import publish_error
+
+logger = getLogger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Fallas de conexión consecutivas que abren el circuito
+DEFAULT_FAILURE_THRESHOLD = 3
+
+# Segundos con el circuito abierto antes de probar de nuevo
+DEFAULT_RESET_TIMEOUT = 15.0
+
+
+class CircuitOpenError(Exception):
+    """La impresora está fuera de línea (circuito abierto)."""
+
+    def __init__(self, name: str, retry_after: float):
+        self.name = name
+        self.retry_after = retry_after
+        super().__init__(f"Impresora '{name}' fuera de línea, se reintenta en {retry_after:.0f}s")
+
+
+class CircuitBreaker:
+    """Circuit breaker de una impresora (closed / open / half_open)."""
+
+    def __init__(self, name: str, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.last_error = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """
+        Indica si un trabajo puede intentar imprimir.
+
+        Con el circuito semiabierto solo deja pasar un trabajo (la prueba).
+        """
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+                logger.info(f"Circuito de '{self.name}' semiabierto, probando con el próximo trabajo")
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def check(self):
+        """
+        Raises:
+            CircuitOpenError: Si el circuito no deja pasar el trabajo
+        """
+        if not self.allow():
+            raise CircuitOpenError(self.name, self.retry_after())
+
+    def record_success(self):
+        with self._lock:
+            if self.state != CLOSED:
+                logger.info(f"Impresora '{self.name}' respondió, circuito cerrado")
+            self.state = CLOSED
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: Any = None):
+        """Registra una falla de conexión. Abre el circuito al llegar al umbral."""
+        with self._lock:
+            self.last_error = str(error) if error is not None else None
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                opened = self.state == CLOSED
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            else:
+                return
+
+        if opened:
+            logger.error(f"Circuito de '{self.name}' abierto tras {self.failures} fallas: {self.last_error}")
+            publish_error(
+                error_type="PRINTER_CIRCUIT_OPEN",
+                error_message=f"Printer '{self.name}' unreachable, failing fast for {self.reset_timeout}s",
+                context={
+                    "printer_name": self.name,
+                    "failures": self.failures,
+                    "last_error": self.last_error,
+                }
+            )
+        else:
+            logger.warning(f"Prueba de '{self.name}' fallida, circuito abierto otros {self.reset_timeout}s")
+
+    def retry_after(self) -> float:
+        """Segundos hasta el próximo intento (0 si el circuito está cerrado)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "retry_after": round(self.retry_after(), 1),
+            "last_error": self.last_error,
+        }
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers indexados por impresora."""
+
+    def __init__(self, failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 reset_timeout: float = DEFAULT_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> CircuitBreaker:
+        breaker = self._breakers.get(name)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.get(name)
+                if breaker is None:
+                    breaker = CircuitBreaker(name, self.failure_threshold, self.reset_timeout)
+                    self._breakers[name] = breaker
+        return breaker
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: breaker.status() for name, breaker in list(self._breakers.items())}
+
+
+_circuit_breakers_instance = None
+_circuit_breakers_lock = threading.Lock()
+
+
+def get_circuit_breakers() -> CircuitBreakerRegistry:
+    """
+    Obtiene la instancia singleton del registro de circuit breakers.
+
+    Returns:
+        CircuitBreakerRegistry: Configurado con SERVIDOR.breaker_failure_threshold
+        y SERVIDOR.breaker_reset_timeout
+    """
+    global _circuit_breakers_instance
+
+    with _circuit_breakers_lock:
+        if _circuit_breakers_instance is None:
+            failure_threshold, reset_timeout = DEFAULT_FAILURE_THRESHOLD, DEFAULT_RESET_TIMEOUT
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                config = Configberry()
+                failure_threshold = int(config.get("SERVIDOR", "breaker_failure_threshold",
+                                                   fallback=DEFAULT_FAILURE_THRESHOLD))
+                reset_timeout = float(config.get("SERVIDOR", "breaker_reset_timeout",
+                                                 fallback=DEFAULT_RESET_TIMEOUT))
+            except Exception as e:
+                logger.warning(f"Configuración de circuit breaker inválida, usando valores por defecto: {e}")
+            _circuit_breakers_instance = CircuitBreakerRegistry(failure_threshold, reset_timeout)
+        return _circuit_breakers_instance
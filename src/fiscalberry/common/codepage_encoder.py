@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Codificación de texto con un codepage fijo por impresora.
+
+El MagicEncode de python-escpos recorre el texto carácter por carácter
+buscando un codepage que pueda codificar cada uno (Ñ, Ó, "DESCRIPCIÓN"),
+y codifica cada tramo con una lista por comprensión. Con `codepage` en la
+sección de la impresora (un nombre de la tabla `encodings` de
+capabilities.json, por ejemplo CP858) el texto se codifica de una sola vez
+con una tabla de traducción precalculada: str.translate + encode("latin-1"),
+ambos en C.
+
+Los caracteres que el codepage no tiene se reemplazan por su letra base sin
+acento (Ő -> O) o, si no hay, por el símbolo por defecto ("?"). Cada
+reemplazo se calcula una vez, se guarda en la tabla y se avisa en el log.
+"""
+
+import threading
+import unicodedata
+from typing import Dict, Optional
+
+import six
+from escpos.capabilities import get_profile
+from escpos.codepages import CodePages
+from escpos.constants import CODEPAGE_CHANGE
+from escpos.magicencode import Encoder, MagicEncode
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+
+class CodepageError(Exception):
+    """Codepage desconocido o no soportado por el perfil de la impresora."""
+    pass
+
+
+def _codepage_char_list(codepage: str):
+    try:
+        return Encoder._get_codepage_char_list(codepage)
+    except KeyError:
+        raise CodepageError(f"Codepage desconocido: {codepage}")
+    except LookupError:
+        raise CodepageError(f"Codepage {codepage} sin tabla de caracteres en capabilities.json")
+
+
+def resolve_codepage(codepage: str, profile: Optional[str] = None) -> str:
+    """
+    Valida un codepage contra capabilities.json y el perfil de la impresora.
+
+    Args:
+        codepage: Nombre del codepage (CP858, cp1252, ...)
+        profile: Perfil de la impresora (None: perfil por defecto)
+
+    Returns:
+        str: Nombre canónico del codepage
+
+    Raises:
+        CodepageError: Si el codepage no existe, no tiene tabla o el perfil no lo soporta
+    """
+    name = CodePages.get_encoding_name(str(codepage).strip())
+    _codepage_char_list(name)
+    try:
+        supported = get_profile(profile).get_code_pages()
+    except Exception as e:
+        raise CodepageError(f"Perfil de impresora inválido {profile!r}: {e}")
+    if name not in supported:
+        raise CodepageError(f"El perfil {profile or 'default'} no soporta el codepage {name} "
+                            f"(soporta: {', '.join(sorted(supported))})")
+    return name
+
+
+class TranslationTable(dict):
+    """
+    Tabla para str.translate: código Unicode -> carácter latin-1 con el byte del codepage.
+
+    Los caracteres que faltan se resuelven en __missing__ (una sola vez cada uno).
+    """
+
+    def __init__(self, codepage: str, defaultsymbol: str = "?"):
+        super().__init__((i, chr(i)) for i in range(128))
+        for i, char in enumerate(_codepage_char_list(codepage)):
+            # los bytes que el codepage no define vienen como " ": no pisar el ASCII
+            if ord(char) >= 128 and ord(char) not in self:
+                self[ord(char)] = chr(i + 128)
+        self.codepage = codepage
+        self.defaultsymbol = "".join(dict.get(self, ord(c), "?") for c in defaultsymbol) or "?"
+        self._lock = threading.Lock()
+
+    def __missing__(self, key: int) -> str:
+        char = chr(key)
+        base = "".join(c for c in unicodedata.normalize("NFKD", char) if not unicodedata.combining(c))
+        if base and base != char and all(ord(c) in self for c in base):
+            replacement = "".join(dict.__getitem__(self, ord(c)) for c in base)
+            logger.info(f"Codepage {self.codepage}: '{char}' no existe, se imprime '{base}'")
+        else:
+            replacement = self.defaultsymbol
+            logger.warning(f"Codepage {self.codepage}: '{char}' (U+{key:04X}) no existe, "
+                           f"se imprime el símbolo por defecto")
+        with self._lock:
+            self[key] = replacement
+        return replacement
+
+    def encode(self, text: str) -> bytes:
+        return text.translate(self).encode("latin-1")
+
+
+_tables: Dict[tuple, TranslationTable] = {}
+_tables_lock = threading.Lock()
+
+
+def get_translation_table(codepage: str, defaultsymbol: str = "?") -> TranslationTable:
+    """Tabla de traducción de un codepage, compartida entre impresoras."""
+    key = (codepage, defaultsymbol)
+    table = _tables.get(key)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None:
+                table = _tables[key] = TranslationTable(codepage, defaultsymbol)
+    return table
+
+
+class PinnedMagicEncode(MagicEncode):
+    """
+    MagicEncode con el codepage fijo: nunca cambia de codepage.
+
+    Mantiene los atributos de MagicEncode (encoding, disabled, defaultsymbol,
+    encoder) para que el resto del código (cache de bloques) lo trate igual.
+    """
+
+    def __init__(self, driver, codepage: str, encoding=None, defaultsymbol="?", encoder=None):
+        super().__init__(driver, encoding=encoding, disabled=False, defaultsymbol=defaultsymbol,
+                         encoder=encoder)
+        self.codepage = codepage
+        self.disabled = True
+        self.table = get_translation_table(codepage, defaultsymbol)
+
+    def force_encoding(self, encoding):
+        # el codepage está fijado en la configuración de la impresora
+        logger.debug(f"Codepage fijo {self.codepage}: se ignora el cambio a {encoding}")
+
+    def write(self, text):
+        if self.encoding != self.codepage:
+            self.encoding = self.codepage
+            self.driver._raw(CODEPAGE_CHANGE + six.int2byte(self.encoder.get_sequence(self.codepage)))
+        if text:
+            self.driver._raw(self.table.encode(str(text)))
+
+    def write_with_encoding(self, encoding, text):
+        self.write(text)
+
+
+def pin_codepage(printer, codepage: str):
+    """Reemplaza el MagicEncode de `printer` por uno con el codepage fijo."""
+    magic = printer.magic
+    printer.magic = PinnedMagicEncode(printer, codepage, encoding=magic.encoding,
+                                      defaultsymbol=magic.defaultsymbol, encoder=magic.encoder)
+    return printer
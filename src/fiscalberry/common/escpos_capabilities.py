@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Cache compacta de capabilities.json para python-escpos.
+
+Al importarse, escpos.capabilities lee capabilities.json entero (cientos de
+KB) con yaml.safe_load, salvo que encuentre un pickle en
+ESCPOS_CAPABILITIES_PICKLE_DIR, que por defecto es un directorio temporal
+nuevo en cada arranque: en la práctica se parsea siempre. En una Raspberry
+eso son segundos entre que vuelve la luz y sale el primer ticket.
+
+prepare_escpos_capabilities() se llama al arrancar, antes de importar escpos:
+arma (una sola vez) un capabilities.json reducido con el perfil "default",
+los perfiles que usan las impresoras de config.ini y los codepages que esos
+perfiles soportan, lo guarda ya picklado en el directorio de cache del
+usuario y apunta ESCPOS_CAPABILITIES_FILE y ESCPOS_CAPABILITIES_PICKLE_DIR
+ahí. escpos carga entonces un pickle chico en lugar de parsear el JSON.
+
+Si después se configura una impresora con un perfil que no está en la cache,
+ensure_profile() lo carga del capabilities.json completo en el momento; en
+el próximo arranque la cache se regenera incluyéndolo y se borran las de
+firmas anteriores.
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import platform
+import re
+import shutil
+import sys
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+PICKLE_DIR_ENV = "ESCPOS_CAPABILITIES_PICKLE_DIR"
+CAPABILITIES_FILE_ENV = "ESCPOS_CAPABILITIES_FILE"
+
+# Perfil que escpos necesita siempre (es la base de escpos.capabilities.Profile)
+DEFAULT_PROFILE = "default"
+
+# Nombre de los directorios de cache (hash de la firma)
+_CACHE_DIR_PATTERN = re.compile(r"^[0-9a-f]{16}$")
+
+# capabilities.json completo del que sale la cache (ESCPOS_CAPABILITIES_FILE pasa a ser la cache)
+_source_path = None
+_full_capabilities = None
+_full_capabilities_lock = threading.Lock()
+
+
+def _package_capabilities_path() -> Optional[str]:
+    """capabilities.json incluido en el paquete escpos, sin importar escpos."""
+    spec = importlib.util.find_spec("escpos")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    for location in spec.submodule_search_locations:
+        candidate = os.path.join(location, "capabilities.json")
+        if os.path.exists(candidate):
+            return candidate
+    return None
+
+
+def source_capabilities_path() -> Optional[str]:
+    """capabilities.json completo: el que eligió el usuario o el del paquete escpos."""
+    return _source_path or os.environ.get(CAPABILITIES_FILE_ENV) or _package_capabilities_path()
+
+
+def configured_profiles() -> set:
+    """Perfiles de escpos que usan las impresoras de config.ini."""
+    from fiscalberry.common.Configberry import Configberry
+
+    snapshot = Configberry().snapshot()
+    profiles = set()
+    for name in snapshot.sections():
+        section = snapshot.section(name)
+        if "driver" in section and section.get("profile"):
+            profiles.add(section["profile"])
+    return profiles
+
+
+def build_compact_capabilities(full: Dict[str, Any], profiles: Iterable[str]) -> Dict[str, Any]:
+    """
+    Subconjunto de capabilities: los perfiles pedidos y sus codepages.
+
+    Los perfiles que no existen en `full` se ignoran (escpos dará el error
+    de siempre al usarlos).
+    """
+    selected = {name: full["profiles"][name] for name in sorted(set(profiles) | {DEFAULT_PROFILE})
+                if name in full["profiles"]}
+    encodings = set()
+    for profile in selected.values():
+        encodings.update(profile.get("codePages", {}).values())
+    return {
+        "encodings": {name: data for name, data in full["encodings"].items() if name in encodings},
+        "profiles": selected,
+    }
+
+
+def _write_atomic(path: str, write):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        write(f)
+    os.replace(tmp, path)
+
+
+def _remove_stale_caches(cache_dir: str, keep: str):
+    """Borra las caches de firmas anteriores (otro escpos, otros perfiles)."""
+    try:
+        names = os.listdir(cache_dir)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(cache_dir, name)
+        if name != keep and _CACHE_DIR_PATTERN.match(name) and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+            logger.debug(f"Cache de capabilities vieja eliminada: {path}")
+
+
+def prepare_escpos_capabilities(profiles: Optional[Iterable[str]] = None,
+                                cache_dir: Optional[str] = None) -> Optional[str]:
+    """
+    Prepara la cache compacta y configura escpos para usarla.
+
+    Tiene que llamarse antes del primer import de escpos; después no tiene
+    efecto. Si el usuario ya definió ESCPOS_CAPABILITIES_PICKLE_DIR, se
+    respeta su configuración.
+
+    Args:
+        profiles: Perfiles a incluir (por defecto, los de config.ini)
+        cache_dir: Directorio de la cache (por defecto el de cache del usuario)
+
+    Returns:
+        str: Directorio de la cache usada, o None si escpos carga el archivo completo
+    """
+    global _source_path
+
+    if "escpos.capabilities" in sys.modules:
+        logger.debug("escpos ya importado: no se usa la cache de capabilities")
+        return None
+    if os.environ.get(PICKLE_DIR_ENV):
+        return os.environ[PICKLE_DIR_ENV]
+
+    try:
+        from fiscalberry.common.Configberry import Configberry
+        if Configberry().get("SERVIDOR", "capabilities_cache", fallback="true").lower() in ("0", "false", "no"):
+            return None
+
+        source = source_capabilities_path()
+        if source is None:
+            logger.warning("No se encontró capabilities.json de escpos: se usa la carga normal")
+            return None
+        _source_path = source
+        if profiles is None:
+            profiles = configured_profiles()
+        profiles = sorted(set(profiles) | {DEFAULT_PROFILE})
+
+        st = os.stat(source)
+        signature = json.dumps([os.path.abspath(source), st.st_mtime_ns, st.st_size, profiles])
+        digest = hashlib.sha1(signature.encode("utf-8")).hexdigest()[:16]
+        if cache_dir is None:
+            import platformdirs
+            cache_dir = os.path.join(platformdirs.user_cache_dir("Fiscalberry"), "escpos-capabilities")
+        directory = os.path.join(cache_dir, digest)
+        compact_path = os.path.join(directory, "capabilities.json")
+        # mismo nombre que usa escpos.capabilities para su pickle
+        pickle_path = os.path.join(directory, f"{platform.python_version()}.capabilities.pickle")
+
+        if not (os.path.exists(compact_path) and os.path.exists(pickle_path)):
+            os.makedirs(directory, exist_ok=True)
+            compact = build_compact_capabilities(load_full_capabilities(), profiles)
+            # el JSON primero: escpos descarta el pickle si es más viejo que el archivo
+            _write_atomic(compact_path, lambda f: f.write(json.dumps(compact).encode("utf-8")))
+            _write_atomic(pickle_path, lambda f: pickle.dump(compact, f, protocol=2))
+            logger.info(f"Cache de capabilities de escpos creada en {directory} "
+                        f"(perfiles: {', '.join(compact['profiles'])})")
+            _remove_stale_caches(cache_dir, keep=digest)
+
+        os.environ[CAPABILITIES_FILE_ENV] = compact_path
+        os.environ[PICKLE_DIR_ENV] = directory
+        return directory
+
+    except Exception as e:
+        logger.warning(f"No se pudo preparar la cache de capabilities de escpos: {e}")
+        return None
+
+
+def load_full_capabilities() -> Dict[str, Any]:
+    """capabilities.json completo (con json, mucho más rápido que el yaml de escpos)."""
+    global _full_capabilities
+
+    with _full_capabilities_lock:
+        if _full_capabilities is None:
+            path = source_capabilities_path()
+            if path is None:
+                raise FileNotFoundError("No se encontró capabilities.json de escpos")
+            with open(path, encoding="utf-8") as f:
+                _full_capabilities = json.load(f)
+        return _full_capabilities
+
+
+def ensure_profile(name: Optional[str]):
+    """
+    Se asegura de que escpos conozca el perfil `name`.
+
+    Si la cache compacta no lo incluye, lo agrega desde el capabilities.json
+    completo (con los codepages que soporta).
+
+    Raises:
+        KeyError: Si el perfil no existe en capabilities.json
+    """
+    if not name:
+        return
+    from escpos.capabilities import CAPABILITIES
+
+    if name in CAPABILITIES["profiles"]:
+        return
+    full = load_full_capabilities()
+    if name not in full["profiles"]:
+        raise KeyError(f"Perfil de impresora desconocido: {name}")
+    extra = build_compact_capabilities(full, [name])
+    CAPABILITIES["encodings"].update(extra["encodings"])
+    CAPABILITIES["profiles"][name] = extra["profiles"][name]
+    logger.info(f"Perfil {name} cargado desde el capabilities.json completo")
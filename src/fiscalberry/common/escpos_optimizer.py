@@ -0,0 +1,416 @@
+# -*- coding: utf-8 -*-
+"""
+Optimizador (peephole) del flujo ESC/POS renderizado.
+
+EscPComandos llama a printer.set(...) antes de casi cada línea y reinicia una
+docena de atributos al empezar cada documento, así que la mayor parte de esos
+comandos no cambia nada. Esta pasada recorre el buffer ya renderizado siguiendo
+el estado de modo de la impresora (negrita, subrayado, fuente, tamaño,
+alineación, codepage, interlineado...) y:
+
+- descarta los cambios de modo que no cambian el estado vigente
+- descarta los cambios de modo que se pisan antes de imprimir nada
+- colapsa las corridas de saltos de línea en un único ESC d n
+
+Los textos que quedaban separados por comandos descartados quedan contiguos,
+y el buffer completo se transmite en una sola escritura (print_pipeline).
+
+Es conservador: no supone los valores de encendido (después de ESC @ el
+estado se considera desconocido) y ante cualquier comando que no conoce deja
+el resto del buffer sin tocar. diagnostics/escpos_optimizer_check.py verifica
+que la salida impresa sea idéntica.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ESC = 0x1B
+GS = 0x1D
+FS = 0x1C
+DLE = 0x10
+LF = 0x0A
+CR = 0x0D
+HT = 0x09
+
+# Tipos de token
+TEXT = "text"
+NEWLINE = "lf"
+MODE = "mode"
+COMMAND = "command"
+UNKNOWN = "unknown"
+
+# Saltos de línea consecutivos a partir de los cuales conviene ESC d n (3 bytes)
+MIN_FEED_RUN = 4
+
+
+def _digit(n: int) -> int:
+    # muchos comandos aceptan 0/1/2 o '0'/'1'/'2'
+    return n - 48 if 48 <= n <= 57 else n
+
+
+def _esc_bang(n: int) -> Dict[str, object]:
+    """ESC ! n fija a la vez fuente, negrita, tamaño doble y subrayado."""
+    return {
+        "font": n & 0x01,
+        "bold": (n >> 3) & 1,
+        "size": (2 if n & 0x20 else 1, 2 if n & 0x10 else 1),
+        "underline": "esc!" if n & 0x80 else 0,
+    }
+
+
+# Comandos de modo de un parámetro: (prefijo, comando) -> n -> {clave: valor}
+_MODE_1 = {
+    (ESC, ord("!")): _esc_bang,
+    (ESC, ord("E")): lambda n: {"bold": n & 1},
+    (ESC, ord("G")): lambda n: {"double_strike": n & 1},
+    (ESC, ord("-")): lambda n: {"underline": _digit(n)},
+    (ESC, ord("M")): lambda n: {"font": _digit(n)},
+    (ESC, ord("a")): lambda n: {"align": _digit(n)},
+    (ESC, ord("{")): lambda n: {"flip": n & 1},
+    (ESC, ord("V")): lambda n: {"rotate": _digit(n)},
+    (ESC, ord("U")): lambda n: {"unidirectional": n & 1},
+    (ESC, ord("t")): lambda n: {"codepage": n},
+    (ESC, ord("R")): lambda n: {"charset": n},
+    (ESC, ord("r")): lambda n: {"color": _digit(n)},
+    (ESC, ord(" ")): lambda n: {"char_spacing": n},
+    (ESC, ord("3")): lambda n: {"line_spacing": ("3", n)},
+    (ESC, ord("+")): lambda n: {"line_spacing": ("+", n)},
+    (GS, ord("!")): lambda n: {"size": ((n >> 4) + 1, (n & 0x0F) + 1)},
+    (GS, ord("B")): lambda n: {"invert": n & 1},
+    (GS, ord("b")): lambda n: {"smooth": n & 1},
+    (GS, ord("|")): lambda n: {"density": n},
+    (GS, ord("H")): lambda n: {"hri_position": _digit(n)},
+    (GS, ord("f")): lambda n: {"hri_font": _digit(n)},
+    (GS, ord("h")): lambda n: {"barcode_height": n},
+    (GS, ord("w")): lambda n: {"barcode_width": n},
+}
+
+# Comandos de modo de dos parámetros (nL nH)
+_MODE_2 = {
+    (GS, ord("L")): "left_margin",
+    (GS, ord("W")): "print_width",
+}
+
+# Modos que la impresora solo acepta al principio de la línea
+LINE_START_KEYS = {"align", "flip", "left_margin", "print_width"}
+
+# Comandos sin efecto sobre el modo, por largo total (incluido el prefijo)
+_FIXED_COMMANDS = {
+    (ESC, ord("@")): 2,   # inicializar
+    (ESC, ord("d")): 3,   # imprimir y avanzar n líneas
+    (ESC, ord("J")): 3,   # imprimir y avanzar n puntos
+    (ESC, ord("e")): 3,   # imprimir y retroceder n líneas
+    (ESC, ord("p")): 5,   # pulso de cajón
+    (ESC, ord("B")): 4,   # buzzer
+    (ESC, ord("=")): 3,   # seleccionar periférico
+    (ESC, ord("$")): 4,   # posición absoluta
+    (ESC, ord("\\")): 4,  # posición relativa
+    (ESC, ord("?")): 3,   # borrar carácter definido por el usuario
+    (ESC, ord("i")): 2,   # corte parcial
+    (ESC, ord("m")): 2,   # corte parcial
+    (ESC, ord("S")): 2,   # modo estándar
+    (ESC, ord("T")): 3,   # dirección en modo página
+    (GS, ord("P")): 4,    # unidades de movimiento
+    (GS, ord("a")): 3,    # estado automático (ASB)
+    (GS, ord("r")): 3,    # enviar estado
+    (GS, ord("I")): 3,    # id de la impresora
+    (GS, ord("T")): 3,    # inicio de línea en modo página
+    (GS, ord("/")): 3,    # imprimir imagen descargada
+    (GS, ord("$")): 4,
+    (GS, ord("\\")): 4,
+    (FS, ord(".")): 2,    # modo kanji
+    (FS, ord("&")): 2,
+    (FS, ord("!")): 3,
+    (FS, ord("-")): 3,
+    (FS, ord("W")): 3,
+    (FS, ord("p")): 4,    # imagen NV
+    (DLE, 0x04): 3,       # DLE EOT n (estado en tiempo real)
+    (DLE, 0x05): 3,       # DLE ENQ n
+}
+
+# Comandos que no imprimen ni mueven el papel (no cambian la posición en la línea)
+NON_PRINTING = {
+    (ESC, ord("p")), (ESC, ord("B")), (ESC, ord("=")), (ESC, ord("?")), (GS, ord("a")), (GS, ord("r")),
+    (GS, ord("I")), (GS, ord("P")), (FS, ord(".")), (FS, ord("&")), (FS, ord("!")),
+    (FS, ord("-")), (FS, ord("W")), (DLE, 0x04), (DLE, 0x05), (DLE, 0x14),
+}
+
+# Comandos después de los cuales se está al principio de una línea
+_FEEDS = {(ESC, ord("@")), (ESC, ord("d")), (ESC, ord("J")), (ESC, ord("e"))}
+
+
+class Token:
+    """Fragmento del flujo ESC/POS."""
+
+    __slots__ = ("kind", "raw", "values", "key")
+
+    def __init__(self, kind: str, raw: bytes, values: Optional[Dict[str, object]] = None,
+                 key: Optional[Tuple[int, int]] = None):
+        self.kind = kind
+        self.raw = raw
+        # MODE: valores de estado que fija el comando
+        self.values = values
+        # MODE / COMMAND: (prefijo, comando)
+        self.key = key
+
+    def __repr__(self):
+        return f"Token({self.kind}, {self.raw!r})"
+
+
+def _command_length(data: bytes, i: int, key: Tuple[int, int]) -> Optional[int]:
+    """Largo de un comando con datos (imágenes, códigos, funciones), o None si no se conoce."""
+    size = len(data) - i
+
+    def at(offset):
+        return data[i + offset] if offset < size else None
+
+    prefix, cmd = key
+
+    if cmd == ord("(") and prefix in (ESC, GS, FS):
+        # ESC ( fn / GS ( fn / FS ( fn: pL pH + datos
+        if at(4) is None:
+            return None
+        return 5 + at(3) + at(4) * 256
+
+    if key == (GS, ord("v")):
+        # GS v 0 m xL xH yL yH d1...dk (imagen raster)
+        if at(7) is None or at(2) not in (0, 48):
+            return None
+        return 8 + (at(4) + at(5) * 256) * (at(6) + at(7) * 256)
+
+    if key == (GS, ord("8")):
+        # GS 8 L p1 p2 p3 p4 + datos
+        if at(6) is None or at(2) != ord("L"):
+            return None
+        return 7 + at(3) + (at(4) << 8) + (at(5) << 16) + (at(6) << 24)
+
+    if key == (GS, ord("*")):
+        # GS * x y + x*y*8 bytes (imagen descargada)
+        if at(3) is None:
+            return None
+        return 4 + at(2) * at(3) * 8
+
+    if key == (ESC, ord("*")):
+        # ESC * m nL nH + datos (imagen de bits)
+        if at(4) is None:
+            return None
+        columns = at(3) + at(4) * 256
+        if at(2) in (0, 1):
+            return 5 + columns
+        if at(2) in (32, 33):
+            return 5 + 3 * columns
+        return None
+
+    if key == (GS, ord("k")):
+        # GS k m: m 0-6 terminado en NUL, m 65-79 con largo n
+        m = at(2)
+        if m is None:
+            return None
+        if m <= 6:
+            end = data.find(b"\x00", i + 3)
+            return end - i + 1 if end >= 0 else None
+        if 65 <= m <= 79 and at(3) is not None:
+            return 4 + at(3)
+        return None
+
+    if key == (GS, ord("V")):
+        # GS V m [n] (corte)
+        m = at(2)
+        if m in (0, 1, 48, 49):
+            return 3
+        if m in (65, 66, 97, 98, 103, 104):
+            return 4
+        return None
+
+    if key == (ESC, ord("D")):
+        # ESC D n1...nk NUL (tabulaciones)
+        end = data.find(b"\x00", i + 2, i + 2 + 33)
+        return end - i + 1 if end >= 0 else None
+
+    if key == (ESC, ord("c")):
+        # ESC c 3 n / ESC c 4 n / ESC c 5 n
+        return 4 if at(2) in (ord("3"), ord("4"), ord("5")) else None
+
+    if key == (DLE, 0x14):
+        # DLE DC4 fn m t
+        return 5 if at(2) in (1, 2) else None
+
+    return None
+
+
+def tokenize(data: bytes) -> Iterator[Token]:
+    """
+    Divide un flujo ESC/POS en tokens. Concatenar los raw devuelve exactamente `data`.
+
+    Ante un comando desconocido o truncado emite un único token UNKNOWN con el
+    resto del flujo y termina.
+    """
+    i = 0
+    size = len(data)
+    while i < size:
+        byte = data[i]
+
+        if byte >= 0x20 or byte in (HT, CR):
+            start = i
+            while i < size and (data[i] >= 0x20 or data[i] in (HT, CR)):
+                i += 1
+            yield Token(TEXT, data[start:i])
+            continue
+
+        if byte == LF:
+            i += 1
+            yield Token(NEWLINE, b"\n")
+            continue
+
+        if byte not in (ESC, GS, FS, DLE) or i + 1 >= size:
+            break
+
+        key = (byte, data[i + 1])
+
+        if key == (ESC, ord("2")):
+            yield Token(MODE, data[i:i + 2], {"line_spacing": "default"}, key)
+            i += 2
+            continue
+
+        if key in _MODE_1:
+            if i + 2 >= size:
+                break
+            yield Token(MODE, data[i:i + 3], _MODE_1[key](data[i + 2]), key)
+            i += 3
+            continue
+
+        if key in _MODE_2:
+            if i + 3 >= size:
+                break
+            value = data[i + 2] + data[i + 3] * 256
+            yield Token(MODE, data[i:i + 4], {_MODE_2[key]: value}, key)
+            i += 4
+            continue
+
+        length = _FIXED_COMMANDS.get(key) or _command_length(data, i, key)
+        if length is None or i + length > size:
+            break
+        yield Token(COMMAND, data[i:i + length], key=key)
+        i += length
+
+    if i < size:
+        yield Token(UNKNOWN, data[i:])
+
+
+class EscposOptimizer:
+    """
+    Optimiza un buffer ESC/POS.
+
+    Atributos con el resultado de la última pasada: `dropped` (comandos de
+    modo descartados), `feeds_collapsed` (corridas de saltos de línea
+    reemplazadas por ESC d n) y `bailed` (True si se encontró un comando
+    desconocido y el resto se dejó sin tocar).
+    """
+
+    def __init__(self, min_feed_run: int = MIN_FEED_RUN):
+        self.min_feed_run = int(min_feed_run)
+        self._reset()
+
+    def _reset(self):
+        self._out = bytearray()
+        # estado conocido de la impresora (clave ausente = desconocido)
+        self._state: Dict[str, object] = {}
+        # cambios de modo recibidos desde lo último impreso
+        self._pending: List[Token] = []
+        self._feeds = 0
+        self._line_start = False
+        self.dropped = 0
+        self.feeds_collapsed = 0
+        self.bailed = False
+
+    def optimize(self, data: bytes) -> bytes:
+        self._reset()
+        for token in tokenize(data):
+            if token.kind == MODE:
+                if self._line_start or not LINE_START_KEYS.intersection(token.values):
+                    self._pending.append(token)
+                    continue
+                # a mitad de línea la impresora lo ignora: se envía tal cual y el valor queda incierto
+                self._flush_pending()
+                self._emit(token.raw)
+                for key in token.values:
+                    self._state.pop(key, None)
+                continue
+
+            self._flush_pending()
+
+            if token.kind == UNKNOWN:
+                self.bailed = True
+                self._emit(token.raw)
+                break
+
+            if token.kind == NEWLINE:
+                self._feeds += 1
+                self._line_start = True
+                continue
+
+            self._emit(token.raw)
+            if token.kind == TEXT:
+                self._line_start = False
+            elif token.key == (ESC, ord("@")):
+                self._state.clear()
+                self._line_start = True
+            elif token.key in _FEEDS:
+                self._line_start = True
+            elif token.key not in NON_PRINTING:
+                self._line_start = False
+
+        self._flush_pending()
+        self._flush_feeds()
+        return bytes(self._out)
+
+    def _emit(self, raw: bytes):
+        self._flush_feeds()
+        self._out += raw
+
+    def _flush_feeds(self):
+        feeds, self._feeds = self._feeds, 0
+        if feeds < self.min_feed_run:
+            self._out += b"\n" * feeds
+            return
+        self.feeds_collapsed += 1
+        while feeds > 0:
+            chunk = min(feeds, 255)
+            self._out += bytes((ESC, ord("d"), chunk))
+            feeds -= chunk
+
+    def _flush_pending(self):
+        """Envía el mínimo de cambios de modo pendientes que lleva al mismo estado."""
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = []
+
+        target = dict(self._state)
+        last_writer = {}
+        for index, token in enumerate(pending):
+            target.update(token.values)
+            for key in token.values:
+                last_writer[key] = index
+
+        missing = object()
+        keep = {last_writer[key] for key in last_writer
+                if self._state.get(key, missing) != target[key]}
+        while True:
+            # un comando que fija varias cosas (ESC !) puede pisar una que no se iba a reenviar
+            simulated = dict(self._state)
+            for index in sorted(keep):
+                simulated.update(pending[index].values)
+            wrong = [key for key in last_writer if simulated.get(key, missing) != target[key]]
+            if not wrong:
+                break
+            keep.update(last_writer[key] for key in wrong)
+
+        for index in sorted(keep):
+            self._emit(pending[index].raw)
+        self.dropped += len(pending) - len(keep)
+        self._state = target
+
+
+def optimize_escpos(data: bytes) -> bytes:
+    """Optimiza un buffer ESC/POS (ver EscposOptimizer)."""
+    return EscposOptimizer().optimize(data)
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Comandos de control rápidos (apertura de cajón, buzzer, estado).
+
+Son comandos de una sola secuencia ESC/POS que no necesitan renderizar nada:
+se envían los bytes ya codificados directamente por la conexión del pool, sin
+crear un EscposIO ni reinicializar el formato de la impresora.
+"""
+
+import select
+import socket
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+from escpos.constants import BUZZER, CD_KICK_2, CD_KICK_5
+from escpos.escpos import Escpos
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Pulsos de apertura de cajón
+DRAWER_PULSES = {
+    2: CD_KICK_2,
+    5: CD_KICK_5,
+    # Secuencia alternativa para impresoras que requieren otro tiempo de pulso
+    "alt": b"\x1b\x70\x00\x19\x19",
+}
+
+# Consultas de estado en tiempo real (DLE EOT n)
+DLE_EOT_PRINTER = b"\x10\x04\x01"
+DLE_EOT_OFFLINE = b"\x10\x04\x02"
+DLE_EOT_PAPER = b"\x10\x04\x04"
+
+# Tiempo máximo de espera de la respuesta a una consulta de estado (segundos)
+STATUS_TIMEOUT = 1.0
+
+# Acciones que se resuelven por el camino rápido
+EXPRESS_ACTIONS = {"openDrawer", "buzzer", "getStatus"}
+
+# Claves del ticket que no son acciones
+NON_ACTION_KEYS = {"printerName", "priority", "ttl"}
+
+
+def is_express(ticket: dict) -> bool:
+    """True si todas las acciones del ticket son comandos de control rápidos."""
+    actions = [key for key in ticket if key not in NON_ACTION_KEYS]
+    return bool(actions) and all(action in EXPRESS_ACTIONS for action in actions)
+
+
+def drawer_pulse(params=None) -> bytes:
+    """
+    Secuencia de apertura de cajón.
+
+    Acepta {"pin": 2|5} o {"alt": true}. Por defecto el pin 2.
+    """
+    if isinstance(params, dict):
+        if params.get("alt"):
+            return DRAWER_PULSES["alt"]
+        return DRAWER_PULSES.get(int(params.get("pin", 2)), CD_KICK_2)
+    return CD_KICK_2
+
+
+@lru_cache(maxsize=None)
+def buzzer_bytes(times: int = 1, duration: int = 1) -> bytes:
+    """Secuencia del buzzer (mismos límites que Escpos.buzzer)."""
+    if not 1 <= times <= 9:
+        raise ValueError("times must be between 1 and 9")
+    if not 1 <= duration <= 9:
+        raise ValueError("duration must be between 1 and 9")
+    return BUZZER + bytes((times, duration))
+
+
+def _read_byte(driver, timeout: float) -> Optional[int]:
+    """Lee un byte de respuesta del driver, o None si no responde a tiempo."""
+    device = getattr(driver, "_device", None)
+
+    if isinstance(device, socket.socket):
+        readable, _, _ = select.select([device], [], [], timeout)
+        if not readable:
+            return None
+        data = device.recv(16)
+        return data[-1] if data else None
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        data = driver._read()
+        if data:
+            return data[-1]
+        time.sleep(0.01)
+    return None
+
+
+def _drain(driver):
+    """Descarta respuestas viejas que hayan quedado en una conexión de red reutilizada."""
+    device = getattr(driver, "_device", None)
+    if isinstance(device, socket.socket):
+        while select.select([device], [], [], 0)[0]:
+            if not device.recv(64):
+                break
+
+
+def query_status(driver, timeout: float = STATUS_TIMEOUT) -> Dict[str, Any]:
+    """
+    Estado en tiempo real de la impresora (DLE EOT).
+
+    Returns:
+        dict: {"online", "cover_open", "paper"} donde paper es "ok",
+        "near_end" o "out". Si la conexión no permite leer (File, Win32Raw,
+        CUPS) devuelve {"supported": False}; si no responde, online=False.
+    """
+    if getattr(getattr(driver, "_read", None), "__func__", Escpos._read) is Escpos._read:
+        # el driver no implementa lectura (el del pool viene envuelto en LeasedDriver)
+        return {"supported": False}
+
+    _drain(driver)
+
+    driver._raw(DLE_EOT_PRINTER)
+    printer_status = _read_byte(driver, timeout)
+    if printer_status is None:
+        return {"supported": True, "online": False, "responding": False}
+
+    driver._raw(DLE_EOT_OFFLINE)
+    offline_cause = _read_byte(driver, timeout) or 0
+    driver._raw(DLE_EOT_PAPER)
+    paper_status = _read_byte(driver, timeout) or 0
+
+    if paper_status & 0x60:
+        paper = "out"
+    elif paper_status & 0x0C:
+        paper = "near_end"
+    else:
+        paper = "ok"
+
+    return {
+        "supported": True,
+        "responding": True,
+        "online": not printer_status & 0x08,
+        "cover_open": bool(offline_cause & 0x04),
+        "paper": paper,
+    }
+
+
+def run_express(driver, ticket: dict) -> List[Dict[str, Any]]:
+    """
+    Ejecuta un ticket de comandos rápidos sobre un driver ya abierto.
+
+    Las secuencias consecutivas se envían en una sola escritura.
+
+    Returns:
+        list: [{"action": ..., "rta": ...}] con el mismo formato que EscPComandos.run
+    """
+    rta = []
+    pending = bytearray()
+
+    for action, params in ticket.items():
+        if action in NON_ACTION_KEYS:
+            continue
+
+        if action == "openDrawer":
+            pending += drawer_pulse(params)
+            rta.append({"action": action, "rta": {"status": "success", "message": "Cajón abierto correctamente"}})
+        elif action == "buzzer":
+            if isinstance(params, dict):
+                pending += buzzer_bytes(int(params.get("times", 1)), int(params.get("duration", 1)))
+            else:
+                pending += buzzer_bytes()
+            rta.append({"action": action, "rta": True})
+        elif action == "getStatus":
+            if pending:
+                driver._raw(bytes(pending))
+                pending.clear()
+            rta.append({"action": action, "rta": query_status(driver)})
+
+    if pending:
+        driver._raw(bytes(pending))
+
+    return rta
@@ -141,31 +141,25 @@ class FiscalberrySio:
             try:
                 # Crear un handler de comandos para procesar
                 handler = ComandosHandler()
+                start_time = time.time()
                 
-                # Procesar comando de forma no bloqueante
-                def process_command():
-                    try:
-                        start_time = time.time()
-                        result = handler.send_command(cfg)
-                        processing_time = time.time() - start_time
+                def on_result(result):
+                    processing_time = time.time() - start_time
+                    
+                    # Log optimizado para comandos lentos
+                    if processing_time > 1.0:
+                        logger.warning(f"Comando lento procesado en {processing_time:.2f}s")
+                    else:
+                        logger.debug(f"Comando procesado en {processing_time:.2f}s")
                         
-                        # Log optimizado para comandos lentos
-                        if processing_time > 1.0:
-                            logger.warning(f"Comando lento procesado en {processing_time:.2f}s")
-                        else:
-                            logger.debug(f"Comando procesado en {processing_time:.2f}s")
-                            
-                        # Enviar respuesta de vuelta si es necesario
-                        if result and "err" in result:
-                            logger.error(f"Error procesando comando: {result['err']}")
-                        else:
-                            logger.debug("Comando procesado exitosamente")
-                            
-                    except Exception as e:
-                        logger.error(f"Error procesando comando: {e}", exc_info=True)
+                    # Enviar respuesta de vuelta si es necesario
+                    if result and "err" in result:
+                        logger.error(f"Error procesando comando: {result['err']}")
+                    else:
+                        logger.debug("Comando procesado exitosamente")
                 
-                # Ejecutar en hilo separado para no bloquear SocketIO
-                threading.Thread(target=process_command, daemon=True).start()
+                # Encolar sin bloquear SocketIO: la respuesta llega por callback
+                handler.submit_command(cfg, callback=on_result)
                 
             except Exception as e:
                 logger.error(f"Error en manejo de comando SocketIO: {e}", exc_info=True)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Deduplicación de trabajos de impresión.
+
+Las reentregas de RabbitMQ, los reintentos de SocketIO y el doble toque en el
+POS generan el mismo trabajo varias veces. Cada trabajo se identifica por el
+message_id / correlation_id del mensaje cuando existe, o si no por un hash del
+contenido normalizado dentro de una ventana corta. Un duplicado recibe el
+resultado del trabajo original en lugar de volver a imprimirse.
+
+Los comandos de control (openDrawer, buzzer, getStatus) solo se deduplican por
+message_id: abrir el cajón dos veces seguidas es normal, y getStatus responde
+el estado actual.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Optional, Tuple
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Ventana en la que dos trabajos con el mismo contenido se consideran duplicados (segundos)
+DEFAULT_CONTENT_WINDOW = 10.0
+
+# Tiempo que se recuerda un message_id (segundos)
+DEFAULT_ID_TTL = 600.0
+
+# Cantidad máxima de trabajos recordados
+DEFAULT_MAX_ENTRIES = 2000
+
+
+def job_key(ticket: dict, message_id: Optional[str] = None, content_hash: bool = True) -> Optional[str]:
+    """
+    Clave de idempotencia de un trabajo.
+
+    Args:
+        ticket: JSON del trabajo (incluye printerName)
+        message_id: message_id o correlation_id del mensaje, si lo trae
+        content_hash: False para no deduplicar por contenido (comandos de control)
+
+    Returns:
+        str: "id:<message_id>" o "hash:<sha256 del contenido normalizado>", o
+        None si el trabajo no se deduplica
+    """
+    if message_id:
+        return f"id:{message_id}"
+    if not content_hash:
+        return None
+    normalized = json.dumps(ticket, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return "hash:" + hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class JobDedupCache:
+    """
+    Cache acotada y con vencimiento de los trabajos recientes.
+
+    Guarda el Future de cada trabajo: un duplicado que llega mientras el
+    original se imprime espera ese mismo Future, y uno que llega después
+    recibe el resultado ya resuelto. Los trabajos fallidos se olvidan para
+    que un reintento vuelva a imprimir.
+    """
+
+    def __init__(self, content_window: float = DEFAULT_CONTENT_WINDOW,
+                 id_ttl: float = DEFAULT_ID_TTL, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.content_window = content_window
+        self.id_ttl = id_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, future)
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def enabled_for(self, key: Optional[str]) -> bool:
+        """False si el trabajo no se deduplica (sin clave, o por contenido con ventana 0)."""
+        return key is not None and (key.startswith("id:") or self.content_window > 0)
+
+    def claim(self, key: Optional[str], future: Future) -> Tuple[bool, Future]:
+        """
+        Registra un trabajo nuevo o devuelve el original si es un duplicado.
+
+        Returns:
+            (nuevo, future): nuevo=True si hay que imprimirlo; si es un
+            duplicado, `future` es el del trabajo original
+        """
+        if not self.enabled_for(key):
+            return True, future
+
+        now = time.monotonic()
+        ttl = self.id_ttl if key.startswith("id:") else self.content_window
+        with self._lock:
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is not None:
+                self.duplicates += 1
+                return False, entry[1]
+            self._entries[key] = (now + ttl, future)
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        future.add_done_callback(lambda f: self._on_done(key, f))
+        return True, future
+
+    def forget(self, key: str, future: Optional[Future] = None):
+        """Olvida un trabajo (solo si sigue asociado a `future`, cuando se indica)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (future is None or entry[1] is future):
+                del self._entries[key]
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _on_done(self, key: str, future: Future):
+        try:
+            result = future.result()
+        except Exception:
+            result = None
+        if not isinstance(result, dict) or "err" in result or result.get("success") is False:
+            self.forget(key, future)
+        elif isinstance(result.get("rta"), dict) and "error" in result["rta"]:
+            # impresora inexistente / mal configurada: se puede reintentar
+            self.forget(key, future)
+
+    def _expire(self, now: float):
+        """Elimina las entradas vencidas. Requiere el lock."""
+        expired = [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]
+        for k in expired:
+            del self._entries[k]
+
+
+_job_dedup_instance = None
+_job_dedup_lock = threading.Lock()
+
+
+def get_job_dedup() -> JobDedupCache:
+    """
+    Obtiene la instancia singleton de la cache de deduplicación.
+
+    Returns:
+        JobDedupCache: Configurada con SERVIDOR.dedup_window y SERVIDOR.dedup_id_ttl
+    """
+    global _job_dedup_instance
+
+    with _job_dedup_lock:
+        if _job_dedup_instance is None:
+            content_window, id_ttl = DEFAULT_CONTENT_WINDOW, DEFAULT_ID_TTL
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                config = Configberry()
+                content_window = float(config.get("SERVIDOR", "dedup_window", fallback=DEFAULT_CONTENT_WINDOW))
+                id_ttl = float(config.get("SERVIDOR", "dedup_id_ttl", fallback=DEFAULT_ID_TTL))
+            except Exception as e:
+                logger.warning(f"Configuración de deduplicación inválida, usando valores por defecto: {e}")
+            _job_dedup_instance = JobDedupCache(content_window=content_window, id_ttl=id_ttl)
+        return _job_dedup_instance
@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Pipeline de impresión en dos etapas.
+
+1. Render: el ticket se formatea con EscPComandos sobre una impresora Dummy con
+   el mismo perfil que la real, y queda como un buffer de bytes ESC/POS que
+   pasa por el optimizador (escpos_optimizer). Todo el trabajo de CPU
+   (formato, QR, imágenes, codificación) se hace acá, sin ninguna conexión
+   abierta.
+2. Transmisión: el buffer se envía a la impresora en una sola escritura.
+
+Así la conexión a la impresora se ocupa solo mientras se transmiten los bytes.
+
+Un mismo ticket enviado a varias impresoras (fan-out) se renderiza una sola
+vez por formato distinto (perfil, columnas, codepage) con SharedRender.
+
+Un lote (batch) renderiza varios documentos para la misma impresora y los
+transmite en una sola sesión: una conexión (un trabajo del spooler en
+Win32Raw/CUPS) para todos, con los comandos rápidos (cajón, buzzer) en el
+medio y, si se pide, un único corte al final.
+"""
+
+import concurrent.futures
+import copy
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Union
+
+from escpos.printer import Dummy
+
+from fiscalberry.common.EscPComandos import EscPComandos
+from fiscalberry.common.codepage_encoder import pin_codepage
+from fiscalberry.common.escpos_optimizer import optimize_escpos
+from fiscalberry.common.express_commands import is_express, run_express, NON_ACTION_KEYS
+from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.printer_pool import get_printer_pool, connection_key, POOLABLE_DRIVERS
+
+logger = getLogger()
+
+# Líneas de avance entre documentos de un lote con corte único
+BATCH_SEPARATOR_FEED = 3
+
+
+class DriverError(Exception):
+    pass
+
+
+class BatchError(Exception):
+    """Falló la transmisión de un lote; `results` tiene el resultado de cada documento."""
+
+    def __init__(self, results: List[Dict[str, Any]], cause: Exception):
+        super().__init__(str(cause))
+        self.results = results
+        self.cause = cause
+
+
+class RenderedTicket:
+    """Ticket ya renderizado, listo para transmitir."""
+
+    __slots__ = ("data", "result", "columns")
+
+    def __init__(self, data: bytes, result: List[Any], columns=None):
+        self.data = data
+        self.result = result
+        self.columns = columns
+
+    def __len__(self):
+        return len(self.data)
+
+
+class _UncutDummy(Dummy):
+    """Dummy que reemplaza los cortes de papel por un avance corto (documentos de un lote)."""
+
+    def cut(self, mode: str = "FULL", feed: bool = True) -> None:
+        self.print_and_feed(BATCH_SEPARATOR_FEED)
+
+
+def create_renderer(spec, cut: bool = True) -> Dummy:
+    """Impresora Dummy con el perfil y la codificación de la impresora real."""
+    renderer_class = Dummy if cut else _UncutDummy
+    renderer = renderer_class(profile=spec.driver_ops.get("profile"),
+                              magic_encode_args=spec.driver_ops.get("magic_encode_args"))
+    if spec.codepage:
+        pin_codepage(renderer, spec.codepage)
+    return renderer
+
+
+def render_ticket(spec, jsonTicket: dict, cut: bool = True) -> RenderedTicket:
+    """
+    Etapa 1: renderiza un ticket a bytes sin tocar la impresora.
+
+    Args:
+        spec: PrinterSpec de la impresora destino (perfil y columnas)
+        jsonTicket: Acciones del ticket (sin printerName)
+        cut: False reemplaza los cortes de papel por un avance corto
+
+    Returns:
+        RenderedTicket: bytes ESC/POS y respuesta de cada acción (igual que EscPComandos.run)
+    """
+    renderer = create_renderer(spec, cut)
+    result = EscPComandos(renderer, columns=spec.columns).run(jsonTicket)
+    data = renderer.output
+    if spec.optimize:
+        # menos bytes: se nota en impresoras serie y Bluetooth
+        optimized = optimize_escpos(data)
+        logger.debug(f"Ticket optimizado: {len(data)} -> {len(optimized)} bytes")
+        data = optimized
+    return RenderedTicket(data, result, spec.columns)
+
+
+class SharedRender:
+    """
+    Render de un ticket compartido entre los destinos de un fan-out.
+
+    El primer destino de cada formato (PrinterSpec.render_key) lo renderiza;
+    los demás esperan y reutilizan esos bytes.
+    """
+
+    def __init__(self, jsonTicket: dict):
+        self.ticket = {key: value for key, value in jsonTicket.items() if key not in NON_ACTION_KEYS}
+        self.renders = 0
+        self._rendered: Dict[Any, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, spec) -> RenderedTicket:
+        key = spec.render_key
+        with self._lock:
+            future = self._rendered.get(key)
+            owner = future is None
+            if owner:
+                future = self._rendered[key] = concurrent.futures.Future()
+                self.renders += 1
+        if owner:
+            try:
+                # copia: EscPComandos puede modificar los parámetros de las acciones
+                future.set_result(render_ticket(spec, copy.deepcopy(self.ticket)))
+            except Exception as e:
+                future.set_exception(e)
+        return future.result()
+
+
+def open_driver(spec):
+    """
+    Crea el driver de la impresora. Los drivers de flujo se conectan en el acto.
+
+    Raises:
+        DriverError: Si no se puede crear o conectar
+    """
+    try:
+        driver = spec.create_driver()
+        if spec.driver_name in POOLABLE_DRIVERS:
+            # conectar ya: una impresora inaccesible falla acá y no a mitad del envío
+            driver.open()
+        return driver
+    except Exception as e:
+        raise DriverError(f"Error creando driver {spec.driver_name}: {e}")
+
+
+@contextmanager
+def printer_session(spec):
+    """
+    Driver conectado a la impresora para una o varias escrituras.
+
+    Los drivers de flujo usan la conexión del pool; el resto (Win32Raw, CUPS,
+    LP, File) se abre y se cierra al salir, que es cuando envían el trabajo.
+    """
+    if spec.driver_name in POOLABLE_DRIVERS:
+        pool_key = connection_key(spec.driver_name, spec.driver_ops)
+        with get_printer_pool().connection(pool_key, lambda: open_driver(spec)) as driver:
+            yield driver
+        return
+
+    driver = open_driver(spec)
+    try:
+        yield driver
+    finally:
+        driver.close()
+
+
+def transmit(spec, data: bytes):
+    """Etapa 2: envía un buffer ya renderizado en una sola escritura."""
+    if not data:
+        return
+
+    with printer_session(spec) as driver:
+        driver._raw(data)
+
+
+def batch_documents(jsonTicket: dict) -> List[dict]:
+    """Acciones de cada documento de un lote (sin printerName, priority ni ttl)."""
+    return [{key: value for key, value in document.items() if key not in NON_ACTION_KEYS}
+            for document in jsonTicket["batch"]]
+
+
+def cut_sequence(spec) -> bytes:
+    """Avance y corte de papel con el perfil de la impresora."""
+    renderer = create_renderer(spec)
+    renderer.cut()
+    return renderer.output
+
+
+def render_batch(spec, documents: List[dict], single_cut: bool = False) -> List[Union[RenderedTicket, Exception, None]]:
+    """
+    Etapa 1 de un lote: renderiza cada documento por separado.
+
+    Args:
+        spec: PrinterSpec de la impresora destino
+        documents: Acciones de cada documento (batch_documents)
+        single_cut: Sin cortes entre documentos (transmit_batch corta al final)
+
+    Returns:
+        list: Por documento, su RenderedTicket, None si son comandos rápidos
+        (se ejecutan al transmitir) o la excepción si no se pudo renderizar
+    """
+    rendered = []
+    for document in documents:
+        if is_express(document):
+            rendered.append(None)
+            continue
+        try:
+            rendered.append(render_ticket(spec, document, cut=not single_cut))
+        except Exception as e:
+            logger.error(f"Error renderizando documento del lote para '{spec.name}': {e}")
+            rendered.append(e)
+    return rendered
+
+
+def transmit_batch(spec, documents: List[dict], rendered: List[Union[RenderedTicket, Exception, None]],
+                   single_cut: bool = False) -> List[Dict[str, Any]]:
+    """
+    Etapa 2 de un lote: transmite todos los documentos en una sola sesión.
+
+    Los documentos consecutivos se envían en una sola escritura; los comandos
+    rápidos se ejecutan en su lugar sobre la misma conexión.
+
+    Returns:
+        list: Por documento, {"rta": respuesta} o {"err": mensaje}
+
+    Raises:
+        BatchError: Si falla la conexión; trae el resultado de cada documento
+        (los ya enviados con "rta", el resto con "err")
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(documents)
+    printable = [index for index, item in enumerate(rendered) if isinstance(item, RenderedTicket)]
+    last_printable = printable[-1] if printable else None
+    pending = bytearray()
+    pending_docs = []
+
+    def flush(driver):
+        if pending:
+            driver._raw(bytes(pending))
+            pending.clear()
+        for index in pending_docs:
+            results[index] = {"rta": rendered[index].result}
+        pending_docs.clear()
+
+    try:
+        with printer_session(spec) as driver:
+            for index, (document, item) in enumerate(zip(documents, rendered)):
+                if isinstance(item, Exception):
+                    results[index] = {"err": f"Error renderizando el documento: {item}"}
+                elif item is None:
+                    flush(driver)
+                    results[index] = {"rta": run_express(driver, document)}
+                else:
+                    pending.extend(item.data)
+                    if single_cut and index == last_printable:
+                        pending.extend(cut_sequence(spec))
+                    pending_docs.append(index)
+            flush(driver)
+    except Exception as e:
+        for index, result in enumerate(results):
+            if result is None:
+                results[index] = {"err": f"No se imprimió: {e}"}
+        raise BatchError(results, e) from e
+
+    return results
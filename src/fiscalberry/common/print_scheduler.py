@@ -0,0 +1,720 @@
+# -*- coding: utf-8 -*-
+"""
+Planificador de trabajos de impresión con una cola por impresora.
+
+Cada impresora tiene su propia cola (PrinterLane) que se atiende por prioridad
+y, dentro de la misma prioridad, en orden FIFO. Un pool de workers compartido
+atiende las distintas impresoras en paralelo, rotando entre ellas (round-robin)
+para que una impresora lenta o colgada solo ocupe sus propios workers y no
+frene al resto del local.
+
+Cada trabajo puede tener un vencimiento (deadline): los vencidos o cancelados
+se descartan antes de imprimirse, y un watchdog avisa de los trabajos que
+llevan demasiado tiempo imprimiéndose mientras todavía están en curso.
+
+Mientras una impresora está ocupada, el próximo trabajo de su cola se prepara
+(renderiza) en segundo plano, así queda listo para transmitirse apenas termina
+el actual y la impresora no queda esperando a Python entre un ticket y otro.
+
+El pool de workers es adaptativo: arranca con `min_workers` threads con el
+primer trabajo, suma uno cada vez que hay una impresora lista para imprimir y
+ningún worker libre (los demás están bloqueados transmitiendo a sus
+impresoras), hasta `max_workers`, y los que quedan sin trabajo más de
+`idle_timeout` segundos terminan, hasta volver a `min_workers`.
+"""
+
+import itertools
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.rabbitmq.error_publisher import publish_error
+
+logger = getLogger()
+
+# Clases de prioridad (menor número = se imprime antes)
+PRIORITY_CONTROL = 0   # apertura de cajón, buzzer, estado
+PRIORITY_COMANDA = 1   # comandas de cocina y textos
+PRIORITY_FISCAL = 2    # facturas, remitos, comandos de impresora fiscal
+PRIORITY_REPORT = 3    # arqueos, pedidos de compra
+
+PRIORITY_NAMES = {
+    "control": PRIORITY_CONTROL,
+    "comanda": PRIORITY_COMANDA,
+    "fiscal": PRIORITY_FISCAL,
+    "report": PRIORITY_REPORT,
+}
+
+# Prioridad por acción del ticket
+ACTION_PRIORITIES = {
+    "openDrawer": PRIORITY_CONTROL,
+    "buzzer": PRIORITY_CONTROL,
+    "getStatus": PRIORITY_CONTROL,
+    "printComanda": PRIORITY_COMANDA,
+    "printTexto": PRIORITY_COMANDA,
+    "printBytes": PRIORITY_COMANDA,
+    "printFacturaElectronica": PRIORITY_FISCAL,
+    "printRemito": PRIORITY_FISCAL,
+    "printArqueo": PRIORITY_REPORT,
+    "printPedido": PRIORITY_REPORT,
+}
+
+# Segundos de espera que equivalen a subir un nivel de prioridad (aging)
+DEFAULT_AGING = 10.0
+
+# Segundos que un trabajo espera a una impresora caída antes de avisar a quien
+# espera la respuesta (el trabajo sigue encolado)
+DEFAULT_PARK_TIMEOUT = 5.0
+
+# Threads que preparan (renderizan) el próximo trabajo de cada impresora
+DEFAULT_PREPARE_WORKERS = 2
+
+# Segundos sin trabajo después de los cuales un worker sobrante termina
+DEFAULT_WORKER_IDLE_TIMEOUT = 60.0
+
+# Peso de cada muestra en la utilización promedio del pool (promedio exponencial)
+UTILIZATION_ALPHA = 0.2
+
+
+def job_priority(ticket: dict) -> int:
+    """
+    Prioridad de un ticket.
+
+    Usa la clave "priority" del mensaje si viene (nombre de clase o número)
+    y si no la acción más urgente del ticket. Por defecto PRIORITY_FISCAL.
+    """
+    override = ticket.get("priority")
+    if override is not None:
+        if isinstance(override, str) and override.lower() in PRIORITY_NAMES:
+            return PRIORITY_NAMES[override.lower()]
+        try:
+            return min(max(int(override), PRIORITY_CONTROL), PRIORITY_REPORT)
+        except (TypeError, ValueError):
+            logger.warning(f"Prioridad inválida {override!r}, se usa la de la acción")
+
+    priorities = [ACTION_PRIORITIES[action] for action in ticket if action in ACTION_PRIORITIES]
+    return min(priorities) if priorities else PRIORITY_FISCAL
+
+
+def lane_key(printer_name) -> str:
+    """Devuelve la clave de cola para un printerName (str o dict de configuración)."""
+    if isinstance(printer_name, dict):
+        return json.dumps(printer_name, sort_keys=True)
+    return str(printer_name)
+
+
+class PrintJob:
+    """
+    Trabajo de impresión encolado para una impresora.
+
+    El resultado se entrega a través de `future` (concurrent.futures.Future),
+    así quien lo encola no necesita bloquear su thread esperando la impresión.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, printer_name, ticket: dict, priority: Optional[int] = None,
+                 deadline: Optional[float] = None):
+        self.job_id = next(self._ids)
+        self.printer_name = printer_name
+        self.lane_key = lane_key(printer_name)
+        self.ticket = ticket
+        self.priority = job_priority(ticket) if priority is None else priority
+        self.future = Future()
+        self.enqueued_at = time.time()
+        self.started_at = None
+        # time.time() a partir del cual el trabajo ya no se imprime (None = sin vencimiento)
+        self.deadline = deadline
+        self.cancelled = False
+        self.stuck = False
+        # Número de secuencia en el spool persistente (None si no se guardó)
+        self.spool_seq = None
+        # Callback on_parked(job) si espera más de park_timeout a una impresora
+        # caída (se llama una sola vez; el trabajo sigue encolado)
+        self.on_parked = None
+        # Future de la preparación en segundo plano (None si no se preparó)
+        self.prepared = None
+        # Render compartido con los otros destinos del mismo mensaje (fan-out)
+        self.shared_render = None
+        # Desvío desde otra impresora {"from", "to", "reason"} (None si no es un desvío)
+        self.rerouted = None
+        # Inicio y fin de la transmisión a la impresora (los marca el handler)
+        self.transmit_started = None
+        self.transmit_finished = None
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        return self.deadline is not None and (now or time.time()) > self.deadline
+
+    def reply(self, result: Dict[str, Any]):
+        """Entrega el resultado del trabajo (solo la primera vez)."""
+        if not self.future.done():
+            try:
+                self.future.set_result(result)
+            except Exception:
+                # otro thread lo completó primero
+                pass
+
+
+class PrinterLane:
+    """
+    Cola de una impresora con su límite de concurrencia.
+
+    Tiene una cola FIFO por clase de prioridad. Se atiende primero la clase
+    más urgente, pero cada `aging` segundos de espera un trabajo sube un nivel,
+    así los reportes largos terminan saliendo aunque lleguen comandas.
+    """
+
+    def __init__(self, key: str, concurrency: int = 1, aging: float = DEFAULT_AGING):
+        self.key = key
+        self.concurrency = max(1, int(concurrency))
+        self.aging = aging
+        self.queues = [deque() for _ in range(PRIORITY_REPORT + 1)]
+        self.size = 0
+        self.active = 0
+        self.scheduled = False
+        # la impresora está caída: no se despacha hasta que vuelva
+        self.parked = False
+        # time.time() desde el que la impresora no está disponible (None: disponible)
+        self.parked_at = None
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.prepared = 0
+        # Tiempo sin transmitir entre un trabajo y el siguiente que ya esperaba
+        self.last_transmit_end = None
+        self.idle_gaps = 0
+        self.idle_total = 0.0
+        self.idle_max = 0.0
+        self.idle_last = 0.0
+
+    def push(self, job: PrintJob):
+        self.queues[job.priority].append(job)
+        self.size += 1
+
+    def pop(self, now: float) -> PrintJob:
+        """Saca el trabajo con mejor prioridad efectiva (prioridad menos espera / aging)."""
+        self.size -= 1
+        return self._best_queue(now).popleft()
+
+    def peek(self, now: float) -> Optional[PrintJob]:
+        """Próximo trabajo que saldría con pop(now), sin sacarlo."""
+        if self.size == 0:
+            return None
+        return self._best_queue(now)[0]
+
+    def _best_queue(self, now: float) -> deque:
+        best = None
+        best_rank = None
+        for queue_ in self.queues:
+            if not queue_:
+                continue
+            head = queue_[0]
+            effective = head.priority
+            if self.aging > 0:
+                effective -= (now - head.enqueued_at) / self.aging
+            rank = (effective, head.job_id)
+            if best_rank is None or rank < best_rank:
+                best, best_rank = queue_, rank
+        return best
+
+    def remove(self, job: PrintJob) -> bool:
+        try:
+            self.queues[job.priority].remove(job)
+        except ValueError:
+            return False
+        self.size -= 1
+        return True
+
+    def pending_by_priority(self):
+        return [len(queue_) for queue_ in self.queues]
+
+    def can_run(self) -> bool:
+        return self.size > 0 and self.active < self.concurrency
+
+    def record_transmit(self, job: PrintJob):
+        """
+        Registra la transmisión de un trabajo terminado.
+
+        Si el trabajo ya estaba en cola cuando terminó la transmisión anterior,
+        el tiempo entre ambas es tiempo muerto de la impresora.
+        """
+        if job.transmit_started is None:
+            return
+        if self.last_transmit_end is not None and job.enqueued_at <= self.last_transmit_end:
+            gap = max(0.0, job.transmit_started - self.last_transmit_end)
+            self.idle_gaps += 1
+            self.idle_total += gap
+            self.idle_max = max(self.idle_max, gap)
+            self.idle_last = gap
+        if job.transmit_finished is not None:
+            self.last_transmit_end = max(self.last_transmit_end or 0.0, job.transmit_finished)
+
+    def idle_gap_status(self) -> Dict[str, Any]:
+        return {
+            "count": self.idle_gaps,
+            "avg_ms": round(self.idle_total / self.idle_gaps * 1000, 2) if self.idle_gaps else 0.0,
+            "max_ms": round(self.idle_max * 1000, 2),
+            "last_ms": round(self.idle_last * 1000, 2),
+        }
+
+
+class PrintScheduler:
+    """
+    Reparte los trabajos de impresión entre colas por impresora.
+
+    - Cada impresora se atiende por prioridad (con aging) y FIFO dentro de cada prioridad.
+    - Impresoras distintas se imprimen en paralelo.
+    - Cada impresora ocupa como máximo `concurrency` workers a la vez.
+    - Las impresoras con trabajos se atienden por turnos (un trabajo por turno).
+    - Los trabajos vencidos o cancelados se descartan sin imprimirse.
+    - Las impresoras que se sabe que están caídas no se atienden (sus trabajos
+      esperan hasta que vuelvan o venzan).
+    - Con `prepare`, mientras una impresora tiene todos sus workers ocupados el
+      próximo trabajo de su cola se prepara en segundo plano (doble buffer).
+    """
+
+    def __init__(self, handler: Callable[[PrintJob, int], bool],
+                 max_workers: int = 3, max_jobs: int = 500,
+                 concurrency_for: Optional[Callable[[Any], int]] = None,
+                 aging: float = DEFAULT_AGING,
+                 stuck_after: Optional[float] = None,
+                 on_stuck: Optional[Callable[[PrintJob, float], None]] = None,
+                 available: Optional[Callable[[str], bool]] = None,
+                 park_timeout: Optional[float] = DEFAULT_PARK_TIMEOUT,
+                 prepare: Optional[Callable[[PrintJob], Any]] = None,
+                 prepare_workers: int = DEFAULT_PREPARE_WORKERS,
+                 min_workers: Optional[int] = None,
+                 idle_timeout: float = DEFAULT_WORKER_IDLE_TIMEOUT):
+        """
+        Args:
+            handler: Función que procesa un trabajo: handler(job, worker_id).
+                Devuelve False si el trabajo falló.
+            max_workers: Cantidad máxima de workers del pool compartido
+            max_jobs: Capacidad total de trabajos pendientes (todas las impresoras)
+            concurrency_for: Función que devuelve la concurrencia de una impresora
+            aging: Segundos de espera para subir un nivel de prioridad (0 desactiva)
+            stuck_after: Segundos de impresión a partir de los cuales el watchdog
+                considera trabado un trabajo (None desactiva el watchdog)
+            on_stuck: Callback on_stuck(job, segundos) al detectar un trabajo trabado
+            available: Función available(lane_key) que indica si la impresora
+                puede recibir trabajos. Debe ser rápida (se llama con el lock tomado).
+            park_timeout: Segundos de espera a una impresora no disponible después
+                de los cuales se llama al on_parked de cada trabajo (None: nunca).
+                Los trabajos no se descartan: esperan hasta que vuelva o venzan.
+            prepare: Función prepare(job) que prepara un trabajo antes de que le
+                toque (por ejemplo renderizarlo). El resultado queda en el Future
+                `job.prepared`, que el handler puede usar o cancelar. No debe
+                modificar el ticket.
+            prepare_workers: Threads de preparación (0 desactiva la preparación)
+            min_workers: Workers que quedan aunque no haya trabajo (None: pool
+                fijo de max_workers)
+            idle_timeout: Segundos sin trabajo para que termine un worker sobrante
+        """
+        self.handler = handler
+        self.max_workers = max(1, max_workers)
+        self.min_workers = self.max_workers if min_workers is None else min(max(0, min_workers), self.max_workers)
+        self.idle_timeout = idle_timeout
+        self.max_jobs = max_jobs
+        self.concurrency_for = concurrency_for
+        self.aging = aging
+        self.stuck_after = stuck_after
+        self.on_stuck = on_stuck
+        self.available = available
+        self.park_timeout = park_timeout
+        self.prepare = prepare if prepare_workers > 0 else None
+        self.prepare_workers = prepare_workers
+        self._prepare_pool = None
+
+        self._lanes: Dict[str, PrinterLane] = {}
+        self._ready = deque()
+        self._parked = set()
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._jobs: Dict[int, PrintJob] = {}  # encolados o imprimiéndose
+        self._running = False
+        self._workers: Dict[int, threading.Thread] = {}
+        self._worker_ids = itertools.count()
+        # workers esperando trabajo y transmitiendo
+        self._idle = 0
+        self._busy = 0
+        self._peak_workers = 0
+        self._grown = 0
+        self._retired = 0
+        self._busy_seconds = 0.0
+        self._utilization = 0.0
+
+    def start(self):
+        """Inicia el pool con min_workers workers (submit lo inicia si hace falta)."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for _ in range(self.min_workers):
+                self._spawn_worker()
+        if self.prepare:
+            self._prepare_pool = ThreadPoolExecutor(max_workers=self.prepare_workers,
+                                                    thread_name_prefix="PrintPrepare")
+        threading.Thread(target=self._watchdog_loop, daemon=True, name="PrintWatchdog").start()
+        logger.debug(f"PrintScheduler iniciado con {self.min_workers} workers (máximo {self.max_workers})")
+
+    def stop(self, timeout: float = 2.0):
+        """Detiene los workers. Los trabajos pendientes quedan sin procesar."""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+            workers = list(self._workers.values())
+        for worker in workers:
+            worker.join(timeout)
+        if self._prepare_pool:
+            self._prepare_pool.shutdown(wait=False)
+            self._prepare_pool = None
+
+    def submit(self, job: PrintJob) -> PrintJob:
+        """
+        Encola un trabajo en la cola de su impresora.
+
+        Raises:
+            queue.Full: Si se alcanzó la capacidad total de trabajos pendientes
+        """
+        if not self._running:
+            self.start()
+        with self._cond:
+            if self._pending >= self.max_jobs:
+                raise queue.Full()
+
+            lane = self._get_lane(job)
+            lane.push(job)
+            self._jobs[job.job_id] = job
+            self._pending += 1
+            self._schedule(lane)
+            self._prepare_next(lane)
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancela un trabajo.
+
+        Un trabajo encolado se saca de la cola y se responde como cancelado.
+        Uno que ya se está imprimiendo no se interrumpe a mitad de la
+        transmisión, solo se marca (el handler puede consultarlo).
+
+        Returns:
+            bool: False si el trabajo no existe o ya terminó
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return False
+            job.cancelled = True
+            if job.started_at is not None:
+                return True
+            lane = self._lanes[job.lane_key]
+            if lane.remove(job):
+                self._pending -= 1
+                lane.dropped += 1
+            del self._jobs[job_id]
+            if job.prepared:
+                job.prepared.cancel()
+
+        logger.info(f"Trabajo {job_id} para '{job.lane_key}' cancelado")
+        job.reply({"success": False, "error": "Trabajo cancelado", "cancelled": True,
+                   "processing_time": 0})
+        return True
+
+    def resume(self):
+        """Vuelve a evaluar las impresoras en espera (llamar cuando una impresora vuelve)."""
+        with self._cond:
+            parked = list(self._parked)
+            self._parked.clear()
+            for lane in parked:
+                lane.parked = False
+                self._schedule(lane)
+
+    def qsize(self) -> int:
+        """Cantidad total de trabajos pendientes (sin contar los que se están imprimiendo)."""
+        return self._pending
+
+    def load(self, key: str) -> int:
+        """Trabajos en cola o imprimiéndose en una impresora."""
+        lane = self._lanes.get(key)
+        return lane.size + lane.active if lane is not None else 0
+
+    def pool_status(self) -> Dict[str, Any]:
+        """Tamaño y utilización del pool de workers."""
+        with self._cond:
+            size = len(self._workers)
+            return {
+                "size": size,
+                "min_workers": self.min_workers,
+                "max_workers": self.max_workers,
+                "busy": self._busy,
+                "idle": self._idle,
+                "peak": self._peak_workers,
+                "grown": self._grown,
+                "retired": self._retired,
+                # fracción de los workers ocupados (promedio reciente e instantánea)
+                "utilization": round(self._utilization, 3),
+                "utilization_now": round(self._busy / size, 3) if size else 0.0,
+                "busy_seconds": round(self._busy_seconds, 1),
+            }
+
+    def lanes_status(self) -> Dict[str, Dict[str, Any]]:
+        """Estado de cada cola de impresora."""
+        with self._cond:
+            return {
+                key: {
+                    "pending": lane.size,
+                    "pending_by_priority": lane.pending_by_priority(),
+                    "active": lane.active,
+                    "concurrency": lane.concurrency,
+                    "processed": lane.processed,
+                    "failed": lane.failed,
+                    "dropped": lane.dropped,
+                    "parked": lane.parked,
+                    "prepared": lane.prepared,
+                    "idle_gap": lane.idle_gap_status(),
+                }
+                for key, lane in self._lanes.items()
+            }
+
+    def _get_lane(self, job: PrintJob) -> PrinterLane:
+        lane = self._lanes.get(job.lane_key)
+        if lane is None:
+            concurrency = 1
+            if self.concurrency_for:
+                try:
+                    concurrency = self.concurrency_for(job.printer_name)
+                except Exception as e:
+                    logger.warning(f"Concurrencia inválida para '{job.lane_key}': {e}")
+            lane = PrinterLane(job.lane_key, concurrency, self.aging)
+            self._lanes[job.lane_key] = lane
+        return lane
+
+    def _schedule(self, lane: PrinterLane):
+        """Pone la cola en la ronda de atención si puede ejecutar otro trabajo. Requiere el lock."""
+        if not lane.scheduled and not lane.parked and lane.can_run():
+            if self.available and not self._is_available(lane):
+                lane.parked = True
+                if lane.parked_at is None:
+                    lane.parked_at = time.time()
+                self._parked.add(lane)
+                return
+            lane.parked_at = None
+            lane.scheduled = True
+            self._ready.append(lane)
+            self._cond.notify()
+            if len(self._ready) > self._idle and len(self._workers) < self.max_workers and self._running:
+                # todos los workers ocupados (bloqueados en sus impresoras): uno más
+                self._spawn_worker()
+                self._grown += 1
+
+    def _spawn_worker(self):
+        """Inicia un worker. Requiere el lock."""
+        worker_id = next(self._worker_ids)
+        worker = threading.Thread(target=self._worker_loop, args=(worker_id,), daemon=True,
+                                  name=f"PrintWorker-{worker_id}")
+        self._workers[worker_id] = worker
+        # cuenta como libre hasta que tome un trabajo: no se crea otro por la misma impresora
+        self._idle += 1
+        self._peak_workers = max(self._peak_workers, len(self._workers))
+        worker.start()
+
+    def _prepare_next(self, lane: PrinterLane):
+        """
+        Prepara en segundo plano el próximo trabajo de una impresora ocupada. Requiere el lock.
+
+        Solo el trabajo que saldría a continuación: queda uno listo por impresora.
+        """
+        if not self._prepare_pool or lane.active < lane.concurrency:
+            # con un worker libre el trabajo se despacha ya, no hay nada que adelantar
+            return
+        job = lane.peek(time.time())
+        if job is None or job.prepared is not None or job.cancelled:
+            return
+        try:
+            job.prepared = self._prepare_pool.submit(self.prepare, job)
+            lane.prepared += 1
+        except RuntimeError:
+            # pool detenido
+            pass
+
+    def _is_available(self, lane: PrinterLane) -> bool:
+        try:
+            return self.available(lane.key)
+        except Exception as e:
+            logger.error(f"Error consultando disponibilidad de '{lane.key}': {e}")
+            return True
+
+    def _next_job(self, worker_id: int) -> Optional[PrintJob]:
+        """Próximo trabajo para un worker, o None si el worker tiene que terminar."""
+        while True:
+            with self._cond:
+                idle_since = time.monotonic()
+                while self._running and not self._ready:
+                    if len(self._workers) > self.min_workers and \
+                            time.monotonic() - idle_since > self.idle_timeout:
+                        # sobra: el pool vuelve hacia min_workers
+                        self._retire(worker_id)
+                        self._retired += 1
+                        return None
+                    self._cond.wait(timeout=1.0)
+                if not self._running:
+                    self._retire(worker_id)
+                    return None
+
+                now = time.time()
+                lane = self._ready.popleft()
+                lane.scheduled = False
+                job = lane.pop(now)
+                self._pending -= 1
+
+                if not job.expired(now):
+                    lane.active += 1
+                    job.started_at = now
+                    self._idle -= 1
+                    self._busy += 1
+                    # Vuelve al final de la ronda si todavía puede atender otro trabajo
+                    self._schedule(lane)
+                    # Mientras este se imprime, preparar el siguiente
+                    self._prepare_next(lane)
+                    return job
+
+                # Vencido mientras esperaba: no se imprime
+                del self._jobs[job.job_id]
+                lane.dropped += 1
+                if job.prepared:
+                    job.prepared.cancel()
+                self._schedule(lane)
+
+            # se responde fuera del lock y antes de volver a esperar trabajo
+            logger.warning(f"Trabajo {job.job_id} para '{job.lane_key}' vencido sin imprimir "
+                           f"(esperó {time.time() - job.enqueued_at:.1f}s)")
+            job.reply({"success": False, "error": "Trabajo vencido antes de imprimirse",
+                       "expired": True, "processing_time": 0})
+
+    def _retire(self, worker_id: int):
+        """Saca un worker libre del pool. Requiere el lock."""
+        self._workers.pop(worker_id, None)
+        self._idle -= 1
+
+    def _job_done(self, job: PrintJob, failed: bool, busy_seconds: float = 0.0):
+        with self._cond:
+            self._busy -= 1
+            self._idle += 1
+            self._busy_seconds += busy_seconds
+            self._jobs.pop(job.job_id, None)
+            lane = self._lanes[job.lane_key]
+            lane.active -= 1
+            if failed:
+                lane.failed += 1
+            else:
+                lane.processed += 1
+            lane.record_transmit(job)
+            self._schedule(lane)
+
+    def _worker_loop(self, worker_id: int):
+        while True:
+            job = self._next_job(worker_id)
+            if job is None:
+                if self._running:
+                    logger.debug(f"Worker {worker_id} sin trabajo, termina ({len(self._workers)} en el pool)")
+                else:
+                    logger.info(f"Worker {worker_id} received shutdown signal")
+                return
+
+            failed = False
+            started = time.monotonic()
+            try:
+                failed = self.handler(job, worker_id) is False
+            except Exception as e:
+                failed = True
+                logger.error(f"Worker {worker_id} unexpected error: {e}")
+
+                publish_error(
+                    error_type="WORKER_CRITICAL_ERROR",
+                    error_message=f"Worker {worker_id} encountered critical error",
+                    context={"worker_id": worker_id, "printer_name": job.lane_key},
+                    exception=e
+                )
+                job.reply({"success": False, "error": str(e),
+                           "processing_time": time.time() - job.started_at})
+            finally:
+                self._job_done(job, failed, time.monotonic() - started)
+
+    def _watchdog_loop(self):
+        """
+        Mantenimiento periódico:
+        - avisa (una vez por trabajo) de los que siguen imprimiéndose después de stuck_after
+        - descarta los trabajos vencidos que esperan en impresoras caídas, y
+          avisa (on_parked) de los que llevan más de park_timeout esperando
+        - reintenta las impresoras en espera
+        """
+        interval = max(0.5, min(5.0, self.stuck_after / 4)) if self.stuck_after else 1.0
+        if self.park_timeout is not None:
+            interval = max(0.1, min(interval, self.park_timeout / 2))
+        while self._running:
+            time.sleep(interval)
+            now = time.time()
+            expired = []
+            parked = []
+            with self._cond:
+                if self._workers:
+                    sample = self._busy / len(self._workers)
+                    self._utilization += UTILIZATION_ALPHA * (sample - self._utilization)
+                stuck = []
+                if self.stuck_after:
+                    stuck = [job for job in self._jobs.values()
+                             if job.started_at is not None and not job.stuck
+                             and now - job.started_at > self.stuck_after]
+                for job in stuck:
+                    job.stuck = True
+
+                for lane in list(self._parked):
+                    for queue_ in lane.queues:
+                        for job in list(queue_):
+                            if not job.expired(now):
+                                if job.on_parked and self.park_timeout is not None and \
+                                        now - max(job.enqueued_at, lane.parked_at or now) > self.park_timeout:
+                                    parked.append((job, job.on_parked))
+                                    job.on_parked = None
+                                continue
+                            queue_.remove(job)
+                            lane.size -= 1
+                            lane.dropped += 1
+                            self._pending -= 1
+                            del self._jobs[job.job_id]
+                            if job.prepared:
+                                job.prepared.cancel()
+                            expired.append(job)
+                    if lane.size == 0:
+                        lane.parked = False
+                        self._parked.discard(lane)
+
+            for job in expired:
+                logger.warning(f"Trabajo {job.job_id} para '{job.lane_key}' vencido esperando a la impresora")
+                job.reply({"success": False, "error": "Trabajo vencido: la impresora no estaba disponible",
+                           "expired": True, "processing_time": 0})
+            for job, on_parked in parked:
+                logger.warning(f"Trabajo {job.job_id} para '{job.lane_key}' esperando a la impresora "
+                               f"hace más de {self.park_timeout:g}s")
+                try:
+                    on_parked(job)
+                except Exception as e:
+                    logger.error(f"Error en on_parked: {e}")
+            if self._parked:
+                self.resume()
+
+            for job in stuck:
+                elapsed = now - job.started_at
+                logger.error(f"STUCK JOB DETECTED: job {job.job_id} for '{job.lane_key}' "
+                             f"printing for {elapsed:.1f}s (threshold: {self.stuck_after}s)")
+                if self.on_stuck:
+                    try:
+                        self.on_stuck(job, elapsed)
+                    except Exception as e:
+                        logger.error(f"Error en on_stuck: {e}")
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+"""
+Spool persistente de trabajos de impresión.
+
+Cada trabajo aceptado se guarda en una base SQLite (modo WAL) antes de
+encolarlo y se marca como terminado al imprimirse. Si el proceso se cae o se
+reinicia, al iniciar se vuelven a encolar en orden los trabajos que no
+terminaron, así la cocina no pierde comandas ni el backend tiene que reenviarlas.
+
+Las escrituras se agrupan (group commit): un único thread escritor confirma en
+una sola transacción, con un solo fsync, todas las operaciones que llegaron
+mientras escribía el lote anterior (más las de una ventana opcional,
+flush_interval). Sin carga no se agrega demora.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Ventana extra para agrupar escrituras en una misma transacción (segundos).
+# Con 0 el lote es lo acumulado durante el fsync anterior: append() no espera
+# de más (ver diagnostics/spool_benchmark.py)
+DEFAULT_FLUSH_INTERVAL = 0.0
+
+# Trabajos sin terminar más viejos que esto no se reimprimen al iniciar (segundos)
+DEFAULT_MAX_AGE = 600
+
+# Cada cuántos trabajos terminados se compacta la base
+COMPACT_EVERY = 500
+
+STATE_PENDING = "pending"
+STATE_DONE = "done"
+
+
+class PrintSpool:
+    """Journal durable de trabajos de impresión sobre SQLite WAL."""
+
+    def __init__(self, path: str, flush_interval: float = DEFAULT_FLUSH_INTERVAL, max_batch: int = 128):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self._ops = queue.Queue()
+        self._closed = False
+        self._done_since_compact = 0
+
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL: cada commit del lote hace fsync (los cortes de luz no pierden trabajos)
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " printer TEXT NOT NULL,"
+            " ticket TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " state TEXT NOT NULL DEFAULT 'pending',"
+            " job_key TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "job_key" not in columns:
+            # spool creado por una versión anterior
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN job_key TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs(state, seq)")
+
+        self._writer = threading.Thread(target=self._writer_loop, daemon=True, name="PrintSpoolWriter")
+        self._writer.start()
+
+    def append(self, printer_name, ticket: dict, job_key: Optional[str] = None,
+               timeout: float = 5.0) -> Optional[int]:
+        """
+        Guarda un trabajo nuevo y espera a que esté en disco.
+
+        Args:
+            printer_name: printerName del trabajo
+            ticket: JSON del trabajo
+            job_key: Clave de idempotencia (ver job_dedup.job_key)
+
+        Returns:
+            int: Número de secuencia del trabajo, o None si no se pudo guardar
+        """
+        op = _SpoolOp(
+            "INSERT INTO jobs (printer, ticket, created, state, job_key) VALUES (?, ?, ?, ?, ?)",
+            (json.dumps(printer_name), json.dumps(ticket, ensure_ascii=False), time.time(),
+             STATE_PENDING, job_key),
+        )
+        self._ops.put(op)
+        if not op.done.wait(timeout):
+            logger.warning("Spool: timeout guardando trabajo, se imprime sin respaldo")
+            return None
+        return op.lastrowid
+
+    def complete(self, seq: Optional[int]):
+        """Marca un trabajo como terminado (no espera al disco)."""
+        if seq is None:
+            return
+        self._ops.put(_SpoolOp("UPDATE jobs SET state = ? WHERE seq = ?", (STATE_DONE, seq)))
+
+    def pending(self, max_age: Optional[float] = None) -> Tuple[List[Tuple[int, Any, dict, Optional[str]]], List[int]]:
+        """
+        Trabajos sin terminar, en orden de llegada.
+
+        Returns:
+            (pendientes, vencidos): lista de (seq, printerName, ticket, job_key) a reimprimir
+            y lista de seq descartados por antigüedad
+        """
+        self.flush()
+        now = time.time()
+        pending, expired = [], []
+        rows = self._conn.execute(
+            "SELECT seq, printer, ticket, created, job_key FROM jobs WHERE state = ? ORDER BY seq",
+            (STATE_PENDING,)
+        ).fetchall()
+        for seq, printer, ticket, created, job_key in rows:
+            if max_age is not None and now - created > max_age:
+                expired.append(seq)
+                continue
+            try:
+                pending.append((seq, json.loads(printer), json.loads(ticket), job_key))
+            except ValueError as e:
+                logger.error(f"Spool: trabajo {seq} ilegible, se descarta: {e}")
+                expired.append(seq)
+        return pending, expired
+
+    def compact(self):
+        """Elimina los trabajos terminados y trunca el WAL."""
+        self._ops.put(_SpoolOp("DELETE FROM jobs WHERE state = ?", (STATE_DONE,), checkpoint=True))
+        self.flush()
+
+    def flush(self, timeout: float = 5.0):
+        """Espera a que todas las operaciones encoladas estén en disco."""
+        if self._closed:
+            return
+        op = _SpoolOp(None, None)
+        self._ops.put(op)
+        op.done.wait(timeout)
+
+    def close(self):
+        """Vuelca las operaciones pendientes y cierra la base."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._ops.put(None)
+        self._writer.join(2.0)
+        try:
+            self._conn.close()
+        except Exception:
+            pass
+
+    def _writer_loop(self):
+        while True:
+            op = self._ops.get()
+            if op is None:
+                return
+
+            # Juntar las operaciones que llegan durante la ventana de agrupado y
+            # las que se acumularon mientras se escribía el lote anterior
+            batch = [op]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    nxt = self._ops.get(timeout=remaining) if remaining > 0 else self._ops.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    self._ops.put(None)
+                    break
+                batch.append(nxt)
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        checkpoint = False
+        try:
+            self._conn.execute("BEGIN")
+            for op in batch:
+                if op.sql is None:
+                    continue
+                cursor = self._conn.execute(op.sql, op.params)
+                op.lastrowid = cursor.lastrowid
+                checkpoint = checkpoint or op.checkpoint
+                if op.params and op.params[0] == STATE_DONE and op.sql.startswith("UPDATE"):
+                    self._done_since_compact += 1
+            self._conn.execute("COMMIT")
+
+            if self._done_since_compact >= COMPACT_EVERY:
+                self._conn.execute("DELETE FROM jobs WHERE state = ?", (STATE_DONE,))
+                self._done_since_compact = 0
+            if checkpoint:
+                self._done_since_compact = 0
+                self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            logger.error(f"Spool: error escribiendo lote de {len(batch)} operaciones: {e}")
+            try:
+                self._conn.execute("ROLLBACK")
+            except Exception:
+                pass
+        finally:
+            for op in batch:
+                op.done.set()
+
+
+class _SpoolOp:
+    __slots__ = ("sql", "params", "checkpoint", "done", "lastrowid")
+
+    def __init__(self, sql, params, checkpoint=False):
+        self.sql = sql
+        self.params = params
+        self.checkpoint = checkpoint
+        self.done = threading.Event()
+        self.lastrowid = None
+
+
+_print_spool_instance = None
+_print_spool_lock = threading.Lock()
+
+
+def get_print_spool() -> Optional[PrintSpool]:
+    """
+    Obtiene la instancia singleton del spool.
+
+    Returns:
+        PrintSpool o None si está deshabilitado (SERVIDOR.spool_enabled = false)
+        o no se pudo abrir la base
+    """
+    global _print_spool_instance
+
+    with _print_spool_lock:
+        if _print_spool_instance is None:
+            from fiscalberry.common.Configberry import Configberry
+            config = Configberry()
+            if config.get("SERVIDOR", "spool_enabled", fallback="true").lower() in ("0", "false", "no"):
+                return None
+            default_path = os.path.join(os.path.dirname(config.configFilePath), "print_spool.db")
+            path = config.get("SERVIDOR", "spool_path", fallback=default_path) or default_path
+            try:
+                _print_spool_instance = PrintSpool(path)
+                logger.debug(f"Spool de impresión en {path}")
+            except Exception as e:
+                logger.error(f"No se pudo abrir el spool de impresión {path}: {e}")
+                return None
+        return _print_spool_instance
+
+
+def close_print_spool():
+    """Vuelca y cierra el spool si está abierto (para usar antes de terminar el proceso)."""
+    with _print_spool_lock:
+        if _print_spool_instance is not None:
+            _print_spool_instance.close()
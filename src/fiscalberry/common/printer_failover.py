@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Política de respaldo (failover) por impresora.
+
+Una impresora con `backup` en su sección manda sus tickets a la impresora de
+respaldo cuando no puede imprimirlos por alguna de las causas de
+`failover_on` (por defecto sin papel, tapa abierta o fuera de línea):
+
+    [Cocina]
+    driver = Network
+    host = 192.168.1.50
+    backup = Cocina2
+    failover_on = paper_out, cover_open, offline
+
+El ticket se encola en la impresora de respaldo, con su límite de
+concurrencia, y se vuelve a renderizar si su ancho o perfil es otro; la
+respuesta lo marca con "rerouted". Solo hay un nivel de respaldo: si la de
+respaldo también falla, el trabajo falla.
+"""
+
+from typing import Optional
+
+from fiscalberry.common.printer_error_detector import PrinterErrorType
+
+# causa de failover_on -> tipos de error de PrinterErrorDetector que la disparan
+FAILOVER_CAUSES = {
+    "paper_out": {PrinterErrorType.PAPER_OUT},
+    "cover_open": {PrinterErrorType.COVER_OPEN},
+    "paper_jam": {PrinterErrorType.PAPER_JAM},
+    "offline": {PrinterErrorType.OFFLINE, PrinterErrorType.COMMUNICATION_ERROR},
+}
+
+DEFAULT_FAILOVER_ON = frozenset({"paper_out", "cover_open", "offline"})
+
+
+class FailoverError(Exception):
+    """Falló la impresora y también la de respaldo."""
+    pass
+
+
+def parse_failover_on(value) -> frozenset:
+    """
+    Causas de failover de una sección ("paper_out, offline").
+
+    Raises:
+        ValueError: Si alguna causa no existe
+    """
+    if value is None or not str(value).strip():
+        return DEFAULT_FAILOVER_ON
+    causes = frozenset(cause.strip().lower() for cause in str(value).split(",") if cause.strip())
+    unknown = causes - set(FAILOVER_CAUSES)
+    if unknown:
+        raise ValueError(f"causas de failover desconocidas: {', '.join(sorted(unknown))} "
+                         f"(válidas: {', '.join(sorted(FAILOVER_CAUSES))})")
+    return causes
+
+
+def failover_cause(error_type: Optional[str], connection_error: bool = False) -> Optional[str]:
+    """
+    Causa de failover de un error de impresión.
+
+    Args:
+        error_type: Tipo detectado por PrinterErrorDetector
+        connection_error: El error es de la conexión (DriverError, OSError)
+
+    Returns:
+        str: Causa ("paper_out", "offline", ...) o None si el error no es de la impresora
+    """
+    for cause, error_types in FAILOVER_CAUSES.items():
+        if error_type in error_types:
+            return cause
+    return "offline" if connection_error else None
+
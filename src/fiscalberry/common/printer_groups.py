@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Grupos de impresoras con despacho a la menos cargada.
+
+Un grupo es una sección con driver = Group y la lista de impresoras que lo
+forman (por ejemplo dos o tres impresoras iguales en el mostrador):
+
+    [Mostrador]
+    driver = Group
+    members = Caja1, Caja2, Caja3
+
+Un trabajo dirigido al grupo se encola en la impresora que lo imprimiría
+antes: la de menor espera estimada, (trabajos en su cola + 1) x latencia
+reciente de transmisión, entre las que no están caídas ni con el circuit
+breaker abierto. Si todas lo están, se elige igual la mejor (el trabajo
+espera en su cola a que vuelva, como cualquier otro).
+
+Los trabajos que tienen que salir en orden llevan "orderKey" en el mensaje
+(por ejemplo el número de pedido): mientras quede alguno pendiente con esa
+clave, los siguientes van a la misma impresora.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.printer_spec import PrinterSpecError
+
+logger = getLogger()
+
+# Latencia supuesta (segundos) de una impresora que todavía no imprimió nada
+DEFAULT_MEMBER_LATENCY = 1.0
+
+# Peso de la última transmisión en la latencia reciente (promedio exponencial)
+LATENCY_ALPHA = 0.3
+
+
+class MemberStats:
+    """Métricas de una impresora dentro de un grupo."""
+
+    __slots__ = ("dispatched", "completed", "failed", "outstanding", "latency", "last_dispatch")
+
+    def __init__(self):
+        self.dispatched = 0
+        self.completed = 0
+        self.failed = 0
+        self.outstanding = 0
+        # latencia reciente de transmisión en segundos (None: sin datos)
+        self.latency = None
+        self.last_dispatch = 0.0
+
+    def record_latency(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_ALPHA * (seconds - self.latency)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "dispatched": self.dispatched,
+            "completed": self.completed,
+            "failed": self.failed,
+            "outstanding": self.outstanding,
+            "latency_ms": round(self.latency * 1000, 1) if self.latency is not None else None,
+        }
+
+
+class PrinterGroupDispatcher:
+    """Elige la impresora de un grupo para cada trabajo y lleva sus métricas."""
+
+    def __init__(self, specs, load: Callable[[str], int], available: Callable[[str], bool]):
+        """
+        Args:
+            specs: PrinterSpecRegistry con las impresoras configuradas
+            load: load(nombre) -> trabajos en cola o imprimiéndose en esa impresora
+            available: available(nombre) -> False si la impresora está caída
+        """
+        self.specs = specs
+        self.load = load
+        self.available = available
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, MemberStats]] = {}
+        # (grupo, orderKey) -> [impresora, trabajos pendientes con esa clave]
+        self._ordered: Dict[tuple, list] = {}
+
+    def members(self, group_spec) -> list:
+        """Integrantes válidos del grupo (impresoras configuradas que no son grupos)."""
+        members = []
+        for name in group_spec.members:
+            try:
+                spec = self.specs.get(name)
+            except Exception as e:
+                logger.warning(f"Grupo '{group_spec.name}': se omite '{name}' ({e})")
+                continue
+            if spec.driver_name == "Group":
+                logger.warning(f"Grupo '{group_spec.name}': se omite '{name}' (un grupo no puede contener grupos)")
+                continue
+            members.append(name)
+        return members
+
+    def select(self, group_spec, order_key: Optional[str] = None) -> str:
+        """
+        Elige la impresora del grupo para un trabajo.
+
+        Args:
+            group_spec: PrinterSpec del grupo
+            order_key: Clave de orden del mensaje (None: sin restricción)
+
+        Returns:
+            str: Nombre de la impresora elegida
+
+        Raises:
+            PrinterSpecError: Si el grupo no tiene impresoras válidas
+        """
+        members = self.members(group_spec)
+        if not members:
+            raise PrinterSpecError(f"El grupo '{group_spec.name}' no tiene impresoras válidas")
+
+        with self._lock:
+            stats = self._stats.setdefault(group_spec.name, {})
+            for name in members:
+                stats.setdefault(name, MemberStats())
+
+            ordered = self._ordered.get((group_spec.name, order_key)) if order_key is not None else None
+            if ordered is not None and ordered[0] in members:
+                # trabajos anteriores con la misma clave siguen pendientes: misma impresora
+                member = ordered[0]
+            else:
+                member = self._least_loaded(members, stats)
+
+            stats[member].dispatched += 1
+            stats[member].outstanding += 1
+            stats[member].last_dispatch = time.monotonic()
+            if order_key is not None:
+                entry = self._ordered.setdefault((group_spec.name, order_key), [member, 0])
+                entry[0] = member
+                entry[1] += 1
+        return member
+
+    def _least_loaded(self, members, stats) -> str:
+        """Impresora con menor espera estimada. Requiere el lock."""
+        known = [stats[name].latency for name in members if stats[name].latency is not None]
+        default_latency = sum(known) / len(known) if known else DEFAULT_MEMBER_LATENCY
+
+        candidates = [name for name in members if self._is_available(name)] or members
+
+        def expected_wait(name):
+            latency = stats[name].latency if stats[name].latency is not None else default_latency
+            # a igual espera, la que hace más que no recibe un trabajo (reparto por turnos)
+            return ((self.load(name) + 1) * latency, stats[name].last_dispatch)
+
+        return min(candidates, key=expected_wait)
+
+    def _is_available(self, name: str) -> bool:
+        try:
+            return self.available(name)
+        except Exception as e:
+            logger.error(f"Error consultando disponibilidad de '{name}': {e}")
+            return True
+
+    def track(self, group_name: str, member: str, job, order_key: Optional[str] = None):
+        """Actualiza las métricas del integrante cuando termina su trabajo."""
+        job.future.add_done_callback(lambda f: self._job_done(group_name, member, job, order_key, f.result()))
+
+    def release(self, group_name: str, member: str, order_key: Optional[str] = None):
+        """Deshace un select() cuyo trabajo no se llegó a encolar."""
+        with self._lock:
+            stats = self._stats.setdefault(group_name, {}).setdefault(member, MemberStats())
+            stats.dispatched -= 1
+            self._release(group_name, stats, order_key)
+
+    def _job_done(self, group_name, member, job, order_key, result):
+        with self._lock:
+            stats = self._stats.setdefault(group_name, {}).setdefault(member, MemberStats())
+            if isinstance(result, dict) and result.get("success"):
+                stats.completed += 1
+                if job.transmit_started is not None and job.transmit_finished is not None:
+                    stats.record_latency(job.transmit_finished - job.transmit_started)
+            else:
+                stats.failed += 1
+            self._release(group_name, stats, order_key)
+
+    def _release(self, group_name, stats, order_key):
+        """Descuenta un trabajo pendiente del integrante y de su clave de orden. Requiere el lock."""
+        stats.outstanding -= 1
+        if order_key is not None:
+            entry = self._ordered.get((group_name, order_key))
+            if entry is not None:
+                entry[1] -= 1
+                if entry[1] <= 0:
+                    del self._ordered[(group_name, order_key)]
+
+    def status(self, group_name: str) -> Dict[str, Dict[str, Any]]:
+        """Métricas de cada integrante de un grupo, con su carga y disponibilidad actuales."""
+        with self._lock:
+            stats = {name: member.to_dict() for name, member in self._stats.get(group_name, {}).items()}
+        for name, member in stats.items():
+            member["load"] = self.load(name)
+            member["available"] = self._is_available(name)
+        return stats
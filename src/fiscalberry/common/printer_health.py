@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Monitor de estado de las impresoras.
+
+Un thread en segundo plano prueba periódicamente cada impresora configurada
+con una verificación barata (conexión TCP, presencia del dispositivo USB o
+serie, o estado en tiempo real DLE EOT si hay una conexión abierta en el pool)
+y guarda el resultado con su timestamp. getStatus y getPrinterInfo responden
+desde este registro sin tocar el dispositivo, y el planificador de impresión
+no despacha trabajos a las impresoras que se sabe que están caídas.
+
+Los resultados de los trabajos reales también actualizan el registro.
+"""
+
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+ONLINE = "online"
+OFFLINE = "offline"
+UNKNOWN = "unknown"
+
+# Segundos entre rondas de verificación
+DEFAULT_HEALTH_INTERVAL = 30.0
+
+# Tiempo máximo de cada verificación (segundos)
+DEFAULT_PROBE_TIMEOUT = 2.0
+
+# Verificaciones fallidas seguidas para dar por caída una impresora (un trabajo
+# fallido alcanza: una sola verificación puede fallar por un corte momentáneo)
+DOWN_AFTER_PROBES = 2
+
+
+class PrinterHealth:
+    """Último estado conocido de una impresora."""
+
+    __slots__ = ("name", "status", "checked_at", "changed_at", "latency_ms", "detail", "error", "source",
+                 "failures")
+
+    def __init__(self, name: str, status: str = UNKNOWN, latency_ms: Optional[float] = None,
+                 detail: Optional[Dict[str, Any]] = None, error: Optional[str] = None,
+                 source: str = "probe"):
+        self.name = name
+        self.status = status
+        self.checked_at = time.time()
+        self.changed_at = self.checked_at
+        self.latency_ms = latency_ms
+        self.detail = detail or {}
+        self.error = error
+        self.source = source
+        # verificaciones OFFLINE seguidas (incluida esta)
+        self.failures = 1 if status == OFFLINE else 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "checked_at": self.checked_at,
+            "changed_at": self.changed_at,
+            "age": round(time.time() - self.checked_at, 1),
+            "latency_ms": self.latency_ms,
+            "detail": self.detail,
+            "error": self.error,
+            "source": self.source,
+            "failures": self.failures,
+        }
+
+
+def _tcp_probe(host: str, port: int, timeout: float):
+    with socket.create_connection((host, port), timeout=timeout):
+        pass
+
+
+def probe_printer(spec, timeout: float = DEFAULT_PROBE_TIMEOUT) -> Optional[PrinterHealth]:
+    """
+    Verifica una impresora sin imprimir.
+
+    Args:
+        spec: PrinterSpec de la impresora
+        timeout: Tiempo máximo de la verificación
+
+    Returns:
+        PrinterHealth: status UNKNOWN si el driver no permite una verificación
+        barata, o None si no conviene verificarla ahora (está imprimiendo)
+    """
+    from fiscalberry.common.express_commands import query_status
+    from fiscalberry.common.printer_pool import get_printer_pool, connection_key
+
+    ops = spec.driver_ops
+    start = time.perf_counter()
+    detail = {}
+
+    def elapsed_ms():
+        return round((time.perf_counter() - start) * 1000, 1)
+
+    try:
+        if spec.driver_name == "Network":
+            pool = get_printer_pool()
+            key = connection_key(spec.driver_name, ops)
+            if pool.in_use(key):
+                # se está imprimiendo: no abrir otra conexión (muchas impresoras aceptan una sola)
+                return None
+            if pool.has_idle(key):
+                # reutilizar la conexión abierta y pedir el estado en tiempo real
+                with pool.connection(key, spec.create_driver, touch=False) as driver:
+                    detail = query_status(driver, timeout=timeout)
+                if detail.get("responding") is False:
+                    return PrinterHealth(spec.name, OFFLINE, elapsed_ms(), detail, "Sin respuesta a DLE EOT")
+                online = detail.get("online", True)
+                return PrinterHealth(spec.name, ONLINE if online else OFFLINE, elapsed_ms(), detail)
+            _tcp_probe(ops["host"], int(ops.get("port", 9100)), timeout)
+            return PrinterHealth(spec.name, ONLINE, elapsed_ms())
+
+        if spec.driver_name == "Fiscalberry":
+            # host es la URL del servidor fiscalberry remoto
+            url = urlparse(ops.get("host", "http://localhost"))
+            _tcp_probe(url.hostname or "localhost", url.port or (443 if url.scheme == "https" else 80), timeout)
+            return PrinterHealth(spec.name, ONLINE, elapsed_ms())
+
+        if spec.driver_name == "Usb":
+            try:
+                import usb.core
+            except ImportError:
+                return PrinterHealth(spec.name, UNKNOWN, error="pyusb no disponible")
+            found = usb.core.find(idVendor=ops["idVendor"], idProduct=ops["idProduct"]) is not None
+            return PrinterHealth(spec.name, ONLINE if found else OFFLINE, elapsed_ms(),
+                                 error=None if found else "Dispositivo USB no encontrado")
+
+        if spec.driver_name in ("Serial", "File"):
+            devfile = ops.get("devfile", "/dev/ttyS0" if spec.driver_name == "Serial" else "/dev/usb/lp0")
+            if spec.driver_name == "Serial" and os.name == "nt":
+                return PrinterHealth(spec.name, UNKNOWN)
+            if devfile.startswith("/dev/"):
+                found = os.path.exists(devfile)
+            else:
+                # archivo común: se crea al imprimir, alcanza con que exista el directorio
+                found = os.path.isdir(os.path.dirname(os.path.abspath(devfile)))
+            return PrinterHealth(spec.name, ONLINE if found else OFFLINE, elapsed_ms(),
+                                 error=None if found else f"{devfile} no existe")
+
+        if spec.driver_name == "Group":
+            # un grupo no es un dispositivo: se verifican sus impresoras
+            return None
+
+        if spec.driver_name == "Dummy":
+            return PrinterHealth(spec.name, ONLINE, 0.0)
+
+        # Win32Raw, CUPS, LP, Bluetooth: sin verificación barata
+        return PrinterHealth(spec.name, UNKNOWN)
+
+    except Exception as e:
+        return PrinterHealth(spec.name, OFFLINE, elapsed_ms(), detail, str(e))
+
+
+class PrinterHealthMonitor:
+    """Registro del estado de las impresoras, actualizado en segundo plano."""
+
+    def __init__(self, specs, interval: float = DEFAULT_HEALTH_INTERVAL,
+                 probe_timeout: float = DEFAULT_PROBE_TIMEOUT):
+        """
+        Args:
+            specs: PrinterSpecRegistry con las impresoras configuradas
+            interval: Segundos entre rondas de verificación (0 desactiva el thread)
+            probe_timeout: Tiempo máximo de cada verificación
+        """
+        self.specs = specs
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self._health: Dict[str, PrinterHealth] = {}
+        self._listeners: List[Callable[[str, PrinterHealth], None]] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="PrinterHealthMonitor")
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def add_listener(self, listener: Callable[[str, PrinterHealth], None]):
+        """listener(nombre, health) se llama cuando cambia el estado de una impresora."""
+        self._listeners.append(listener)
+
+    def get(self, name: str) -> Optional[PrinterHealth]:
+        return self._health.get(name)
+
+    def is_down(self, name: str) -> bool:
+        """
+        True si la impresora se sabe caída: el último resultado (reciente) es
+        OFFLINE y viene de un trabajo o de DOWN_AFTER_PROBES verificaciones seguidas.
+        """
+        health = self._health.get(name)
+        if health is None or health.status != OFFLINE:
+            return False
+        if health.source != "job" and health.failures < DOWN_AFTER_PROBES:
+            return False
+        max_age = 2 * self.interval if self.interval > 0 else 60.0
+        return time.time() - health.checked_at <= max_age
+
+    def problem(self, name: str) -> Optional[str]:
+        """
+        Problema conocido por la última verificación (reciente) de la impresora.
+
+        Returns:
+            str: "offline", "paper_out" o "cover_open", o None si no se sabe de ninguno
+        """
+        if self.is_down(name):
+            return "offline"
+        health = self._health.get(name)
+        max_age = 2 * self.interval if self.interval > 0 else 60.0
+        if health is None or health.source != "probe" or time.time() - health.checked_at > max_age:
+            # un trabajo impreso no trae el estado del papel ni de la tapa
+            return None
+        if health.detail.get("paper") == "out":
+            return "paper_out"
+        if health.detail.get("cover_open"):
+            return "cover_open"
+        return None
+
+    def status(self) -> Dict[str, Dict[str, Any]]:
+        return {name: health.to_dict() for name, health in list(self._health.items())}
+
+    def check(self, name: str) -> Optional[PrinterHealth]:
+        """Verifica una impresora ahora y actualiza el registro."""
+        try:
+            spec = self.specs.get(name)
+        except Exception as e:
+            return self._update(PrinterHealth(name, UNKNOWN, error=str(e)))
+        health = probe_printer(spec, self.probe_timeout)
+        if health is None:
+            return self._health.get(name)
+        return self._update(health)
+
+    def check_all(self):
+        for name in self.specs.all():
+            if self._stop.is_set():
+                return
+            self.check(name)
+
+    def report(self, name: str, ok: bool, error: Any = None):
+        """Actualiza el registro con el resultado de un trabajo real."""
+        self._update(PrinterHealth(name, ONLINE if ok else OFFLINE,
+                                   error=None if ok else str(error), source="job"))
+
+    def _update(self, health: PrinterHealth) -> PrinterHealth:
+        with self._lock:
+            previous = self._health.get(health.name)
+            if previous is not None and previous.status == health.status:
+                health.changed_at = previous.changed_at
+                if health.status == OFFLINE:
+                    health.failures = previous.failures + 1
+                if health.source == "job":
+                    # un trabajo no trae detalle de papel/tapa: conservar el último
+                    health.detail = previous.detail
+            self._health[health.name] = health
+
+        if previous is None or previous.status != health.status:
+            if previous is not None:
+                log = logger.info if health.status == ONLINE else logger.warning
+                log(f"Impresora '{health.name}': {previous.status} -> {health.status}"
+                    + (f" ({health.error})" if health.error else ""))
+            for listener in list(self._listeners):
+                try:
+                    listener(health.name, health)
+                except Exception as e:
+                    logger.error(f"Error notificando estado de '{health.name}': {e}")
+        return health
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.check_all()
+            except Exception as e:
+                logger.error(f"Error verificando impresoras: {e}")
+            self._stop.wait(self.interval)
+
+
+_printer_health_instance = None
+_printer_health_lock = threading.Lock()
+
+
+def get_printer_health() -> PrinterHealthMonitor:
+    """
+    Obtiene la instancia singleton del monitor de estado.
+
+    Returns:
+        PrinterHealthMonitor: Configurado con SERVIDOR.health_interval
+        y SERVIDOR.health_probe_timeout
+    """
+    global _printer_health_instance
+
+    with _printer_health_lock:
+        if _printer_health_instance is None:
+            from fiscalberry.common.printer_spec import get_printer_specs
+            interval, probe_timeout = DEFAULT_HEALTH_INTERVAL, DEFAULT_PROBE_TIMEOUT
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                config = Configberry()
+                interval = float(config.get("SERVIDOR", "health_interval", fallback=DEFAULT_HEALTH_INTERVAL))
+                probe_timeout = float(config.get("SERVIDOR", "health_probe_timeout",
+                                                 fallback=DEFAULT_PROBE_TIMEOUT))
+            except Exception as e:
+                logger.warning(f"Configuración del monitor de impresoras inválida, usando valores por defecto: {e}")
+            _printer_health_instance = PrinterHealthMonitor(get_printer_specs(), interval, probe_timeout)
+        return _printer_health_instance
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+Pool de conexiones persistentes a impresoras.
+
+Mantiene abiertos los drivers de python-escpos (Network, Usb, Serial, Bluetooth)
+entre trabajos consecutivos para no repetir el handshake TCP, el claim USB o la
+apertura del puerto serie en cada ticket.
+
+Las conexiones se indexan por la configuración resuelta de la impresora, se
+verifican antes de reutilizarlas y se cierran luego de un tiempo sin uso
+(muchas impresoras de red aceptan una sola conexión TCP a la vez).
+"""
+
+import json
+import select
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List
+
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Drivers de flujo que conviene mantener abiertos.
+# Win32Raw, CupsPrinter y LP envían el trabajo al cerrar, por lo que no se reutilizan.
+POOLABLE_DRIVERS = {"Network", "Usb", "Serial", "Bluetooth"}
+
+# Segundos sin uso antes de cerrar una conexión
+DEFAULT_IDLE_TIMEOUT = 30.0
+
+
+def connection_key(driver_name: str, driver_ops: Dict[str, Any]) -> str:
+    """Clave del pool a partir del driver y sus parámetros ya resueltos."""
+    return driver_name + ":" + json.dumps(dict(driver_ops), sort_keys=True, default=str)
+
+
+def is_connection_alive(driver) -> bool:
+    """
+    Verificación barata de que la conexión de un driver sigue abierta.
+
+    Para sockets TCP se detecta si el otro extremo cerró la conexión
+    (lectura disponible de 0 bytes) sin bloquear.
+    """
+    device = getattr(driver, "_device", None)
+
+    if isinstance(device, socket.socket):
+        try:
+            readable, _, _ = select.select([device], [], [], 0)
+            if readable and not device.recv(1, socket.MSG_PEEK):
+                return False
+        except (OSError, ValueError):
+            return False
+        return True
+
+    # BluetoothPrinter (driver propio)
+    connection = getattr(driver, "connection", None)
+    if connection is not None and hasattr(connection, "connected"):
+        return bool(connection.connected)
+
+    # pyserial
+    if device is not None and hasattr(device, "is_open"):
+        return bool(device.is_open)
+
+    return True
+
+
+class LeasedDriver:
+    """
+    Driver prestado por el pool a un trabajo.
+
+    Delega todo en el driver abierto salvo close(): quien lo usa (EscposIO
+    cierra la impresora al salir del with) no corta la conexión, que sigue
+    siendo del pool.
+    """
+
+    def __init__(self, driver):
+        object.__setattr__(self, "_driver", driver)
+
+    def close(self):
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+
+class PooledConnection:
+    """Driver abierto dentro del pool."""
+
+    def __init__(self, key: str, driver):
+        self.key = key
+        self.driver = driver
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+
+    def close(self):
+        try:
+            self.driver.close()
+        except Exception as e:
+            logger.debug(f"Error cerrando conexión '{self.key}': {e}")
+
+
+class PrinterConnectionPool:
+    """
+    Pool de drivers de impresora abiertos, indexados por configuración.
+
+    Cada conexión es usada por un solo trabajo a la vez. Si una impresora
+    atiende trabajos en paralelo se abren tantas conexiones como haga falta.
+    """
+
+    def __init__(self, idle_timeout: float = DEFAULT_IDLE_TIMEOUT, reap_interval: float = 5.0):
+        self.idle_timeout = idle_timeout
+        self.reap_interval = reap_interval
+        self._idle: Dict[str, List[PooledConnection]] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stats = {"created": 0, "reused": 0, "discarded": 0, "expired": 0}
+
+    @contextmanager
+    def connection(self, key: str, factory: Callable[[], Any], touch: bool = True):
+        """
+        Presta un driver abierto para la clave dada.
+
+        Si no hay una conexión sana disponible se crea una nueva con `factory`.
+        Si el bloque falla la conexión se descarta para que el próximo trabajo
+        se reconecte. El driver se entrega como LeasedDriver: cerrarlo no
+        cierra la conexión. Con touch=False (verificaciones de estado) el uso
+        no renueva el tiempo de inactividad de la conexión.
+        """
+        entry = self._checkout(key, factory)
+        last_used = entry.last_used
+        try:
+            yield LeasedDriver(entry.driver)
+        except BaseException:
+            self._discard(entry)
+            raise
+        else:
+            self._checkin(entry, last_used=None if touch else last_used)
+
+    def invalidate(self, key: str):
+        """Cierra las conexiones libres de una impresora (ej: cambió su configuración)."""
+        with self._lock:
+            entries = self._idle.pop(key, [])
+        for entry in entries:
+            entry.close()
+
+    def close_all(self):
+        """Cierra todas las conexiones libres."""
+        with self._lock:
+            entries = [e for lst in self._idle.values() for e in lst]
+            self._idle.clear()
+        for entry in entries:
+            entry.close()
+
+    def has_idle(self, key: str) -> bool:
+        """True si hay una conexión libre abierta para la clave."""
+        with self._lock:
+            return bool(self._idle.get(key))
+
+    def in_use(self, key: str) -> int:
+        """Cantidad de conexiones de la clave prestadas a un trabajo en curso."""
+        with self._lock:
+            return self._in_use.get(key, 0)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["idle"] = sum(len(lst) for lst in self._idle.values())
+        return stats
+
+    def _checkout(self, key: str, factory: Callable[[], Any]) -> PooledConnection:
+        while True:
+            with self._lock:
+                entries = self._idle.get(key)
+                entry = entries.pop() if entries else None
+            if entry is None:
+                break
+
+            expired = time.time() - entry.last_used > self.idle_timeout
+            if not expired and is_connection_alive(entry.driver):
+                with self._lock:
+                    self._stats["reused"] += 1
+                    self._in_use[key] = self._in_use.get(key, 0) + 1
+                entry.uses += 1
+                return entry
+
+            logger.debug(f"Conexión a '{key}' vencida o cerrada, reconectando")
+            self._discard(entry, in_use=False)
+
+        entry = PooledConnection(key, factory())
+        entry.uses = 1
+        with self._lock:
+            self._stats["created"] += 1
+            self._in_use[key] = self._in_use.get(key, 0) + 1
+        self._ensure_reaper()
+        return entry
+
+    def _release(self, key: str):
+        """Descuenta una conexión prestada. Requiere el lock."""
+        count = self._in_use.get(key, 0) - 1
+        if count > 0:
+            self._in_use[key] = count
+        else:
+            self._in_use.pop(key, None)
+
+    def _checkin(self, entry: PooledConnection, last_used: float = None):
+        entry.last_used = last_used or time.time()
+        with self._lock:
+            self._release(entry.key)
+            self._idle.setdefault(entry.key, []).append(entry)
+
+    def _discard(self, entry: PooledConnection, in_use: bool = True):
+        with self._lock:
+            self._stats["discarded"] += 1
+            if in_use:
+                self._release(entry.key)
+        entry.close()
+
+    def _ensure_reaper(self):
+        with self._lock:
+            if self._reaper and self._reaper.is_alive():
+                return
+            self._reaper = threading.Thread(target=self._reap_loop, daemon=True, name="PrinterPoolReaper")
+            self._reaper.start()
+
+    def _reap_loop(self):
+        """Cierra periódicamente las conexiones que superaron el tiempo de inactividad."""
+        while True:
+            time.sleep(self.reap_interval)
+            now = time.time()
+            expired = []
+            with self._lock:
+                for key, entries in list(self._idle.items()):
+                    keep = [e for e in entries if now - e.last_used <= self.idle_timeout]
+                    expired.extend(e for e in entries if now - e.last_used > self.idle_timeout)
+                    if keep:
+                        self._idle[key] = keep
+                    else:
+                        del self._idle[key]
+                self._stats["expired"] += len(expired)
+            for entry in expired:
+                logger.debug(f"Cerrando conexión inactiva a '{entry.key}'")
+                entry.close()
+
+
+_printer_pool_instance = None
+_printer_pool_lock = threading.Lock()
+
+
+def get_printer_pool() -> PrinterConnectionPool:
+    """
+    Obtiene la instancia singleton del pool de conexiones.
+
+    Returns:
+        PrinterConnectionPool: Pool de conexiones a impresoras
+    """
+    global _printer_pool_instance
+
+    with _printer_pool_lock:
+        if _printer_pool_instance is None:
+            idle_timeout = DEFAULT_IDLE_TIMEOUT
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                idle_timeout = float(Configberry().get("SERVIDOR", "printer_idle_timeout",
+                                                       fallback=DEFAULT_IDLE_TIMEOUT))
+            except Exception as e:
+                logger.warning(f"printer_idle_timeout inválido, usando {DEFAULT_IDLE_TIMEOUT}s: {e}")
+            _printer_pool_instance = PrinterConnectionPool(idle_timeout=idle_timeout)
+        return _printer_pool_instance
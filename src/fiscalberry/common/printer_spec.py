@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+"""
+Especificaciones de impresora precompiladas.
+
+Cada sección de impresora de config.ini se compila una sola vez (al cargar o
+recargar la configuración) en un PrinterSpec con los parámetros del driver ya
+validados y convertidos a su tipo (hex de USB, puertos, timeouts) y la clase
+del driver resuelta. Así una configuración inválida se detecta al cargarla y
+el despacho de cada trabajo es una búsqueda en un diccionario.
+"""
+
+import json
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Optional
+
+from fiscalberry.common.Configberry import Configberry
+from fiscalberry.common.fiscalberry_logger import getLogger
+from fiscalberry.common.rabbitmq.error_publisher import publish_error
+
+logger = getLogger()
+
+
+class PrinterSpecError(Exception):
+    """Configuración de impresora inválida."""
+    pass
+
+
+# nombre en config.ini (en minúsculas) -> nombre canónico del driver
+DRIVER_NAMES = {
+    "win32raw": "Win32Raw",
+    "usb": "Usb",
+    "network": "Network",
+    "serial": "Serial",
+    "bluetooth": "Bluetooth",
+    "file": "File",
+    "dummy": "Dummy",
+    "cups": "CupsPrinter",
+    "lp": "LP",
+    "fiscalberry": "Fiscalberry",
+    "group": "Group",
+}
+
+# Claves propias de fiscalberry que no se pasan al constructor del driver
+SPEC_OPTION_KEYS = {"columns", "concurrency", "optimize", "codepage", "members", "backup", "failover_on"}
+
+
+def _hex_int(value):
+    return value if isinstance(value, int) else int(str(value), 16)
+
+
+def _float(value):
+    return float(value)
+
+
+def _bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "si", "on")
+
+
+# Conversión de tipos de los parámetros de cada driver
+DRIVER_OPTION_TYPES = {
+    "Usb": {"idVendor": _hex_int, "idProduct": _hex_int, "in_ep": _hex_int,
+            "out_ep": _hex_int, "timeout": int, "interface": int},
+    "Network": {"port": int, "timeout": _float},
+    "Serial": {"baudrate": int, "bytesize": int, "timeout": _float,
+               "xonxoff": _bool, "dsrdtr": _bool},
+    "Bluetooth": {"timeout": int},
+    "File": {"auto_flush": _bool},
+}
+
+# Parámetros obligatorios por driver
+DRIVER_REQUIRED = {
+    "Usb": ("idVendor", "idProduct"),
+    "Network": ("host",),
+    "Bluetooth": ("mac_address",),
+}
+
+
+class PrinterSpec:
+    """Configuración compilada de una impresora."""
+
+    __slots__ = ("name", "driver_name", "driver_class", "driver_ops", "columns",
+                 "concurrency", "optimize", "codepage", "members", "backup", "failover_on", "options")
+
+    def __init__(self, name, driver_name: str, driver_class, driver_ops: Dict[str, Any],
+                 columns: Optional[int] = None, concurrency: int = 1, optimize: bool = True,
+                 codepage: Optional[str] = None, members: tuple = (),
+                 backup: Optional[str] = None, failover_on: frozenset = frozenset(),
+                 options: Optional[Dict[str, str]] = None):
+        self.name = name
+        self.driver_name = driver_name
+        self.driver_class = driver_class
+        self.driver_ops = MappingProxyType(driver_ops)
+        self.columns = columns
+        self.concurrency = concurrency
+        # pasar el buffer renderizado por el optimizador ESC/POS
+        self.optimize = optimize
+        # codepage fijo (capabilities.json) para codificar el texto sin MagicEncode
+        self.codepage = codepage
+        # impresoras de un grupo (driver Group), ver printer_groups
+        self.members = tuple(members)
+        # impresora de respaldo y causas que la activan, ver printer_failover
+        self.backup = backup
+        self.failover_on = failover_on
+        self.options = MappingProxyType(options or {})
+
+    @property
+    def render_key(self):
+        """Todo lo que cambia los bytes renderizados: impresoras con la misma clave comparten el render."""
+        return (self.driver_ops.get("profile"),
+                json.dumps(self.driver_ops.get("magic_encode_args"), sort_keys=True, default=str),
+                self.columns, self.codepage, self.optimize)
+
+    def create_driver(self):
+        """Instancia un driver nuevo para esta impresora."""
+        return self.driver_class(**self.driver_ops)
+
+    def __repr__(self):
+        return f"PrinterSpec({self.name!r}, driver={self.driver_name})"
+
+
+def _resolve_driver_class(driver_name: str):
+    if driver_name in ("Fiscalberry", "Group"):
+        return None
+
+    if driver_name == "Bluetooth":
+        # Importar driver Bluetooth custom
+        from fiscalberry.common.bluetooth_printer import BluetoothPrinter
+        return BluetoothPrinter
+
+    from escpos import printer
+
+    driver_class = getattr(printer, driver_name, None)
+    if driver_class is None:
+        raise PrinterSpecError(f"Driver {driver_name} not found in printer module")
+    if not callable(driver_class):
+        raise PrinterSpecError(f"Driver {driver_name} is not callable")
+    if driver_name == "Win32Raw" and not driver_class.is_usable():
+        raise PrinterSpecError(f"Driver {driver_name} no disponible")
+    return driver_class
+
+
+def compile_printer_spec(name, section: Dict[str, Any]) -> PrinterSpec:
+    """
+    Compila una sección de configuración de impresora.
+
+    Args:
+        name: Nombre de la impresora (sección) o printerName ad-hoc
+        section: Claves de la sección (no se modifica)
+
+    Raises:
+        PrinterSpecError: Si el driver o sus parámetros son inválidos
+    """
+    ops = dict(section)
+    raw_driver = str(ops.pop("driver", "Dummy"))
+    driver_name = DRIVER_NAMES.get(raw_driver.lower())
+    if driver_name is None:
+        raise PrinterSpecError(f"Invalid driver: {raw_driver}")
+
+    options = {k: ops.pop(k) for k in list(ops) if k in SPEC_OPTION_KEYS}
+
+    try:
+        columns = int(options["columns"]) if options.get("columns") else None
+        concurrency = int(options.get("concurrency", 1))
+        optimize = _bool(options.get("optimize", True))
+    except ValueError as e:
+        raise PrinterSpecError(f"Impresora '{name}': valor inválido ({e})")
+
+    members = ()
+    if driver_name == "Group":
+        members = tuple(member.strip() for member in str(options.get("members", "")).split(",") if member.strip())
+        if not members:
+            raise PrinterSpecError(f"Grupo '{name}': falta la lista de impresoras (members)")
+        if name in members:
+            raise PrinterSpecError(f"Grupo '{name}': no puede contenerse a sí mismo")
+
+    backup, failover_on = None, frozenset()
+    if options.get("backup"):
+        from fiscalberry.common.printer_failover import parse_failover_on
+        backup = str(options["backup"]).strip()
+        if backup == name:
+            raise PrinterSpecError(f"Impresora '{name}': no puede ser su propio respaldo")
+        try:
+            failover_on = parse_failover_on(options.get("failover_on"))
+        except ValueError as e:
+            raise PrinterSpecError(f"Impresora '{name}': {e}")
+
+    if ops.get("profile"):
+        # la cache compacta de capabilities puede no tener este perfil todavía
+        from fiscalberry.common.escpos_capabilities import ensure_profile
+        try:
+            ensure_profile(ops["profile"])
+        except KeyError as e:
+            raise PrinterSpecError(f"Impresora '{name}': {e.args[0]}")
+
+    codepage = None
+    if options.get("codepage"):
+        from fiscalberry.common.codepage_encoder import resolve_codepage, CodepageError
+        try:
+            codepage = resolve_codepage(options["codepage"], ops.get("profile"))
+        except CodepageError as e:
+            raise PrinterSpecError(f"Impresora '{name}': {e}")
+
+    if driver_name == "Bluetooth" and "macAddress" in ops:
+        # Normalizar nombre de parámetro
+        ops["mac_address"] = ops.pop("macAddress")
+
+    for key in DRIVER_REQUIRED.get(driver_name, ()):
+        if key not in ops:
+            raise PrinterSpecError(f"Impresora '{name}': falta el parámetro '{key}' para el driver {driver_name}")
+
+    for key, convert in DRIVER_OPTION_TYPES.get(driver_name, {}).items():
+        if key in ops:
+            try:
+                ops[key] = convert(ops[key])
+            except (TypeError, ValueError):
+                raise PrinterSpecError(f"Impresora '{name}': valor inválido para '{key}': {ops[key]!r}")
+
+    driver_class = _resolve_driver_class(driver_name)
+
+    return PrinterSpec(name, driver_name, driver_class, ops,
+                       columns=columns, concurrency=concurrency, optimize=optimize,
+                       codepage=codepage, members=members, backup=backup, failover_on=failover_on,
+                       options=options)
+
+
+class PrinterSpecRegistry:
+    """
+    Specs compiladas de todas las impresoras configuradas.
+
+    Se recompilan cuando cambia el snapshot de Configberry. Los printerName
+    ad-hoc (IP, "clave=valor&...", dict) se compilan al vuelo y se cachean.
+    """
+
+    MAX_ADHOC_SPECS = 64
+
+    def __init__(self, configberry: Optional[Configberry] = None):
+        self.configberry = configberry or Configberry()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._specs: Dict[str, PrinterSpec] = {}
+        self._errors: Dict[str, str] = {}
+        self._adhoc = OrderedDict()
+
+    def get(self, printer_name) -> PrinterSpec:
+        """
+        Devuelve la spec de una impresora.
+
+        Raises:
+            KeyError: Si la impresora no existe en la configuración
+            PrinterSpecError: Si su configuración es inválida
+        """
+        self._refresh()
+
+        if isinstance(printer_name, str):
+            spec = self._specs.get(printer_name)
+            if spec is not None:
+                return spec
+            if printer_name in self._errors:
+                raise PrinterSpecError(self._errors[printer_name])
+
+        return self._get_adhoc(printer_name)
+
+    def all(self) -> Dict[str, PrinterSpec]:
+        """Specs válidas de las impresoras configuradas."""
+        self._refresh()
+        return dict(self._specs)
+
+    def errors(self) -> Dict[str, str]:
+        """Impresoras configuradas con errores de compilación."""
+        self._refresh()
+        return dict(self._errors)
+
+    def _refresh(self):
+        snapshot = self.configberry.snapshot()
+        if snapshot is self._snapshot:
+            return
+        with self._lock:
+            if snapshot is self._snapshot:
+                return
+            self._compile_all(snapshot)
+
+    def _compile_all(self, snapshot):
+        specs, errors = {}, {}
+        for name in snapshot.sections():
+            section = snapshot.section(name)
+            if "driver" not in section:
+                # SERVIDOR, Paxaprinter, RabbitMq, etc.
+                continue
+            try:
+                specs[name] = compile_printer_spec(name, section)
+            except Exception as e:
+                errors[name] = str(e)
+                logger.error(f"Configuración inválida de impresora '{name}': {e}")
+                publish_error(
+                    error_type="PRINTER_CONFIG_ERROR",
+                    error_message=f"Invalid printer configuration: '{name}' - {e}",
+                    context={"printer_name": name},
+                    exception=e
+                )
+
+        self._specs, self._errors = specs, errors
+        self._adhoc.clear()
+        self._snapshot = snapshot
+        logger.debug(f"Specs de impresoras compiladas: {list(specs)}")
+
+    def _get_adhoc(self, printer_name) -> PrinterSpec:
+        key = json.dumps(printer_name, sort_keys=True) if isinstance(printer_name, dict) else printer_name
+        with self._lock:
+            spec = self._adhoc.get(key)
+            if spec is not None:
+                self._adhoc.move_to_end(key)
+                return spec
+
+        # lanza KeyError si es un nombre de sección inexistente
+        section = self.configberry.get_config_for_printer(printer_name)
+        spec = compile_printer_spec(printer_name, section)
+
+        with self._lock:
+            self._adhoc[key] = spec
+            if len(self._adhoc) > self.MAX_ADHOC_SPECS:
+                self._adhoc.popitem(last=False)
+        return spec
+
+
+_printer_specs_instance = None
+_printer_specs_lock = threading.Lock()
+
+
+def get_printer_specs() -> PrinterSpecRegistry:
+    """
+    Obtiene la instancia singleton del registro de specs.
+
+    Returns:
+        PrinterSpecRegistry: Registro de impresoras compiladas
+    """
+    global _printer_specs_instance
+
+    with _printer_specs_lock:
+        if _printer_specs_instance is None:
+            _printer_specs_instance = PrinterSpecRegistry()
+        return _printer_specs_instance
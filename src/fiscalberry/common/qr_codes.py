@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Impresión de códigos QR (AFIP, MercadoPago, qr libre).
+
+python-escpos dibuja por defecto el QR como imagen con la librería qrcode y
+lo rasteriza en Python, que en una Raspberry Pi es lo más caro de una
+factura. Según el perfil de la impresora:
+
+- NATIVE: el perfil configurado soporta QR (qrCode), se envía el comando
+  GS ( k y la impresora lo genera.
+- RASTER: se usa la imagen, guardando los bytes rasterizados en una cache
+  LRU acotada. El QR de MercadoPago es el mismo en todos los tickets.
+
+Con el perfil por defecto (sin `profile` en la configuración) se mantiene la
+imagen: muchas impresoras genéricas no implementan GS ( k.
+"""
+
+import threading
+
+from escpos.constants import QR_ECLEVEL_L
+from escpos.escpos import EscposIO
+
+from fiscalberry.common.block_cache import RenderedBlockCache, render_cached
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+NATIVE = "native"
+RASTER = "raster"
+
+# Cantidad máxima de QR rasterizados guardados
+DEFAULT_QR_CACHE_SIZE = 32
+
+
+def qr_strategy(printer) -> str:
+    """NATIVE si el perfil configurado de la impresora soporta QR, si no RASTER."""
+    profile = printer.profile
+    if profile.profile_data.get("name") != "Default" and profile.supports("qrCode"):
+        return NATIVE
+    return RASTER
+
+
+def print_qr(escpos: EscposIO, content, ec=QR_ECLEVEL_L, size: int = 3):
+    """
+    Imprime un QR con la estrategia que corresponde al perfil de la impresora.
+
+    Mismos argumentos que Escpos.qr y el mismo espaciado (una línea antes,
+    dos después).
+    """
+    if not content:
+        return
+
+    printer = escpos.printer
+    if qr_strategy(printer) == NATIVE:
+        printer.text("\n")
+        printer.qr(content, ec=ec, size=size, native=True)
+        printer.text("\n")
+        printer.text("\n")
+        return
+
+    render_cached(
+        escpos,
+        ("qr", str(content), ec, size),
+        lambda io: io.printer.qr(content, ec=ec, size=size),
+        cache=get_qr_cache()
+    )
+
+
+_qr_cache_instance = None
+_qr_cache_lock = threading.Lock()
+
+
+def get_qr_cache() -> RenderedBlockCache:
+    """
+    Obtiene la instancia singleton de la cache de QR rasterizados.
+
+    Returns:
+        RenderedBlockCache: Con capacidad SERVIDOR.qr_cache_size (0 la desactiva)
+    """
+    global _qr_cache_instance
+
+    if _qr_cache_instance is not None:
+        return _qr_cache_instance
+
+    with _qr_cache_lock:
+        if _qr_cache_instance is None:
+            size = DEFAULT_QR_CACHE_SIZE
+            try:
+                from fiscalberry.common.Configberry import Configberry
+                size = int(Configberry().get("SERVIDOR", "qr_cache_size", fallback=DEFAULT_QR_CACHE_SIZE))
+            except Exception as e:
+                logger.warning(f"qr_cache_size inválido, usando {DEFAULT_QR_CACHE_SIZE}: {e}")
+            _qr_cache_instance = RenderedBlockCache(size)
+        return _qr_cache_instance
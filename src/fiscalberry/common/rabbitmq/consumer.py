@@ -119,40 +119,15 @@ class RabbitMQConsumer:
                     self.logger.warning("Non-JSON message, processing as string")
                     json_data = body_str
 
-                # Procesar mensaje de forma optimizada
+                # Encolar sin bloquear: el ack/nack se hace cuando termina la impresión,
+                # así este thread sigue recibiendo mensajes para otras impresoras
                 comandoHandler = ComandosHandler()
-                result = comandoHandler.send_command(json_data)
-                
-                processing_time = time.time() - start_time
-                
-                # Verificar errores y acknowledment más rápido
-                if "err" in result:
-                    error_msg = result['err']
-                    self.logger.error("Command execution failed: %s", error_msg)
-                    
-                    # Publicar error a RabbitMQ
-                    publish_error(
-                        error_type="COMMAND_EXECUTION_ERROR",
-                        error_message=error_msg,
-                        context={
-                            "command": json_data,
-                            "result": result,
-                            "queue": self.queue
-                        }
-                    )
-                    
-                    # Si es un error recuperable, podríamos reintentar o poner en una cola de espera
-                    # Por ahora, consideramos que es un error y no reconocemos el mensaje
-                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-                    return
-                    
-
-                # Acknowledge the message ONLY after successful processing
-                ch.basic_ack(delivery_tag=method.delivery_tag)
-                
-                # Log optimizado solo para trabajos lentos
-                if processing_time > 1.0:
-                    self.logger.warning(f"Slow message processed in {processing_time:.2f}s")
+                # message_id / correlation_id: una reentrega no vuelve a imprimir
+                comandoHandler.submit_command(
+                    json_data,
+                    callback=lambda result: self._on_command_done(ch, method, json_data, result, start_time),
+                    message_id=properties.message_id or properties.correlation_id
+                )
 
             except TraductorException as e:
                 self.logger.error("Translation error: %s", e)
@@ -219,6 +194,51 @@ class RabbitMQConsumer:
             raise
 
 
+    def _on_command_done(self, ch, method, json_data, result, start_time):
+        """
+        Callback de fin de comando (se ejecuta en el worker de impresión).
+
+        pika no es thread-safe: el ack/nack se agenda en el thread de la conexión.
+        """
+        try:
+            ch.connection.add_callback_threadsafe(
+                lambda: self._ack_command(ch, method, json_data, result, start_time)
+            )
+        except Exception as e:
+            # La conexión se cerró: el broker va a reenviar el mensaje
+            self.logger.error(f"No se pudo confirmar el mensaje {method.delivery_tag}: {e}")
+
+    def _ack_command(self, ch, method, json_data, result, start_time):
+        processing_time = time.time() - start_time
+
+        # Verificar errores y acknowledment
+        if "err" in result:
+            error_msg = result['err']
+            self.logger.error("Command execution failed: %s", error_msg)
+            
+            # Publicar error a RabbitMQ
+            publish_error(
+                error_type="COMMAND_EXECUTION_ERROR",
+                error_message=error_msg,
+                context={
+                    "command": json_data,
+                    "result": result,
+                    "queue": self.queue
+                }
+            )
+            
+            # Si es un error recuperable, podríamos reintentar o poner en una cola de espera
+            # Por ahora, consideramos que es un error y no reconocemos el mensaje
+            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
+            return
+
+        # Acknowledge the message ONLY after successful processing
+        ch.basic_ack(delivery_tag=method.delivery_tag)
+        
+        # Log optimizado solo para trabajos lentos
+        if processing_time > 1.0:
+            self.logger.warning(f"Slow message processed in {processing_time:.2f}s")
+
     def stop(self):
         """Detiene la conexión."""
         if self.connection:
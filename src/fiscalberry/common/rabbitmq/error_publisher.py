@@ -11,8 +11,6 @@ import time
 import traceback
 from datetime import datetime
 from typing import Optional, Dict, Any
-import pika
-import pika.exceptions
 
 from fiscalberry.common.fiscalberry_logger import getLogger
 from fiscalberry.common.Configberry import Configberry
@@ -128,6 +126,9 @@ class ErrorPublisher:
                 return False
                 
             try:
+                # pika se importa recién al conectar: no pesa en el arranque de quien solo importa publish_error
+                import pika
+
                 config = self._get_rabbitmq_config()
                 
                 logger.debug("ErrorPublisher: Connecting to RabbitMQ - Host: %s:%s, VHost: %s, User: %s",
@@ -245,6 +246,8 @@ class ErrorPublisher:
             logger.debug("ErrorPublisher: Publishing error - Type: %s, Context keys: %s",
                         error_type, list(context.keys()) if context else [])
             
+            import pika
+
             # Publicar al exchange directo (para el tenant específico)
             with self._lock:
                 if self.channel and not self.channel.is_closed:
@@ -4,6 +4,7 @@ import os
 import signal
 import socketio
 from fiscalberry.common.fiscalberry_sio import FiscalberrySio
+from fiscalberry.common.ComandosHandler import start_print_service
 from fiscalberry.common.discover import send_discover_in_thread
 from fiscalberry.common.Configberry import Configberry
 import time
@@ -109,6 +110,10 @@ class ServiceController:
         
         # Solicitar detención limpia (sin sys.exit)
         self._stop_services_only()
+
+        # Volcar a disco el spool de impresión antes de salir
+        from fiscalberry.common.print_spool import close_print_spool
+        close_print_spool()
         
         # Terminar inmediatamente después de la limpieza
         logger.info("Terminando aplicación...")
@@ -179,6 +184,9 @@ class ServiceController:
             logger.debug("Stop requested during initial check.")
             return
 
+        # Workers de impresión (importar ComandosHandler no los inicia)
+        start_print_service()
+
         # Enviar el discover al servidor
         self.discover_thread = send_discover_in_thread()
         self.discover_thread.start()
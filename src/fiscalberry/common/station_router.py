@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Ruteo de comandas por estación.
+
+La sección [Estaciones] de config.ini asigna categorías o tags de los ítems a
+impresoras (estaciones):
+
+    [Estaciones]
+    bebidas = Barra
+    postres = Cafeteria
+    parrilla = Parrilla, Expo
+    default = Cocina
+
+Una comanda con "route": true se divide en una sub-comanda por estación con
+los ítems (entradas y platos) que le tocan, según su "categoria" y sus
+"tags" (la primera que figure en la tabla). Los datos generales de la
+comanda (id, fecha, observación, encabezado y trailer) van en todas. Los
+ítems sin estación van a "default" o, si el mensaje lo trae, a su
+printerName.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from fiscalberry.common.Configberry import Configberry
+from fiscalberry.common.fiscalberry_logger import getLogger
+
+logger = getLogger()
+
+# Sección de config.ini con la tabla de ruteo
+STATIONS_SECTION = "Estaciones"
+
+# Clave de la estación para los ítems sin categoría ni tag en la tabla
+DEFAULT_STATION = "default"
+
+# Listas de ítems de una comanda
+ITEM_LISTS = ("entradas", "platos")
+
+
+class RoutingError(Exception):
+    """Ítems de la comanda sin estación."""
+    pass
+
+
+def _stations(value: str) -> List[str]:
+    return [station.strip() for station in str(value).split(",") if station.strip()]
+
+
+def _item_keys(item: Dict[str, Any]) -> List[str]:
+    """Categoría y tags de un ítem, normalizados, en orden de preferencia."""
+    keys = []
+    if item.get("categoria"):
+        keys.append(str(item["categoria"]))
+    tags = item.get("tags") or []
+    if isinstance(tags, str):
+        tags = tags.split(",")
+    keys.extend(str(tag) for tag in tags)
+    return [key.strip().lower() for key in keys if str(key).strip()]
+
+
+class StationRouter:
+    """Tabla de ruteo compilada desde la sección [Estaciones]."""
+
+    def __init__(self, table: Optional[Dict[str, str]] = None):
+        table = table or {}
+        self.routes = {key.strip().lower(): _stations(value) for key, value in table.items()
+                       if key.strip().lower() != DEFAULT_STATION and _stations(value)}
+        self.default = _stations(table.get(DEFAULT_STATION, ""))
+
+    def stations_for(self, item: Dict[str, Any], fallback: Optional[List[str]] = None) -> List[str]:
+        """Estaciones de un ítem (vacío si no tiene ninguna)."""
+        for key in _item_keys(item):
+            stations = self.routes.get(key)
+            if stations:
+                return stations
+        return fallback or self.default
+
+    def split(self, comanda: Dict[str, Any], fallback=None) -> "OrderedDict[str, Dict[str, Any]]":
+        """
+        Divide una comanda en sub-comandas por estación.
+
+        Args:
+            comanda: Parámetro "comanda" de printComanda
+            fallback: printerName del mensaje, para los ítems sin estación
+                (tiene prioridad sobre "default" de la tabla)
+
+        Returns:
+            OrderedDict: estación -> sub-comanda, en el orden en que aparecen
+
+        Raises:
+            RoutingError: Si algún ítem no tiene estación
+        """
+        fallback = _stations(fallback) if isinstance(fallback, str) else None
+        general = {key: value for key, value in comanda.items() if key not in ITEM_LISTS}
+        split = OrderedDict()
+        unrouted = []
+
+        for list_name in ITEM_LISTS:
+            for item in comanda.get(list_name) or []:
+                stations = self.stations_for(item, fallback)
+                if not stations:
+                    unrouted.append(str(item.get("nombre", item)))
+                for station in stations:
+                    sub = split.setdefault(station, dict(general))
+                    sub.setdefault(list_name, []).append(item)
+
+        if unrouted:
+            raise RoutingError(f"Ítems sin estación: {', '.join(unrouted)} "
+                               f"(agregar su categoría a [{STATIONS_SECTION}], una estación "
+                               f"'{DEFAULT_STATION}' o un printerName en el mensaje)")
+        if not split:
+            # comanda sin ítems: solo la observación, a la estación por defecto
+            for station in fallback or self.default:
+                split[station] = dict(general)
+        return split
+
+
+class StationRouterRegistry:
+    """Router vigente; se recompila cuando cambia el snapshot de Configberry."""
+
+    def __init__(self, configberry: Optional[Configberry] = None):
+        self.configberry = configberry or Configberry()
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._router = StationRouter()
+
+    def get(self) -> StationRouter:
+        snapshot = self.configberry.snapshot()
+        if snapshot is not self._snapshot:
+            with self._lock:
+                if snapshot is not self._snapshot:
+                    table = snapshot.section(STATIONS_SECTION) if snapshot.has_section(STATIONS_SECTION) else {}
+                    self._router = StationRouter(dict(table))
+                    self._snapshot = snapshot
+                    logger.debug(f"Ruteo de estaciones: {self._router.routes} (default: {self._router.default})")
+        return self._router
+
+
+_station_router_instance = None
+_station_router_lock = threading.Lock()
+
+
+def get_station_router() -> StationRouter:
+    """
+    Obtiene el router de estaciones vigente.
+
+    Returns:
+        StationRouter: Compilado desde la sección [Estaciones] de config.ini
+    """
+    global _station_router_instance
+
+    with _station_router_lock:
+        if _station_router_instance is None:
+            _station_router_instance = StationRouterRegistry()
+    return _station_router_instance.get()
@@ -1,3 +1,8 @@
+from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+
+# Antes de que la UI importe escpos: cargar solo los perfiles de impresora en uso
+prepare_escpos_capabilities()
+
 from fiscalberry.ui.fiscalberry_app import FiscalberryApp
 from fiscalberry.common.fiscalberry_logger import getLogger
 import sys
@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+Verifica que el optimizador ESC/POS no cambie lo que se imprime.
+
+Renderiza tickets de ejemplo (comanda, factura electrónica, texto, bytes
+crudos con imagen) y secuencias aleatorias de comandos de python-escpos,
+los pasa por el optimizador y compara ambos flujos con un intérprete de
+referencia independiente del optimizador: cada carácter impreso con el modo
+vigente, el avance del papel, cada comando (QR, imagen, corte) y el estado
+final de la impresora tienen que ser idénticos.
+
+Uso:
+    python -m fiscalberry.diagnostics.escpos_optimizer_check [--fuzz 500] [--seed 1]
+
+La misma verificación corre en tests/test_escpos_optimizer.py.
+"""
+
+import argparse
+import os
+import random
+import sys
+
+# Agregar el directorio src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from escpos.printer import Dummy
+
+from fiscalberry.common.EscPComandos import EscPComandos
+from fiscalberry.common.escpos_optimizer import EscposOptimizer
+
+# Intérprete de referencia escrito a partir del manual de comandos ESC/POS, sin
+# reutilizar nada del optimizador (ni su tokenizador ni sus tablas): si los dos
+# compartieran una interpretación equivocada, la verificación no la detectaría.
+
+ESC, GS, FS, DLE = b"\x1b"[0], b"\x1d"[0], b"\x1c"[0], b"\x10"[0]
+
+
+def _n012(n):
+    return n - 0x30 if 0x30 <= n <= 0x32 else n
+
+
+# Modos de un parámetro: comando -> n -> {atributo: valor}
+_MODES = {
+    b"\x1b!": lambda n: {"font": "B" if n & 0x01 else "A", "emphasized": bool(n & 0x08),
+                         "height": 2 if n & 0x10 else 1, "width": 2 if n & 0x20 else 1,
+                         "underline": "ESC ! bit 7" if n & 0x80 else 0},
+    b"\x1bE": lambda n: {"emphasized": bool(n & 1)},
+    b"\x1bG": lambda n: {"double_strike": bool(n & 1)},
+    b"\x1b-": lambda n: {"underline": _n012(n)},
+    b"\x1bM": lambda n: {"font": "ABC"[_n012(n)] if _n012(n) < 3 else n},
+    b"\x1ba": lambda n: {"justification": _n012(n)},
+    b"\x1b{": lambda n: {"upside_down": bool(n & 1)},
+    b"\x1bV": lambda n: {"rotation": _n012(n)},
+    b"\x1bU": lambda n: {"unidirectional": bool(n & 1)},
+    b"\x1bt": lambda n: {"code_table": n},
+    b"\x1bR": lambda n: {"international": n},
+    b"\x1br": lambda n: {"color": _n012(n)},
+    b"\x1b ": lambda n: {"right_spacing": n},
+    b"\x1b3": lambda n: {"line_spacing": ("1/180", n)},
+    b"\x1b+": lambda n: {"line_spacing": ("1/360", n)},
+    b"\x1d!": lambda n: {"width": (n >> 4) + 1, "height": (n & 0x0F) + 1},
+    b"\x1dB": lambda n: {"reverse": bool(n & 1)},
+    b"\x1db": lambda n: {"smoothing": bool(n & 1)},
+    b"\x1d|": lambda n: {"print_density": n},
+    b"\x1dH": lambda n: {"hri_position": _n012(n)},
+    b"\x1df": lambda n: {"hri_font": _n012(n)},
+    b"\x1dh": lambda n: {"barcode_height": n},
+    b"\x1dw": lambda n: {"barcode_module": n},
+}
+
+# Modos de dos parámetros (nL nH)
+_MODES_16 = {b"\x1dL": "left_margin", b"\x1dW": "printing_area_width"}
+
+# Según el manual solo valen al principio de una línea; a mitad de línea se ignoran
+_LINE_START_ONLY = {"justification", "upside_down", "left_margin", "printing_area_width"}
+
+# Comandos sin datos variables: comando -> largo total
+_FIXED = {
+    b"\x1bp": 5, b"\x1bB": 4, b"\x1b=": 3, b"\x1b$": 4, b"\x1b\\": 4, b"\x1b?": 3,
+    b"\x1bi": 2, b"\x1bm": 2, b"\x1bS": 2, b"\x1bT": 3, b"\x1dP": 4, b"\x1da": 3,
+    b"\x1dr": 3, b"\x1dI": 3, b"\x1dT": 3, b"\x1d/": 3, b"\x1d$": 4, b"\x1d\\": 4,
+    b"\x1c.": 2, b"\x1c&": 2, b"\x1c!": 3, b"\x1c-": 3, b"\x1cW": 3, b"\x1cp": 4,
+    b"\x10\x04": 3, b"\x10\x05": 3,
+}
+
+# Comandos que no imprimen ni mueven la posición de impresión
+_SILENT = {b"\x1bp", b"\x1bB", b"\x1b=", b"\x1b?", b"\x1dP", b"\x1da", b"\x1dr", b"\x1dI",
+           b"\x1c.", b"\x1c&", b"\x1c!", b"\x1c-", b"\x1cW", b"\x10\x04", b"\x10\x05", b"\x10\x14"}
+
+# Comandos después de los cuales la posición vuelve al principio de la línea
+# (códigos de barras, QR, imagen raster, corte)
+_ENDS_LINE = {b"\x1dk", b"\x1d(", b"\x1dv", b"\x1d8", b"\x1dV"}
+
+
+def _variable_length(data: bytes, i: int):
+    """Largo de un comando con datos, o None si no se reconoce o está truncado."""
+    def byte(offset):
+        return data[i + offset] if i + offset < len(data) else None
+
+    cmd = data[i:i + 2]
+    if cmd in (b"\x1d(", b"\x1b(", b"\x1c("):
+        return None if byte(4) is None else 5 + byte(3) + 256 * byte(4)
+    if cmd == b"\x1dv":
+        if byte(2) not in (0x00, 0x30) or byte(7) is None:
+            return None
+        return 8 + (byte(4) + 256 * byte(5)) * (byte(6) + 256 * byte(7))
+    if cmd == b"\x1d8":
+        if byte(2) != ord("L") or byte(6) is None:
+            return None
+        return 7 + int.from_bytes(data[i + 3:i + 7], "little")
+    if cmd == b"\x1d*":
+        return None if byte(3) is None else 4 + 8 * byte(2) * byte(3)
+    if cmd == b"\x1b*":
+        if byte(4) is None or byte(2) not in (0, 1, 32, 33):
+            return None
+        return 5 + (3 if byte(2) >= 32 else 1) * (byte(3) + 256 * byte(4))
+    if cmd == b"\x1dk":
+        m = byte(2)
+        if m is not None and m <= 6:
+            nul = data.find(0, i + 3)
+            return None if nul < 0 else nul - i + 1
+        if m is not None and 65 <= m <= 79 and byte(3) is not None:
+            return 4 + byte(3)
+        return None
+    if cmd == b"\x1dV":
+        m = byte(2)
+        return 3 if m in (0, 1, 48, 49) else 4 if m in (65, 66, 97, 98, 103, 104) else None
+    if cmd == b"\x1bD":
+        nul = data.find(0, i + 2, i + 35)
+        return None if nul < 0 else nul - i + 1
+    if cmd == b"\x1bc":
+        return 4 if byte(2) in b"345" else None
+    if cmd == b"\x10\x14":
+        return 5 if byte(2) in (1, 2) else None
+    return None
+
+
+def interpret(data: bytes):
+    """
+    Intérprete de referencia: lo que sale impreso con un flujo ESC/POS.
+
+    Modela una impresora: cada carácter impreso con el modo vigente, el avance
+    del papel (LF, ESC d n, ESC J...) acumulado por interlineado, los comandos
+    que imprimen (QR, imagen, código de barras, corte) y el estado final. No
+    supone el estado inicial: un atributo no fijado no figura en el modo, y
+    cada ESC @ abre una época nueva. Un comando que no conoce corta la
+    interpretación y el resto se compara byte a byte.
+
+    Returns:
+        (eventos, estado_final)
+    """
+    epoch = 0
+    mode = {}
+    # cada trabajo empieza con el buffer de impresión vacío
+    at_line_start = True
+    events = []
+
+    def current():
+        return epoch, tuple(sorted(mode.items()))
+
+    def feed(lines):
+        # un salto impreso con el buffer vacío avanza lo mismo que uno con texto:
+        # se acumula el avance por interlineado vigente
+        spacing = (epoch, mode.get("line_spacing"))
+        if events and events[-1][0] == "FEED" and events[-1][1] == spacing:
+            events[-1] = ("FEED", spacing, events[-1][2] + lines)
+        elif lines:
+            events.append(("FEED", spacing, lines))
+
+    i = 0
+    while i < len(data):
+        byte = data[i]
+        if byte == 0x0A:
+            feed(1)
+            at_line_start = True
+            i += 1
+            continue
+        if byte >= 0x20 or byte in (0x09, 0x0D):
+            events.append(("CHAR", byte, current()))
+            at_line_start = False
+            i += 1
+            continue
+
+        cmd = data[i:i + 2]
+        values = None
+        length = None
+        if cmd == b"\x1b2":
+            values, length = {"line_spacing": "default"}, 2
+        elif cmd in _MODES and i + 2 < len(data):
+            values, length = _MODES[cmd](data[i + 2]), 3
+        elif cmd in _MODES_16 and i + 3 < len(data):
+            values, length = {_MODES_16[cmd]: data[i + 2] + 256 * data[i + 3]}, 4
+
+        if values is not None:
+            if at_line_start or not _LINE_START_ONLY.intersection(values):
+                mode.update(values)
+            i += length
+            continue
+
+        if cmd == b"\x1b@":
+            # inicializar: descarta el modo (valores de fábrica, desconocidos acá)
+            epoch += 1
+            mode = {}
+            at_line_start = True
+            events.append(("INIT",))
+            i += 2
+            continue
+        if cmd in (b"\x1bd", b"\x1bJ", b"\x1be") and i + 2 < len(data):
+            n = data[i + 2]
+            if cmd == b"\x1bd":
+                feed(n)
+            else:
+                events.append(("DOTS", cmd, n, current()))
+            at_line_start = True
+            i += 3
+            continue
+
+        length = _FIXED.get(cmd) or _variable_length(data, i)
+        if length is None or i + length > len(data):
+            events.append(("RAW", data[i:]))
+            break
+        events.append(("CMD", data[i:i + length], current()))
+        if cmd in _ENDS_LINE:
+            at_line_start = True
+        elif cmd not in _SILENT:
+            at_line_start = False
+        i += length
+
+    return events, current()
+
+
+def check(name: str, data: bytes, verbose: bool = True) -> bool:
+    optimizer = EscposOptimizer()
+    optimized = optimizer.optimize(data)
+    ok = interpret(data) == interpret(optimized)
+    # una segunda pasada no debe encontrar nada más que sacar
+    idempotent = optimizer.optimize(optimized) == optimized
+
+    if verbose or not ok or not idempotent:
+        saved = len(data) - len(optimized)
+        pct = (saved / len(data) * 100) if data else 0
+        status = "✓" if ok and idempotent else "✗"
+        print(f"{status} {name}: {len(data)} -> {len(optimized)} bytes (-{pct:.1f}%)"
+              + ("" if idempotent else " [no idempotente]")
+              + (" [comando desconocido: resto sin optimizar]" if optimizer.bailed else ""))
+    return ok and idempotent
+
+
+def render(ticket: dict, columns=None) -> bytes:
+    printer = Dummy()
+    EscPComandos(printer, columns=columns).run(ticket)
+    return printer.output
+
+
+SAMPLE_TICKETS = {
+    "comanda": {
+        "printComanda": {
+            "comanda": {
+                "id": "1234",
+                "created": "2024-05-10 21:15:00",
+                "observacion": "Mesa junto a la ventana",
+                "platos": [
+                    {"nombre": "Milanesa napolitana", "cant": 2, "observacion": "una sin jamón"},
+                    {"nombre": "Papas fritas", "cant": 1},
+                    {"nombre": "Ensalada mixta", "cant": 3, "observacion": "sin cebolla"},
+                ],
+                "entradas": [{"nombre": "Empanadas", "cant": 6}],
+            },
+            "setTrailer": ["Mozo: Juan", "", "Gracias"],
+        }
+    },
+    "factura": {
+        "printFacturaElectronica": {
+            "encabezado": {
+                "nombre_comercio": "Bar El Ejemplo",
+                "razon_social": "Ejemplo SRL",
+                "cuit_empresa": "30712345678",
+                "ingresos_brutos": "901-123456-7",
+                "domicilio_comercial": "Av. Siempre Viva 742",
+                "inicio_actividades": "01/01/2020",
+                "tipo_responsable": "IVA Responsable Inscripto",
+                "tipo_comprobante": "Factura B",
+                "tipo_comprobante_codigo": "006",
+                "numero_comprobante": "0004-00001234",
+                "fecha_comprobante": "10/05/2024",
+                "importe_neto": "8264.46",
+                "importe_total": "10000.00",
+                "cae": "74123456789012",
+                "cae_vto": "20/05/2024",
+            },
+            "items": [
+                {"alic_iva": 21, "qty": 2, "importe": 2500, "ds": "Milanesa napolitana"},
+                {"alic_iva": 21, "qty": 1, "importe": 3000, "ds": "Vino tinto"},
+                {"alic_iva": 21, "qty": 4, "importe": 500, "ds": "Café"},
+            ],
+            "ivas": [{"alic_iva": 21, "importe": 1735.54}],
+            "pagos": [{"ds": "Efectivo", "importe": 10000}],
+        }
+    },
+    "texto": {"printTexto": {"texto": "Línea uno\nLínea dos\n\n\n\n\n\nFin\n"}},
+}
+
+
+def raw_ticket() -> bytes:
+    """Bytes crudos de python-escpos: QR, código de barras, imagen raster y corte."""
+    from PIL import Image
+
+    printer = Dummy()
+    printer.set(align="center", bold=True, double_height=True)
+    printer.text("TITULO\n")
+    printer.set(align="center", bold=True, double_height=True)
+    printer.qr("https://paxapos.com", size=4)
+    printer.set(align="left", normal_textsize=True)
+    printer.barcode("1234567890128", "EAN13")
+    printer.image(Image.new("1", (64, 24), 0))
+    printer.text("\x1b\x1b")
+    printer.ln(8)
+    printer.cut()
+    return printer.output
+
+
+def fuzz_ticket(rng: random.Random) -> bytes:
+    """Secuencia aleatoria de set/text/ln/control de python-escpos."""
+    printer = Dummy()
+    for _ in range(rng.randint(5, 60)):
+        op = rng.random()
+        if op < 0.45:
+            kwargs = {}
+            for key, choices in (("align", ["left", "center", "right"]), ("bold", [True, False]),
+                                 ("underline", [0, 1, 2]), ("font", ["a", "b"]),
+                                 ("invert", [True, False]), ("flip", [True, False]),
+                                 ("smooth", [True, False]), ("density", [0, 4, 8, 9])):
+                if rng.random() < 0.4:
+                    kwargs[key] = rng.choice(choices)
+            size = rng.random()
+            if size < 0.2:
+                kwargs["normal_textsize"] = True
+            elif size < 0.3:
+                kwargs["double_width"] = True
+                kwargs["double_height"] = rng.random() < 0.5
+            elif size < 0.35:
+                kwargs.update(custom_size=True, width=rng.randint(1, 8), height=rng.randint(1, 8))
+            printer.set(**kwargs)
+        elif op < 0.75:
+            printer.text(rng.choice(["Hola", "ñandú", "1234.50", " ", "€uro", "x" * 48]))
+        elif op < 0.9:
+            printer.ln(rng.randint(1, 6))
+        elif op < 0.94:
+            printer.line_spacing(rng.choice([None, 30, 60]))
+        elif op < 0.97:
+            printer._raw(b"\x1b@")
+        else:
+            printer._raw(rng.choice([b"\x1b\x21\x88", b"\x1d\x21\x11", b"\x1b\x45\x01", b"\r"]))
+    return printer.output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifica el optimizador ESC/POS")
+    parser.add_argument("--fuzz", type=int, default=500, help="Cantidad de secuencias aleatorias")
+    parser.add_argument("--seed", type=int, default=1, help="Semilla de las secuencias aleatorias")
+    args = parser.parse_args()
+
+    print("=== Optimizador ESC/POS: verificación de equivalencia ===\n")
+    ok = True
+    for name, ticket in SAMPLE_TICKETS.items():
+        for columns in (None, 32):
+            label = f"{name} ({columns or 48} columnas)"
+            ok &= check(label, render(dict(ticket), columns))
+    ok &= check("bytes crudos (QR, código de barras, imagen, corte, comando desconocido)", raw_ticket())
+
+    rng = random.Random(args.seed)
+    fuzz_ok = 0
+    total_in = total_out = 0
+    for n in range(args.fuzz):
+        data = fuzz_ticket(rng)
+        total_in += len(data)
+        total_out += len(EscposOptimizer().optimize(data))
+        if check(f"aleatorio #{n}", data, verbose=False):
+            fuzz_ok += 1
+        else:
+            ok = False
+    if args.fuzz:
+        pct = (total_in - total_out) / total_in * 100 if total_in else 0
+        print(f"{'✓' if fuzz_ok == args.fuzz else '✗'} aleatorios: {fuzz_ok}/{args.fuzz} equivalentes "
+              f"({total_in} -> {total_out} bytes, -{pct:.1f}%)")
+
+    print("\n" + ("Todo equivalente" if ok else "Hay diferencias"))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Mide cuánto demora el spool en aceptar un trabajo (PrintSpool.append espera
+a que esté en disco) con distintas ventanas de agrupado (flush_interval).
+
+Corre dos cargas sobre una base temporal: trabajos de a uno (un solo POS) y
+varios threads enviando a la vez (ráfaga de comandas), y muestra la mediana y
+el p95 de append() y los trabajos por segundo.
+
+Uso:
+    python -m fiscalberry.diagnostics.spool_benchmark [--jobs 200] [--threads 8] [--intervals 0 0.02]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+# Agregar el directorio src al path para importar los módulos
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
+
+from fiscalberry.common.print_spool import PrintSpool
+
+TICKET = {"printComanda": {"comanda": {"id": "1234", "platos": [{"nombre": "Milanesa", "cant": 2}]}}}
+
+
+def run(flush_interval: float, jobs: int, threads: int):
+    """Devuelve (latencias en ms, segundos totales)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        spool = PrintSpool(os.path.join(tmp, "spool.db"), flush_interval=flush_interval)
+        latencies = []
+        lock = threading.Lock()
+
+        def worker(count):
+            for _ in range(count):
+                t0 = time.perf_counter()
+                seq = spool.append("Cocina", TICKET)
+                elapsed = (time.perf_counter() - t0) * 1000
+                spool.complete(seq)
+                with lock:
+                    latencies.append(elapsed)
+
+        start = time.perf_counter()
+        workers = [threading.Thread(target=worker, args=(jobs // threads,)) for _ in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        total = time.perf_counter() - start
+        spool.close()
+    return latencies, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del spool de impresión")
+    parser.add_argument("--jobs", type=int, default=200, help="Trabajos por medición")
+    parser.add_argument("--threads", type=int, default=8, help="Threads de la carga concurrente")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0.0, 0.02],
+                        help="Ventanas de agrupado a comparar (segundos)")
+    args = parser.parse_args()
+
+    print("=== Spool de impresión: latencia de append() ===\n")
+    for threads in (1, args.threads):
+        for interval in args.intervals:
+            latencies, total = run(interval, args.jobs, threads)
+            latencies.sort()
+            p95 = latencies[int(len(latencies) * 0.95) - 1]
+            print(f"{threads:>2} thread(s), ventana {interval * 1000:>4.0f} ms: "
+                  f"mediana {statistics.median(latencies):6.2f} ms, p95 {p95:6.2f} ms, "
+                  f"{len(latencies) / total:7.0f} trabajos/s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Mide el costo de arranque de Fiscalberry: import de cada módulo pesado e
+inicialización hasta tener el primer ticket renderizado.
+
+Cada medición corre en un intérprete nuevo (como después de un corte de luz),
+con y sin la cache compacta de capabilities de escpos (escpos_capabilities).
+Sin cache, escpos usa un directorio temporal nuevo para su pickle y parsea
+capabilities.json completo, que es lo que pasa por defecto.
+
+Uso:
+    python -m fiscalberry.diagnostics.startup_benchmark [--repeat 3] [--modules escpos.printer pika]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Agregar el directorio src al path para importar los módulos
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+sys.path.insert(0, SRC_DIR)
+
+MODULES = [
+    "escpos.capabilities",
+    "escpos.printer",
+    "pika",
+    "socketio",
+    "fiscalberry.common.Configberry",
+    "fiscalberry.common.EscPComandos",
+    "fiscalberry.common.ComandosHandler",
+    "fiscalberry.common.service_controller",
+]
+
+# Corre en el intérprete hijo: imprime una línea JSON con los tiempos en ms
+IMPORT_SCRIPT = """
+import importlib, json, os, sys, time
+t0 = time.perf_counter()
+if {cache}:
+    from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+    prepare_escpos_capabilities()
+t1 = time.perf_counter()
+importlib.import_module({module!r})
+t2 = time.perf_counter()
+print(json.dumps({{"prepare": (t1 - t0) * 1000, "import": (t2 - t1) * 1000}}))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+INIT_SCRIPT = """
+import json, os, sys, time
+stages = []
+t = time.perf_counter()
+def mark(name):
+    global t
+    now = time.perf_counter()
+    stages.append((name, (now - t) * 1000))
+    t = now
+if {cache}:
+    from fiscalberry.common.escpos_capabilities import prepare_escpos_capabilities
+    prepare_escpos_capabilities()
+mark("cache de capabilities")
+from fiscalberry.common.Configberry import Configberry
+Configberry()
+mark("Configberry")
+from fiscalberry.common.ComandosHandler import ComandosHandler
+mark("import ComandosHandler (escpos)")
+from fiscalberry.common.printer_spec import compile_printer_spec, get_printer_specs
+get_printer_specs().all()
+mark("specs de impresoras")
+from fiscalberry.common.print_pipeline import render_ticket
+spec = compile_printer_spec("benchmark", {{"driver": "Dummy"}})
+ticket = {{"printTexto": {{"texto": "DESCRIPCIÓN: Ñoquis con jamón\\n"}}}}
+render_ticket(spec, ticket)
+mark("primer ticket renderizado")
+print(json.dumps(stages))
+sys.stdout.flush()
+os._exit(0)
+"""
+
+
+def run_child(script: str, cache: bool, timeout: float = 120):
+    """Ejecuta `script` en un intérprete nuevo. Devuelve (salida JSON, ms totales del proceso)."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = SRC_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("ESCPOS_CAPABILITIES_FILE", None)
+    if cache:
+        env.pop("ESCPOS_CAPABILITIES_PICKLE_DIR", None)
+    else:
+        # igual que escpos por defecto: pickle en un directorio temporal nuevo
+        env["ESCPOS_CAPABILITIES_PICKLE_DIR"] = tempfile.mkdtemp(prefix="fiscalberry-bench-")
+
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True,
+                          text=True, timeout=timeout)
+    total = (time.perf_counter() - start) * 1000
+    lines = [line for line in proc.stdout.splitlines() if line.startswith(("{", "["))]
+    if proc.returncode != 0 or not lines:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "sin salida")
+    return json.loads(lines[-1]), total
+
+
+def bench_imports(modules, repeat: int):
+    print(f"{'Módulo':40} {'sin cache':>12} {'con cache':>12}")
+    for module in modules:
+        row = []
+        for cache in (False, True):
+            try:
+                times = [run_child(IMPORT_SCRIPT.format(module=module, cache=cache), cache)[0]["import"]
+                         for _ in range(repeat)]
+                row.append(f"{statistics.median(times):9.1f} ms")
+            except Exception as e:
+                row.append(f"{'error':>12}")
+                print(f"  {module}: {e}")
+        print(f"{module:40} {row[0]:>12} {row[1]:>12}")
+
+
+def bench_init(repeat: int):
+    for cache in (False, True):
+        runs = [run_child(INIT_SCRIPT.format(cache=cache), cache) for _ in range(repeat)]
+        print(f"\n--- {'con' if cache else 'sin'} cache de capabilities (mediana de {repeat}) ---")
+        for index, (name, _) in enumerate(runs[0][0]):
+            print(f"  {name:36} {statistics.median(run[0][index][1] for run in runs):9.1f} ms")
+        print(f"  {'proceso completo (con intérprete)':36} {statistics.median(run[1] for run in runs):9.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mide el tiempo de arranque de Fiscalberry")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición (se informa la mediana)")
+    parser.add_argument("--modules", nargs="*", default=MODULES, help="Módulos a medir")
+    args = parser.parse_args()
+
+    print("=== Arranque de Fiscalberry ===\n")
+    print("Import de cada módulo en un intérprete nuevo (incluye sus dependencias):\n")
+    bench_imports(args.modules, args.repeat)
+
+    print("\nInicialización hasta el primer ticket:")
+    try:
+        bench_init(args.repeat)
+    except Exception as e:
+        print(f"✗ Error midiendo la inicialización: {e}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Los módulos se importan desde src/ (igual que en los scripts de diagnostics)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
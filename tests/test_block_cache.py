@@ -0,0 +1,104 @@
+import pytest
+from escpos.escpos import EscposIO
+from escpos.printer import Dummy
+
+from fiscalberry.common import block_cache
+from fiscalberry.common.block_cache import RenderedBlockCache, render_cached
+from fiscalberry.common.EscPComandos import EscPComandos
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderedBlockCache(max_entries=8)
+    monkeypatch.setattr(block_cache, "_block_cache_instance", cache)
+    return cache
+
+
+class CountingBlock:
+    """Bloque de prueba que cuenta cuántas veces se renderiza."""
+
+    def __init__(self, text):
+        self.text = text
+        self.renders = 0
+
+    def __call__(self, io):
+        self.renders += 1
+        io.printer.set(bold=True, align="center")
+        io.printer.text(self.text)
+
+
+def write(printer, key, render):
+    render_cached(EscposIO(printer, autocut=False, autoclose=False), key, render)
+
+
+def test_lru_evicts_oldest():
+    cache = RenderedBlockCache(max_entries=2)
+    cache.put("a", (b"a", None))
+    cache.put("b", (b"b", None))
+    assert cache.get("a") == (b"a", None)
+    cache.put("c", (b"c", None))
+    assert cache.get("b") is None
+    assert len(cache) == 2
+    assert cache.status()["hits"] == 1 and cache.status()["misses"] == 1
+
+
+def test_cached_block_matches_direct_render(cache):
+    block = CountingBlock("Comercio SA\n")
+    direct = Dummy()
+    block(EscposIO(direct, autocut=False, autoclose=False))
+
+    first, second = Dummy(), Dummy()
+    write(first, ("comercio", 48), block)
+    write(second, ("comercio", 48), block)
+    assert first.output == second.output == direct.output
+    assert block.renders == 2
+    assert cache.hits == 1
+
+
+def test_key_includes_profile(cache):
+    block = CountingBlock("Comercio SA\n")
+    write(Dummy(), ("comercio", 48), block)
+    write(Dummy(profile="TM-T88V"), ("comercio", 48), block)
+    assert len(cache) == 2
+
+
+def test_key_includes_encoding(cache):
+    block = CountingBlock("Peña Ñandú\n")
+    latin = Dummy()
+    latin.magic.encoding = "CP858"
+    write(Dummy(), ("comercio", 48), block)
+    write(latin, ("comercio", 48), block)
+    assert len(cache) == 2
+
+
+def test_block_encoding_carries_over(cache):
+    block = CountingBlock("Peña\n")
+    write(Dummy(), ("comercio", 48), block)
+    printer = Dummy()
+    write(printer, ("comercio", 48), block)
+    # el texto que sigue al bloque sabe en qué codepage quedó la impresora
+    rendered = Dummy()
+    block(EscposIO(rendered, autocut=False, autoclose=False))
+    assert printer.magic.encoding == rendered.magic.encoding is not None
+
+
+def print_trailer(printer, lines):
+    EscPComandos(printer)._setTrailer(EscposIO(printer, autocut=False, autoclose=False), lines)
+
+
+def test_trailer_same_bytes_with_and_without_cache(monkeypatch):
+    lines = ["Gracias por su compra", "", "www.example.com"]
+
+    monkeypatch.setattr(block_cache, "_block_cache_instance", RenderedBlockCache(max_entries=0))
+    uncached = Dummy()
+    print_trailer(uncached, lines)
+
+    cache = RenderedBlockCache(max_entries=8)
+    monkeypatch.setattr(block_cache, "_block_cache_instance", cache)
+    outputs = []
+    for _ in range(2):
+        printer = Dummy()
+        print_trailer(printer, lines)
+        outputs.append(printer.output)
+    assert cache.hits == 1
+    assert outputs == [uncached.output, uncached.output]
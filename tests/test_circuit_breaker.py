@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+from fiscalberry.common import circuit_breaker as cb
+from fiscalberry.common.circuit_breaker import (
+    CircuitBreaker, CircuitBreakerRegistry, CircuitOpenError, CLOSED, HALF_OPEN, OPEN,
+)
+
+
+@pytest.fixture(autouse=True)
+def no_publish(monkeypatch):
+    published = []
+    monkeypatch.setattr(cb, "publish_error", lambda **kwargs: published.append(kwargs))
+    return published
+
+
+def test_opens_after_threshold(no_publish):
+    breaker = CircuitBreaker("Cocina", failure_threshold=3, reset_timeout=60)
+    for _ in range(2):
+        breaker.record_failure("timeout")
+        assert breaker.allow()
+    breaker.record_failure("timeout")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.check()
+    assert info.value.retry_after > 0
+    assert len(no_publish) == 1
+
+
+def test_success_resets_failures():
+    breaker = CircuitBreaker("Cocina", failure_threshold=2)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+
+
+def test_half_open_lets_a_single_probe():
+    breaker = CircuitBreaker("Cocina", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+
+
+def test_failed_probe_reopens():
+    breaker = CircuitBreaker("Cocina", failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_failure("sigue apagada")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+
+def test_registry_one_breaker_per_printer():
+    registry = CircuitBreakerRegistry(failure_threshold=1)
+    registry.get("Cocina").record_failure()
+    assert registry.get("Cocina").state == OPEN
+    assert registry.get("Barra").state == CLOSED
+    assert set(registry.status()) == {"Cocina", "Barra"}
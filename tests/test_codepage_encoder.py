@@ -0,0 +1,66 @@
+import pytest
+from escpos.constants import CODEPAGE_CHANGE
+from escpos.escpos import EscposIO
+from escpos.printer import Dummy
+
+from fiscalberry.common import block_cache
+from fiscalberry.common.block_cache import RenderedBlockCache, render_cached
+from fiscalberry.common.codepage_encoder import (
+    CodepageError, PinnedMagicEncode, TranslationTable, pin_codepage, resolve_codepage,
+)
+from fiscalberry.common.printer_spec import PrinterSpecError, compile_printer_spec
+
+
+def test_resolve_codepage():
+    assert resolve_codepage("cp858") == "CP858"
+    with pytest.raises(CodepageError):
+        resolve_codepage("CP9999")
+    with pytest.raises(PrinterSpecError):
+        compile_printer_spec("Caja", {"driver": "Dummy", "codepage": "CP9999"})
+    assert compile_printer_spec("Caja", {"driver": "Dummy", "codepage": "CP858"}).codepage == "CP858"
+
+
+def test_table_matches_python_codec():
+    table = TranslationTable("CP858")
+    text = "DESCRIPCIÓN Peña ñandú 10€ ¡Hola!"
+    assert table.encode(text) == text.encode("cp858")
+
+
+def test_missing_chars_fall_back_to_base_letter():
+    table = TranslationTable("CP858")
+    # Ő no está en CP858: se imprime la letra sin acento
+    assert table.encode("Őrs") == b"Ors"
+    assert ord("Ő") in table
+
+
+def test_missing_chars_without_base_use_default_symbol():
+    table = TranslationTable("CP858", defaultsymbol="?")
+    assert table.encode("a→b") == b"a?b"
+
+
+def test_pinned_encoder_sends_codepage_once():
+    printer = pin_codepage(Dummy(), "CP858")
+    assert isinstance(printer.magic, PinnedMagicEncode)
+    printer.text("Peña ")
+    printer.magic.force_encoding("CP437")
+    printer.text("Ñandú")
+    sequence = CODEPAGE_CHANGE + bytes((printer.magic.encoder.get_sequence("CP858"),))
+    assert printer.output == sequence + "Peña Ñandú".encode("cp858")
+
+
+def test_block_cache_keeps_pinned_codepage(monkeypatch):
+    cache = RenderedBlockCache(max_entries=8)
+    monkeypatch.setattr(block_cache, "_block_cache_instance", cache)
+
+    def render(io):
+        io.printer.text("Peña\n")
+
+    pinned = pin_codepage(Dummy(), "CP858")
+    render_cached(EscposIO(pinned, autocut=False, autoclose=False), ("comercio",), render)
+    direct = pin_codepage(Dummy(), "CP858")
+    render(EscposIO(direct, autocut=False, autoclose=False))
+    assert pinned.output == direct.output
+
+    # el mismo bloque sin codepage fijo es otra entrada
+    render_cached(EscposIO(Dummy(), autocut=False, autoclose=False), ("comercio",), render)
+    assert len(cache) == 2
@@ -0,0 +1,123 @@
+import concurrent.futures
+import json
+
+import pytest
+
+from fiscalberry.common import ComandosHandler as handler_module
+from fiscalberry.common.ComandosHandler import ComandosHandler
+
+TIMEOUT = 5
+
+DUMMY = {"driver": "Dummy"}
+
+
+@pytest.fixture(autouse=True)
+def no_publish(monkeypatch):
+    monkeypatch.setattr(handler_module, "publish_error", lambda **kwargs: None)
+
+
+def test_import_does_not_start_workers():
+    # los workers los inicia start_print_service() desde ServiceController
+    assert not handler_module._started
+    assert handler_module.print_scheduler.qsize() == 0
+    assert not handler_module.print_scheduler._running
+
+
+def test_submit_command_returns_a_future():
+    future = ComandosHandler().submit_command({"printerName": DUMMY, "printTexto": {"texto": "hola"}})
+    response = future.result(TIMEOUT)
+    assert "err" not in response
+    assert response["rta"]["result"] == [{"action": "printTexto", "rta": None}]
+
+
+def test_submit_command_runs_the_callback():
+    responses = []
+    future = ComandosHandler().submit_command(json.dumps({"printerName": DUMMY, "printTexto": {"texto": "hola"}}),
+                                              callback=responses.append)
+    assert future.result(TIMEOUT) is not None
+    assert responses == [future.result()]
+
+
+def test_invalid_command_resolves_with_error():
+    responses = []
+    future = ComandosHandler().submit_command("{no es json", callback=responses.append)
+    assert future.done()
+    assert "err" in future.result()
+    assert responses == [future.result()]
+
+    future = ComandosHandler().submit_command({"comandoInexistente": True})
+    assert "err" in future.result(TIMEOUT)
+
+
+def test_send_command_waits_for_the_print_job():
+    response = ComandosHandler().send_command({"printerName": DUMMY, "printTexto": {"texto": "hola"}})
+    assert "err" not in response
+    assert response["rta"]["message"] == "Impresión exitosa"
+
+
+def test_job_deadline_from_ttl():
+    assert handler_module.job_deadline({"ttl": 0}) is None
+    deadline = handler_module.job_deadline({"ttl": 10})
+    assert 9 < deadline - handler_module.time.time() <= 10
+    # ttl no es una acción: el ticket sigue siendo un comando rápido
+    assert handler_module.is_express({"ttl": 5, "openDrawer": True})
+
+
+def test_cancel_command_unknown_future():
+    assert not ComandosHandler().cancel_command(handler_module.concurrent.futures.Future())
+
+
+def test_prerender_job_copies_actions():
+    ticket = {"printerName": DUMMY, "priority": 1, "printTexto": {"texto": "hola\n"}}
+    job = handler_module.PrintJob(DUMMY, ticket)
+    rendered = handler_module.prerender_job(job)
+    assert b"hola" in rendered.data
+    assert ticket == {"printerName": DUMMY, "priority": 1, "printTexto": {"texto": "hola\n"}}
+    assert handler_module.prerender_job(handler_module.PrintJob(DUMMY, {"openDrawer": True})) is None
+
+
+def test_take_prerendered():
+    job = handler_module.PrintJob(DUMMY, {"printTexto": {"texto": "hola\n"}})
+    assert handler_module.take_prerendered(job) is None
+
+    job.prepared = concurrent.futures.Future()
+    job.prepared.set_result("render")
+    assert handler_module.take_prerendered(job) == "render"
+
+    # todavía no empezó: se cancela y el worker renderiza
+    job.prepared = concurrent.futures.Future()
+    assert handler_module.take_prerendered(job) is None
+    assert job.prepared.cancelled()
+
+    job.prepared = concurrent.futures.Future()
+    job.prepared.set_running_or_notify_cancel()
+    job.prepared.set_exception(ValueError("sin datos"))
+    assert handler_module.take_prerendered(job) is None
+
+
+def test_spool_ticket_skips_control_documents():
+    texto = {"printTexto": {"texto": "hola\n"}}
+    assert handler_module.spool_ticket({"printerName": "Caja", "openDrawer": True}) is None
+    assert handler_module.spool_ticket(dict(texto, printerName="Caja")) == dict(texto, printerName="Caja")
+    batch = {"batch": [dict(texto, printerName="Caja"), {"printerName": "Caja", "openDrawer": True}]}
+    assert handler_module.spool_ticket(batch) == {"batch": [dict(texto, printerName="Caja")]}
+    assert handler_module.spool_ticket({"batch": [{"printerName": "Caja", "openDrawer": True}]}) is None
+
+
+def test_batch_answers_each_document_in_order():
+    batch = {"batch": [{"printerName": DUMMY, "printTexto": {"texto": "uno\n"}},
+                       {"printerName": DUMMY, "openDrawer": True},
+                       {"printerName": DUMMY, "printTexto": {"texto": "dos\n"}}]}
+    response = ComandosHandler().submit_command(batch).result(TIMEOUT)
+    assert "err" not in response
+    assert [item["rta"][0]["action"] for item in response["rta"]] == ["printTexto", "openDrawer", "printTexto"]
+    assert all(item["printerName"] == DUMMY for item in response["rta"])
+
+
+def test_fan_out_answers_each_printer_in_order():
+    narrow = {"driver": "Dummy", "columns": "32"}
+    response = ComandosHandler().submit_command(
+        {"printerName": [DUMMY, narrow], "printTexto": {"texto": "hola\n"}}).result(TIMEOUT)
+    assert "err" not in response
+    assert [item["printerName"] for item in response["rta"]] == [DUMMY, narrow]
+    assert all("rta" in item for item in response["rta"])
@@ -0,0 +1,113 @@
+import configparser
+import os
+import threading
+
+import pytest
+
+from fiscalberry.common import Configberry as configberry_module
+from fiscalberry.common.Configberry import Configberry
+
+
+def write_config(path, body):
+    with open(path, "w") as f:
+        f.write(body)
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """Configberry sobre un config.ini temporal (sin tocar el singleton)."""
+    monkeypatch.setattr(configberry_module, "SNAPSHOT_CHECK_INTERVAL", 0)
+    path = str(tmp_path / "config.ini")
+    write_config(path, "[SERVIDOR]\nuuid = abc\n\n[Cocina]\ndriver = Dummy\n")
+    instance = object.__new__(Configberry)
+    instance.initialized = True
+    instance.configFilePath = path
+    instance.config = configparser.ConfigParser()
+    instance.config.optionxform = str
+    instance._listeners = []
+    return instance
+
+
+def count_reads(config, monkeypatch):
+    reads = []
+    read = config.config.read
+    monkeypatch.setattr(config.config, "read", lambda *args: reads.append(args) or read(*args))
+    return reads
+
+
+def test_reads_come_from_the_snapshot(config, monkeypatch):
+    assert config.get("Cocina", "driver") == "Dummy"
+    reads = count_reads(config, monkeypatch)
+    for _ in range(10):
+        assert config.get("SERVIDOR", "uuid") == "abc"
+        assert config.get("SERVIDOR", "missing", fallback="x") == "x"
+    assert reads == []
+
+
+def test_snapshot_is_read_only(config):
+    section = config.snapshot().section("Cocina")
+    with pytest.raises(TypeError):
+        section["driver"] = "Network"
+    # get_config_for_printer devuelve una copia que se puede modificar
+    copy = config.get_config_for_printer("Cocina")
+    copy["driver"] = "Network"
+    assert config.get("Cocina", "driver") == "Dummy"
+
+
+def test_reload_when_size_changes(config):
+    assert config.get("Cocina", "driver") == "Dummy"
+    write_config(config.configFilePath, "[SERVIDOR]\nuuid = abc\n\n[Cocina]\ndriver = Network\n")
+    assert config.get("Cocina", "driver") == "Network"
+
+
+def test_reload_when_mtime_changes(config):
+    assert config.get("Cocina", "driver") == "Dummy"
+    stat = os.stat(config.configFilePath)
+    # mismo tamaño: solo cambia la fecha de modificación
+    write_config(config.configFilePath, "[SERVIDOR]\nuuid = xyz\n\n[Cocina]\ndriver = Dummy\n")
+    os.utime(config.configFilePath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert config.get("SERVIDOR", "uuid") == "xyz"
+
+
+def test_reload_when_inode_changes(config, tmp_path):
+    assert config.get("Cocina", "driver") == "Dummy"
+    stat = os.stat(config.configFilePath)
+    replacement = str(tmp_path / "config.new")
+    write_config(replacement, "[SERVIDOR]\nuuid = new\n\n[Cocina]\ndriver = Dummy\n")
+    # mismo tamaño y misma fecha: un editor que reemplaza el archivo
+    os.utime(replacement, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    os.replace(replacement, config.configFilePath)
+    assert config.get("SERVIDOR", "uuid") == "new"
+
+
+def test_unchanged_file_is_not_reread(config, monkeypatch):
+    config.get("SERVIDOR", "uuid")
+    reads = count_reads(config, monkeypatch)
+    config.snapshot()
+    config.snapshot()
+    assert reads == []
+
+
+def test_write_publishes_a_new_snapshot(config):
+    before = config.snapshot()
+    assert config.set("Cocina", {"columns": "42"})
+    assert config.snapshot() is not before
+    assert config.get("Cocina", "columns") == "42"
+
+
+def test_writers_take_the_lock(config):
+    config.get("SERVIDOR", "uuid")
+    done = threading.Event()
+
+    def write():
+        config.set("Cocina", {"columns": "32"})
+        done.set()
+
+    with Configberry._snapshot_lock:
+        writer = threading.Thread(target=write)
+        writer.start()
+        # el escritor espera a que se libere el lock
+        assert not done.wait(0.2)
+    assert done.wait(5)
+    writer.join()
+    assert config.get("Cocina", "columns") == "32"
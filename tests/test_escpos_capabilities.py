@@ -0,0 +1,19 @@
+import os
+
+from fiscalberry.common.escpos_capabilities import _remove_stale_caches
+
+
+def test_remove_stale_caches_keeps_current_and_foreign_entries(tmp_path):
+    current, stale = "0123456789abcdef", "fedcba9876543210"
+    for name in (current, stale, "otra-cosa"):
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "capabilities.json").write_text("{}")
+    (tmp_path / "abcdefabcdefabcd").write_text("archivo, no directorio")
+
+    _remove_stale_caches(str(tmp_path), keep=current)
+
+    assert sorted(os.listdir(tmp_path)) == sorted([current, "otra-cosa", "abcdefabcdefabcd"])
+
+
+def test_remove_stale_caches_missing_dir(tmp_path):
+    _remove_stale_caches(str(tmp_path / "no-existe"), keep="0123456789abcdef")
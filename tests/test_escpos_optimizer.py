@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from fiscalberry.common.escpos_optimizer import optimize_escpos
+from fiscalberry.diagnostics.escpos_optimizer_check import (
+    SAMPLE_TICKETS, check, fuzz_ticket, interpret, raw_ticket, render,
+)
+
+
+# Salidas esperadas del optimizador (fijadas a mano)
+GOLDEN = [
+    # cambios de modo que se pisan antes de imprimir: queda el último
+    (b"\x1b!\x00\x1bE\x01\x1b!\x00Hola\n", b"\x1b!\x00Hola\n"),
+    # cambio de modo que no cambia el estado vigente
+    (b"\x1bE\x01A\x1bE\x01B\n", b"\x1bE\x01AB\n"),
+    # corrida de saltos de línea -> ESC d n
+    (b"A\n\n\n\n\n", b"A\x1bd\x05"),
+    # corridas cortas quedan como están
+    (b"A\n\n\n", b"A\n\n\n"),
+    # alineación a mitad de línea: la impresora la ignora, no se toca
+    (b"A\x1ba\x01B\n\x1ba\x01C\n", b"A\x1ba\x01B\n\x1ba\x01C\n"),
+    # después de ESC @ el estado es desconocido: no se descarta el cambio
+    (b"\x1bE\x01A\n\x1b@\x1bE\x01B\n", b"\x1bE\x01A\n\x1b@\x1bE\x01B\n"),
+    # comando desconocido: el resto queda sin tocar
+    (b"\x1bE\x01\x1bE\x01A\x1b\xfe\x1bE\x01\x1bE\x01", b"\x1bE\x01A\x1b\xfe\x1bE\x01\x1bE\x01"),
+]
+
+
+@pytest.mark.parametrize("data,expected", GOLDEN)
+def test_golden(data, expected):
+    assert optimize_escpos(data) == expected
+    assert interpret(data) == interpret(expected)
+
+
+@pytest.mark.parametrize("a,b", [
+    (b"\x1bE\x01A\n", b"A\n"),                        # falta la negrita
+    (b"\x1b!\x08A\n", b"\x1bE\x01A\n\x1b!\x00"),      # ESC ! también fija el tamaño
+    (b"\x1ba\x01A\n", b"A\x1ba\x01\n"),               # alineación fuera del principio de línea
+    (b"\x1b3\x1e\n\n\n", b"\n\n\n\x1b3\x1e"),         # otro interlineado
+    (b"A\n\n", b"A\n\n\n"),                           # otro avance
+    (b"A\x1dV\x00", b"A"),                            # falta el corte
+])
+def test_interpret_detects_differences(a, b):
+    assert interpret(a) != interpret(b)
+
+
+@pytest.mark.parametrize("a,b", [
+    (b"A\n\n\n\n", b"A\x1bd\x04"),
+    (b"A\x1ba\x01B\n", b"AB\n"),
+    (b"\x1bE\x01\x1bE\x00A\n", b"\x1bE\x00A\n"),
+])
+def test_interpret_equivalent_streams(a, b):
+    assert interpret(a) == interpret(b)
+
+
+@pytest.mark.parametrize("name", sorted(SAMPLE_TICKETS))
+@pytest.mark.parametrize("columns", [None, 32])
+def test_sample_tickets(name, columns):
+    assert check(name, render(dict(SAMPLE_TICKETS[name]), columns), verbose=False)
+
+
+def test_raw_ticket():
+    assert check("bytes crudos", raw_ticket(), verbose=False)
+
+
+def test_fuzz():
+    rng = random.Random(1)
+    for n in range(200):
+        assert check(f"aleatorio #{n}", fuzz_ticket(rng), verbose=False)
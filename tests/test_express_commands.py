@@ -0,0 +1,117 @@
+import socket
+
+import pytest
+from escpos.constants import BUZZER, CD_KICK_2, CD_KICK_5
+from escpos.printer import Dummy
+
+from fiscalberry.common.express_commands import (
+    DLE_EOT_OFFLINE, DLE_EOT_PAPER, DLE_EOT_PRINTER,
+    buzzer_bytes, drawer_pulse, is_express, query_status, run_express,
+)
+from fiscalberry.common.printer_pool import LeasedDriver
+
+
+class SocketPrinter:
+    """Driver de red de prueba: responde cada DLE EOT con el byte configurado."""
+
+    def __init__(self, replies):
+        self._device, self.peer = socket.socketpair()
+        self.replies = replies
+        self.writes = []
+
+    def _raw(self, data):
+        self.writes.append(data)
+        if self.replies.get(data) is not None:
+            self.peer.sendall(bytes((self.replies[data],)))
+
+    def _read(self):
+        return b""
+
+    def close(self):
+        self._device.close()
+        self.peer.close()
+
+
+@pytest.fixture
+def printer_factory():
+    printers = []
+
+    def factory(printer=0x12, offline=0x12, paper=0x12):
+        printer = SocketPrinter({DLE_EOT_PRINTER: printer, DLE_EOT_OFFLINE: offline, DLE_EOT_PAPER: paper})
+        printers.append(printer)
+        return printer
+
+    yield factory
+    for printer in printers:
+        printer.close()
+
+
+def test_is_express():
+    assert is_express({"printerName": "Caja", "openDrawer": True})
+    assert is_express({"printerName": "Caja", "priority": 0, "buzzer": True, "getStatus": True})
+    # factura y apertura de cajón: no es un comando rápido
+    assert not is_express({"printerName": "Caja", "printTexto": {"texto": "x"}, "openDrawer": True})
+    assert not is_express({"printerName": "Caja"})
+
+
+def test_drawer_pulse_pins():
+    assert drawer_pulse(True) == CD_KICK_2
+    assert drawer_pulse({"pin": 5}) == CD_KICK_5
+    assert drawer_pulse({"pin": "2"}) == CD_KICK_2
+    assert drawer_pulse({"alt": True}) == b"\x1b\x70\x00\x19\x19"
+
+
+def test_buzzer_bytes_and_limits():
+    assert buzzer_bytes() == BUZZER + b"\x01\x01"
+    assert buzzer_bytes(3, 2) == BUZZER + b"\x03\x02"
+    with pytest.raises(ValueError):
+        buzzer_bytes(0, 1)
+    with pytest.raises(ValueError):
+        buzzer_bytes(1, 10)
+
+
+def test_run_express_joins_writes():
+    driver = Dummy()
+    rta = run_express(driver, {"printerName": "Caja", "openDrawer": {"pin": 5}, "buzzer": {"times": 2}})
+    assert driver.output == CD_KICK_5 + BUZZER + b"\x02\x01"
+    assert [item["action"] for item in rta] == ["openDrawer", "buzzer"]
+
+
+def test_run_express_flushes_before_status(printer_factory):
+    driver = printer_factory()
+    rta = run_express(driver, {"openDrawer": True, "getStatus": True})
+    assert driver.writes == [CD_KICK_2, DLE_EOT_PRINTER, DLE_EOT_OFFLINE, DLE_EOT_PAPER]
+    assert rta[1]["rta"]["online"]
+
+
+@pytest.mark.parametrize("paper,expected", [(0x12, "ok"), (0x1E, "near_end"), (0x72, "out")])
+def test_query_status_paper(printer_factory, paper, expected):
+    status = query_status(printer_factory(paper=paper), timeout=0.5)
+    assert status == {"supported": True, "responding": True, "online": True,
+                      "cover_open": False, "paper": expected}
+
+
+def test_query_status_offline_with_cover_open(printer_factory):
+    status = query_status(printer_factory(printer=0x1A, offline=0x16), timeout=0.5)
+    assert not status["online"] and status["cover_open"]
+
+
+def test_query_status_not_responding(printer_factory):
+    status = query_status(printer_factory(printer=None), timeout=0.05)
+    assert status == {"supported": True, "online": False, "responding": False}
+
+
+def test_query_status_discards_stale_replies(printer_factory):
+    driver = printer_factory()
+    # respuesta vieja de una consulta anterior en la misma conexión
+    driver.peer.sendall(b"\x1a")
+    assert query_status(driver, timeout=0.5)["online"]
+
+
+def test_query_status_through_leased_driver(printer_factory):
+    assert query_status(LeasedDriver(printer_factory()), timeout=0.5)["online"]
+
+
+def test_query_status_unsupported_driver():
+    assert query_status(Dummy()) == {"supported": False}
+    assert query_status(LeasedDriver(Dummy())) == {"supported": False}
@@ -0,0 +1,96 @@
+import time
+from concurrent.futures import Future
+
+from fiscalberry.common.job_dedup import JobDedupCache, job_key
+
+TICKET = {"printerName": "Cocina", "printTexto": {"texto": "hola"}}
+
+
+def test_job_key_prefers_message_id():
+    assert job_key(TICKET, "abc") == "id:abc"
+    assert job_key(TICKET).startswith("hash:")
+    # el orden de las claves no cambia el hash
+    assert job_key({"printTexto": {"texto": "hola"}, "printerName": "Cocina"}) == job_key(TICKET)
+    assert job_key(TICKET) != job_key({"printerName": "Barra", "printTexto": {"texto": "hola"}})
+
+
+def test_job_key_without_content_hash():
+    drawer = {"printerName": "Caja", "openDrawer": True}
+    assert job_key(drawer, content_hash=False) is None
+    assert job_key(drawer, "abc", content_hash=False) == "id:abc"
+
+
+def test_duplicate_gets_original_future():
+    cache = JobDedupCache()
+    original, duplicate = Future(), Future()
+    assert cache.claim("id:1", original) == (True, original)
+    assert cache.claim("id:1", duplicate) == (False, original)
+    original.set_result({"success": True})
+    assert cache.claim("id:1", Future()) == (False, original)
+    assert cache.duplicates == 2
+
+
+def test_content_window_shorter_than_id_ttl():
+    cache = JobDedupCache(content_window=0.1, id_ttl=10)
+    by_hash, by_id = Future(), Future()
+    cache.claim("hash:x", by_hash)
+    cache.claim("id:x", by_id)
+    time.sleep(0.15)
+    assert cache.claim("hash:x", Future())[0]
+    assert not cache.claim("id:x", Future())[0]
+
+
+def test_content_window_zero_disables_hash_dedup():
+    cache = JobDedupCache(content_window=0)
+    assert cache.claim("hash:x", Future())[0]
+    assert cache.claim("hash:x", Future())[0]
+    assert not cache.enabled_for("hash:x")
+    assert cache.enabled_for("id:x")
+    assert not cache.enabled_for(None)
+    assert cache.claim(None, Future())[0]
+    assert len(cache) == 0
+
+
+def test_failed_jobs_are_forgotten():
+    cache = JobDedupCache()
+    for result in ({"err": "sin papel"}, {"success": False},
+                   {"rta": {"error": "impresora inexistente"}}, "no es un dict"):
+        future = Future()
+        cache.claim("id:1", future)
+        future.set_result(result)
+        assert cache.claim("id:1", Future())[0], result
+        cache.forget("id:1")
+
+
+def test_exception_is_forgotten_but_success_is_kept():
+    cache = JobDedupCache()
+    failed = Future()
+    cache.claim("id:1", failed)
+    failed.set_exception(RuntimeError("boom"))
+    assert cache.claim("id:1", Future())[0]
+
+    cache = JobDedupCache()
+    ok = Future()
+    cache.claim("id:2", ok)
+    ok.set_result({"success": True, "rta": {"printTexto": None}})
+    assert not cache.claim("id:2", Future())[0]
+
+
+def test_forget_only_matching_future():
+    cache = JobDedupCache()
+    current = Future()
+    cache.claim("id:1", current)
+    cache.forget("id:1", Future())
+    assert not cache.claim("id:1", Future())[0]
+    cache.forget("id:1", current)
+    assert cache.claim("id:1", Future())[0]
+
+
+def test_max_entries_evicts_oldest():
+    cache = JobDedupCache(max_entries=2)
+    for n in range(3):
+        cache.claim(f"id:{n}", Future())
+    assert len(cache) == 2
+    assert cache.claim("id:0", Future())[0]
+    assert not cache.claim("id:2", Future())[0]
+
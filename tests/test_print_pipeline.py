@@ -0,0 +1,210 @@
+import socket
+from contextlib import contextmanager
+
+import pytest
+from escpos.printer import Dummy
+
+from fiscalberry.common import print_pipeline
+from fiscalberry.common.EscPComandos import EscPComandos
+from fiscalberry.common.escpos_optimizer import optimize_escpos
+from fiscalberry.common.express_commands import drawer_pulse
+from fiscalberry.common.print_pipeline import (
+    BatchError, DriverError, RenderedTicket, batch_documents, cut_sequence, open_driver, render_batch,
+    render_ticket, transmit, transmit_batch,
+)
+from fiscalberry.common.printer_pool import get_printer_pool
+from fiscalberry.common.printer_spec import compile_printer_spec
+
+
+@pytest.fixture
+def spec():
+    return compile_printer_spec("Caja", {"driver": "Dummy"})
+
+
+@pytest.fixture
+def server():
+    """Impresora de red de prueba: acepta una conexión y junta lo que recibe."""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    sock.listen()
+    sock.settimeout(5)
+    yield sock
+    sock.close()
+
+
+def receive(server, size):
+    conn, _ = server.accept()
+    conn.settimeout(5)
+    data = b""
+    with conn:
+        while len(data) < size:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+    return data
+
+
+def texto(text):
+    return {"printTexto": {"texto": text + "\n"}}
+
+
+def test_render_matches_direct_printing(spec):
+    rendered = render_ticket(spec, texto("hola"))
+    direct = Dummy()
+    result = EscPComandos(direct, columns=spec.columns).run(texto("hola"))
+    assert rendered.data == optimize_escpos(direct.output)
+    assert rendered.result == result
+    assert len(rendered) == len(rendered.data)
+
+
+def test_render_without_optimizer():
+    spec = compile_printer_spec("Caja", {"driver": "Dummy", "optimize": "false"})
+    direct = Dummy()
+    EscPComandos(direct, columns=spec.columns).run(texto("hola"))
+    assert render_ticket(spec, texto("hola")).data == direct.output
+
+
+def test_transmit_network_in_one_write(server):
+    port = server.getsockname()[1]
+    spec = compile_printer_spec("Cocina", {"driver": "Network", "host": "127.0.0.1", "port": str(port)})
+    rendered = render_ticket(spec, texto("comanda"))
+    try:
+        transmit(spec, rendered.data)
+        assert receive(server, len(rendered.data)) == rendered.data
+    finally:
+        get_printer_pool().close_all()
+
+
+def test_open_driver_unreachable_printer():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    spec = compile_printer_spec("Cocina", {"driver": "Network", "host": "127.0.0.1", "port": str(port),
+                                           "timeout": "0.5"})
+    with pytest.raises(DriverError):
+        open_driver(spec)
+
+
+def test_transmit_empty_buffer_does_not_connect(monkeypatch, spec):
+    monkeypatch.setattr(print_pipeline, "open_driver", lambda spec: pytest.fail("no debería conectarse"))
+    transmit(spec, b"")
+
+
+class FakeDriver:
+    def __init__(self, fail_on_write=None):
+        self.writes = []
+        self.fail_on_write = fail_on_write
+
+    def _raw(self, data):
+        if self.fail_on_write is not None and len(self.writes) == self.fail_on_write:
+            raise OSError("conexión cerrada")
+        self.writes.append(data)
+
+
+class Sessions(list):
+    """Sesiones abiertas con la impresora de prueba."""
+    fail_on_write = None
+
+
+@pytest.fixture
+def session(monkeypatch):
+    """Reemplaza la conexión a la impresora."""
+    sessions = Sessions()
+
+    @contextmanager
+    def fake_session(spec):
+        driver = FakeDriver(sessions.fail_on_write)
+        sessions.append(driver)
+        yield driver
+
+    monkeypatch.setattr(print_pipeline, "printer_session", fake_session)
+    return sessions
+
+
+def test_batch_documents_strips_message_keys():
+    ticket = {"printerName": "Caja", "batch": [dict(texto("uno"), priority="fiscal", ttl=5),
+                                                {"openDrawer": True}]}
+    assert batch_documents(ticket) == [texto("uno"), {"openDrawer": True}]
+
+
+def test_render_batch_marks_express_and_errors(spec, monkeypatch):
+    render_ticket = print_pipeline.render_ticket
+
+    def failing_render(spec, document, cut=True):
+        if "fail" in document:
+            raise ValueError("no se puede renderizar")
+        return render_ticket(spec, document, cut)
+
+    monkeypatch.setattr(print_pipeline, "render_ticket", failing_render)
+    rendered = render_batch(spec, [texto("uno"), {"openDrawer": True}, {"fail": True}])
+    assert isinstance(rendered[0], RenderedTicket) and b"uno" in rendered[0].data
+    assert rendered[1] is None
+    assert isinstance(rendered[2], ValueError)
+
+
+def test_batch_is_sent_in_one_session(session, spec):
+    documents = [texto("uno"), texto("dos"), {"openDrawer": True}, texto("tres")]
+    rendered = render_batch(spec, documents)
+    results = transmit_batch(spec, documents, rendered)
+
+    assert len(session) == 1
+    driver = session[0]
+    # los documentos consecutivos van en una sola escritura, el cajón en su lugar
+    assert driver.writes == [rendered[0].data + rendered[1].data, drawer_pulse(True), rendered[3].data]
+    assert all("rta" in result for result in results)
+
+
+def test_single_cut_batch(session, spec):
+    documents = [texto("uno"), texto("dos")]
+    cut = cut_sequence(spec)
+    rendered = render_batch(spec, documents, single_cut=True)
+    assert all(cut not in item.data for item in rendered)
+
+    transmit_batch(spec, documents, rendered, single_cut=True)
+    data = b"".join(session[0].writes)
+    assert data.count(cut) == 1 and data.endswith(cut)
+
+
+def test_render_error_does_not_stop_the_batch(session, spec):
+    documents = [texto("uno"), texto("dos")]
+    rendered = [RenderedTicket(b"uno\n", []), ValueError("sin datos")]
+    results = transmit_batch(spec, documents, rendered)
+    assert results[0] == {"rta": []}
+    assert "sin datos" in results[1]["err"]
+    assert session[0].writes == [b"uno\n"]
+
+
+def test_connection_error_reports_each_document(session, spec):
+    session.fail_on_write = 1
+    documents = [texto("uno"), {"openDrawer": True}, texto("dos")]
+    rendered = render_batch(spec, documents)
+    with pytest.raises(BatchError) as info:
+        transmit_batch(spec, documents, rendered)
+    results = info.value.results
+    assert "rta" in results[0]
+    assert "err" in results[1] and "err" in results[2]
+
+
+def test_shared_render_once_per_format():
+    from fiscalberry.common.print_pipeline import SharedRender
+
+    shared = SharedRender({"printerName": ["Caja", "Barra", "Cocina"], "printTexto": {"texto": "hola\n"}})
+    caja = compile_printer_spec("Caja", {"driver": "Dummy"})
+    barra = compile_printer_spec("Barra", {"driver": "Dummy"})
+    cocina = compile_printer_spec("Cocina", {"driver": "Dummy", "columns": "32"})
+
+    first, second, narrow = shared.get(caja), shared.get(barra), shared.get(cocina)
+    assert second is first
+    assert narrow is not first
+    assert shared.renders == 2
+
+
+def test_shared_render_does_not_modify_ticket():
+    from fiscalberry.common.print_pipeline import SharedRender
+
+    ticket = {"printerName": ["Caja", "Barra"], "printTexto": {"texto": "hola\n"}}
+    shared = SharedRender(ticket)
+    shared.get(compile_printer_spec("Caja", {"driver": "Dummy"}))
+    assert ticket == {"printerName": ["Caja", "Barra"], "printTexto": {"texto": "hola\n"}}
+    assert "printerName" not in shared.ticket
@@ -0,0 +1,361 @@
+import queue
+import threading
+import time
+
+import pytest
+
+from fiscalberry.common.print_scheduler import (
+    PrintJob, PrintScheduler, PRIORITY_COMANDA, PRIORITY_CONTROL, PRIORITY_REPORT,
+)
+from fiscalberry.common.print_spool import PrintSpool
+
+TIMEOUT = 5
+
+
+class RecordingHandler:
+    """Handler de prueba: registra el orden y puede bloquear una impresora."""
+
+    def __init__(self):
+        self.order = []
+        self.lock = threading.Lock()
+        self.blocked = {}  # impresora -> Event que libera sus trabajos
+        self.started = {}  # impresora -> Event que se marca al empezar a imprimir
+
+    def block(self, printer):
+        self.blocked[printer] = threading.Event()
+        self.started[printer] = threading.Event()
+        return self.blocked[printer]
+
+    def __call__(self, job, worker_id):
+        if job.lane_key in self.started:
+            self.started[job.lane_key].set()
+        if job.lane_key in self.blocked:
+            assert self.blocked[job.lane_key].wait(TIMEOUT)
+        with self.lock:
+            self.order.append((job.lane_key, job.ticket["n"]))
+        job.reply({"success": True})
+        return True
+
+
+def make_job(printer, n, priority=PRIORITY_COMANDA, deadline=None):
+    return PrintJob(printer, {"n": n}, priority=priority, deadline=deadline)
+
+
+@pytest.fixture
+def scheduler_factory():
+    schedulers = []
+
+    def factory(handler, **kwargs):
+        scheduler = PrintScheduler(handler, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield factory
+    for scheduler in schedulers:
+        scheduler.stop(timeout=0.5)
+
+
+def test_slow_printer_does_not_block_other_lanes(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Lenta")
+    scheduler = scheduler_factory(handler, max_workers=2)
+
+    slow = [scheduler.submit(make_job("Lenta", n)) for n in range(3)]
+    assert handler.started["Lenta"].wait(TIMEOUT)
+    fast = [scheduler.submit(make_job("Rapida", n)) for n in range(3)]
+    for job in fast:
+        assert job.future.result(TIMEOUT)["success"]
+    assert all(not job.future.done() for job in slow)
+
+    release.set()
+    for job in slow:
+        assert job.future.result(TIMEOUT)["success"]
+    # FIFO dentro de cada impresora
+    assert [n for key, n in handler.order if key == "Lenta"] == [0, 1, 2]
+    assert [n for key, n in handler.order if key == "Rapida"] == [0, 1, 2]
+
+
+def test_lane_concurrency_limit(scheduler_factory):
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def handler(job, worker_id):
+        with lock:
+            running.append(job)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(job)
+        job.reply({"success": True})
+
+    scheduler = scheduler_factory(handler, max_workers=4, concurrency_for=lambda name: 2)
+    jobs = [scheduler.submit(make_job("Cocina", n)) for n in range(8)]
+    for job in jobs:
+        job.future.result(TIMEOUT)
+    assert max(peak) == 2
+
+
+def test_priority_classes_within_a_lane(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Caja")
+    scheduler = scheduler_factory(handler, max_workers=1, aging=0)
+
+    first = scheduler.submit(make_job("Caja", "primero"))
+    assert handler.started["Caja"].wait(TIMEOUT)
+    jobs = [scheduler.submit(make_job("Caja", "reporte", PRIORITY_REPORT)),
+            scheduler.submit(make_job("Caja", "comanda", PRIORITY_COMANDA)),
+            scheduler.submit(make_job("Caja", "cajon", PRIORITY_CONTROL))]
+    release.set()
+    for job in [first] + jobs:
+        job.future.result(TIMEOUT)
+    assert [n for _, n in handler.order] == ["primero", "cajon", "comanda", "reporte"]
+
+
+@pytest.mark.parametrize("waited,first", [(15, "comanda"), (25, "reporte")])
+def test_aging_promotes_old_jobs(waited, first):
+    from fiscalberry.common.print_scheduler import PrinterLane
+
+    # con aging=10 un reporte (3) que esperó más de 20 s que una comanda (1) sale antes
+    lane = PrinterLane("Caja", aging=10.0)
+    report = make_job("Caja", "reporte", PRIORITY_REPORT)
+    comanda = make_job("Caja", "comanda", PRIORITY_COMANDA)
+    comanda.enqueued_at = report.enqueued_at + waited
+    lane.push(report)
+    lane.push(comanda)
+    assert lane.pop(comanda.enqueued_at).ticket["n"] == first
+
+
+def test_queue_full(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=1, max_jobs=2)
+
+    first = scheduler.submit(make_job("Cocina", 0))
+    assert handler.started["Cocina"].wait(TIMEOUT)
+    scheduler.submit(make_job("Cocina", 1))
+    scheduler.submit(make_job("Cocina", 2))
+    with pytest.raises(queue.Full):
+        scheduler.submit(make_job("Cocina", 3))
+    release.set()
+    assert first.future.result(TIMEOUT)["success"]
+
+
+def test_dict_printer_names_share_a_lane(scheduler_factory):
+    handler = RecordingHandler()
+    scheduler = scheduler_factory(handler, max_workers=2)
+    config = {"driver": "Network", "host": "10.0.0.5"}
+
+    jobs = [scheduler.submit(make_job(dict(reversed(list(config.items()))) if n % 2 else config, n))
+            for n in range(4)]
+    for job in jobs:
+        job.future.result(TIMEOUT)
+    assert len(scheduler.lanes_status()) == 1
+
+
+def test_job_priority_from_actions_and_override():
+    from fiscalberry.common.print_scheduler import PRIORITY_FISCAL, job_priority
+
+    assert job_priority({"printerName": "Caja", "openDrawer": True, "printTexto": {}}) == PRIORITY_CONTROL
+    assert job_priority({"printerName": "Caja", "printArqueo": {}}) == PRIORITY_REPORT
+    assert job_priority({"printerName": "Caja", "printFacturaElectronica": {}}) == PRIORITY_FISCAL
+    assert job_priority({"printerName": "Caja", "accionNueva": {}}) == PRIORITY_FISCAL
+    assert job_priority({"printerName": "Caja", "printArqueo": {}, "priority": "comanda"}) == PRIORITY_COMANDA
+    assert job_priority({"printerName": "Caja", "printArqueo": {}, "priority": 9}) == PRIORITY_REPORT
+    assert job_priority({"printerName": "Caja", "printArqueo": {}, "priority": "urgente"}) == PRIORITY_REPORT
+
+
+def test_expired_job_is_not_printed(scheduler_factory):
+    handler = RecordingHandler()
+    scheduler = scheduler_factory(handler, max_workers=1)
+    job = scheduler.submit(make_job("Cocina", 1, deadline=time.time() - 1))
+    result = job.future.result(TIMEOUT)
+    assert result["expired"] and not result["success"]
+    assert handler.order == []
+    assert scheduler.qsize() == 0
+
+
+def test_cancel_queued_job(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=1)
+
+    first = scheduler.submit(make_job("Cocina", 1))
+    assert handler.started["Cocina"].wait(TIMEOUT)
+    second = scheduler.submit(make_job("Cocina", 2))
+    assert scheduler.cancel(second.job_id)
+    assert second.future.result(TIMEOUT)["cancelled"]
+    assert not scheduler.cancel(second.job_id)
+
+    release.set()
+    first.future.result(TIMEOUT)
+    assert handler.order == [("Cocina", 1)]
+    assert scheduler.lanes_status()["Cocina"]["dropped"] == 1
+
+
+def test_stuck_job_watchdog(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Cocina")
+    stuck = []
+    scheduler = scheduler_factory(handler, max_workers=1, stuck_after=0.2,
+                                  on_stuck=lambda job, elapsed: stuck.append(job.job_id))
+    job = scheduler.submit(make_job("Cocina", 1))
+    deadline = time.time() + TIMEOUT
+    while not stuck and time.time() < deadline:
+        time.sleep(0.05)
+    release.set()
+    job.future.result(TIMEOUT)
+    assert stuck == [job.job_id]
+
+
+class Availability:
+    """available() de prueba: impresoras caídas a mano."""
+
+    def __init__(self):
+        self.down = set()
+
+    def __call__(self, key):
+        return key not in self.down
+
+
+def test_parked_lane_waits_for_printer_and_resumes(scheduler_factory):
+    handler = RecordingHandler()
+    available = Availability()
+    available.down.add("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=2, available=available, park_timeout=None)
+
+    parked = scheduler.submit(make_job("Cocina", 1))
+    other = scheduler.submit(make_job("Barra", 1))
+    assert other.future.result(TIMEOUT)["success"]
+    assert scheduler.lanes_status()["Cocina"]["parked"]
+    assert not parked.future.done()
+
+    available.down.clear()
+    scheduler.resume()
+    assert parked.future.result(TIMEOUT)["success"]
+    assert not scheduler.lanes_status()["Cocina"]["parked"]
+
+
+def test_parked_job_survives_outage_longer_than_park_timeout(scheduler_factory, tmp_path):
+    handler = RecordingHandler()
+    available = Availability()
+    available.down.add("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=1, available=available, park_timeout=0.2)
+    spool = PrintSpool(str(tmp_path / "print_spool.db"))
+
+    job = make_job("Cocina", 1)
+    job.spool_seq = spool.append("Cocina", job.ticket)
+    job.future.add_done_callback(lambda f: spool.complete(job.spool_seq))
+    released = threading.Event()
+    job.on_parked = lambda job: released.set()
+    scheduler.submit(job)
+
+    # pasado park_timeout se libera a quien espera, pero el trabajo no se descarta
+    assert released.wait(TIMEOUT)
+    time.sleep(0.5)
+    assert not job.future.done()
+    assert scheduler.qsize() == 1
+    assert [seq for seq, _, _, _ in spool.pending()[0]] == [job.spool_seq]
+
+    available.down.clear()
+    scheduler.resume()
+    assert job.future.result(TIMEOUT)["success"]
+    assert handler.order == [("Cocina", 1)]
+    assert spool.pending()[0] == []
+    spool.close()
+
+
+def test_parked_job_expires(scheduler_factory):
+    handler = RecordingHandler()
+    available = Availability()
+    available.down.add("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=1, available=available)
+
+    job = scheduler.submit(make_job("Cocina", 1, deadline=time.time() + 0.2))
+    result = job.future.result(TIMEOUT)
+    assert result["expired"] and not result["success"]
+    assert handler.order == []
+
+
+def test_next_job_is_prepared_while_printer_busy(scheduler_factory):
+    handler = RecordingHandler()
+    release = handler.block("Cocina")
+    scheduler = scheduler_factory(handler, max_workers=1, prepare=lambda job: ("listo", job.ticket["n"]),
+                                  prepare_workers=1)
+
+    first = scheduler.submit(make_job("Cocina", 1))
+    assert handler.started["Cocina"].wait(TIMEOUT)
+    second = scheduler.submit(make_job("Cocina", 2))
+    # solo se adelanta el próximo de la cola
+    third = scheduler.submit(make_job("Cocina", 3))
+    assert first.prepared is None and third.prepared is None
+    assert second.prepared.result(TIMEOUT) == ("listo", 2)
+
+    release.set()
+    for job in (first, second, third):
+        job.future.result(TIMEOUT)
+    assert scheduler.lanes_status()["Cocina"]["prepared"] == 2
+
+
+def test_cancel_drops_pending_preparation(scheduler_factory):
+    handler = RecordingHandler()
+    releases = [handler.block("A"), handler.block("B")]
+    unblock_prepare = threading.Event()
+    scheduler = scheduler_factory(handler, max_workers=2, prepare_workers=1,
+                                  prepare=lambda job: unblock_prepare.wait(TIMEOUT))
+
+    busy = [scheduler.submit(make_job("A", 1)), scheduler.submit(make_job("B", 1))]
+    assert handler.started["A"].wait(TIMEOUT) and handler.started["B"].wait(TIMEOUT)
+    # el único thread de preparación queda ocupado con el de A; el de B espera su turno
+    waiting_a = scheduler.submit(make_job("A", 2))
+    waiting_b = scheduler.submit(make_job("B", 2))
+    assert scheduler.cancel(waiting_b.job_id)
+    assert waiting_b.prepared.cancelled()
+
+    unblock_prepare.set()
+    for release in releases:
+        release.set()
+    for job in busy + [waiting_a]:
+        job.future.result(TIMEOUT)
+    assert ("B", 2) not in handler.order
+
+
+def wait_for(condition, timeout=TIMEOUT):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def test_pool_grows_to_max_and_retires_to_min(scheduler_factory):
+    handler = RecordingHandler()
+    releases = [handler.block(name) for name in ("A", "B", "C", "D")]
+    scheduler = scheduler_factory(handler, min_workers=1, max_workers=3, idle_timeout=0.2)
+
+    scheduler.start()
+    assert scheduler.pool_status()["size"] == 1
+    jobs = [scheduler.submit(make_job(name, 1)) for name in ("A", "B", "C", "D")]
+    assert wait_for(lambda: scheduler.pool_status()["busy"] == 3)
+    status = scheduler.pool_status()
+    # una impresora lista y ningún worker libre: crece, pero no más allá de max_workers
+    assert status["size"] == 3 and status["grown"] == 2 and status["peak"] == 3
+    assert scheduler.qsize() == 1
+
+    for release in releases:
+        release.set()
+    for job in jobs:
+        assert job.future.result(TIMEOUT)["success"]
+    # los que sobran terminan después de idle_timeout sin trabajo
+    assert wait_for(lambda: scheduler.pool_status()["size"] == 1)
+    assert scheduler.pool_status()["retired"] == 2
+
+
+def test_fixed_pool_without_min_workers(scheduler_factory):
+    handler = RecordingHandler()
+    scheduler = scheduler_factory(handler, max_workers=2, idle_timeout=0.05)
+    scheduler.submit(make_job("A", 1)).future.result(TIMEOUT)
+    time.sleep(0.2)
+    status = scheduler.pool_status()
+    assert status["size"] == 2 and status["grown"] == 0 and status["retired"] == 0
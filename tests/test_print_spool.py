@@ -0,0 +1,77 @@
+import threading
+import time
+
+import pytest
+
+from fiscalberry.common.print_spool import PrintSpool
+
+
+@pytest.fixture
+def spool_path(tmp_path):
+    return str(tmp_path / "print_spool.db")
+
+
+def test_replay_after_reopen(spool_path):
+    spool = PrintSpool(spool_path)
+    first = spool.append("Cocina", {"printTexto": {"texto": "uno"}}, job_key="id:1")
+    second = spool.append(["Barra", "Expo"], {"printTexto": {"texto": "dos"}})
+    third = spool.append("Cocina", {"printTexto": {"texto": "tres"}})
+    assert first < second < third
+    spool.complete(second)
+    spool.close()
+
+    reopened = PrintSpool(spool_path)
+    pending, expired = reopened.pending()
+    assert expired == []
+    assert pending == [
+        (first, "Cocina", {"printTexto": {"texto": "uno"}}, "id:1"),
+        (third, "Cocina", {"printTexto": {"texto": "tres"}}, None),
+    ]
+    reopened.close()
+
+
+def test_pending_expires_old_jobs(spool_path):
+    spool = PrintSpool(spool_path)
+    seq = spool.append("Cocina", {"printTexto": {"texto": "viejo"}})
+    time.sleep(0.05)
+    pending, expired = spool.pending(max_age=0.01)
+    assert pending == []
+    assert expired == [seq]
+    spool.close()
+
+
+def test_compact_removes_done_jobs(spool_path):
+    spool = PrintSpool(spool_path)
+    done = spool.append("Cocina", {"printTexto": {"texto": "a"}})
+    kept = spool.append("Cocina", {"printTexto": {"texto": "b"}})
+    spool.complete(done)
+    spool.compact()
+    rows = spool._conn.execute("SELECT seq FROM jobs ORDER BY seq").fetchall()
+    assert rows == [(kept,)]
+    spool.close()
+
+
+@pytest.mark.parametrize("flush_interval", [0.0, 0.01])
+def test_concurrent_appends_are_all_durable(spool_path, flush_interval):
+    spool = PrintSpool(spool_path, flush_interval=flush_interval)
+    seqs = []
+    lock = threading.Lock()
+
+    def worker(n):
+        for i in range(25):
+            seq = spool.append("Cocina", {"printTexto": {"texto": f"{n}-{i}"}})
+            with lock:
+                seqs.append(seq)
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    spool.close()
+
+    assert None not in seqs and len(set(seqs)) == 100
+    reopened = PrintSpool(spool_path)
+    pending, _ = reopened.pending()
+    assert sorted(seq for seq, _, _, _ in pending) == sorted(seqs)
+    reopened.close()
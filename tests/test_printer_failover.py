@@ -0,0 +1,210 @@
+import time
+
+import pytest
+
+from fiscalberry.common import ComandosHandler as handler_module
+from fiscalberry.common import printer_error_detector
+from fiscalberry.common.circuit_breaker import CircuitBreakerRegistry
+from fiscalberry.common.print_scheduler import PrintJob, PrintScheduler
+from fiscalberry.common.printer_error_detector import PrinterErrorType
+from fiscalberry.common.printer_failover import (
+    DEFAULT_FAILOVER_ON, FailoverError, failover_cause, parse_failover_on,
+)
+from fiscalberry.common.printer_health import PrinterHealthMonitor
+from fiscalberry.common.printer_spec import PrinterSpecError, compile_printer_spec
+
+TIMEOUT = 5
+
+
+def test_parse_failover_on():
+    assert parse_failover_on(None) == DEFAULT_FAILOVER_ON
+    assert parse_failover_on("  ") == DEFAULT_FAILOVER_ON
+    assert parse_failover_on("Paper_Out, offline") == {"paper_out", "offline"}
+    with pytest.raises(ValueError) as info:
+        parse_failover_on("paper_out, incendio")
+    assert "incendio" in str(info.value)
+
+
+@pytest.mark.parametrize("error_type,connection_error,cause", [
+    (PrinterErrorType.PAPER_OUT, False, "paper_out"),
+    (PrinterErrorType.COVER_OPEN, False, "cover_open"),
+    (PrinterErrorType.PAPER_JAM, False, "paper_jam"),
+    (PrinterErrorType.OFFLINE, False, "offline"),
+    (PrinterErrorType.COMMUNICATION_ERROR, False, "offline"),
+    (None, True, "offline"),
+    (None, False, None),
+])
+def test_failover_cause(error_type, connection_error, cause):
+    assert failover_cause(error_type, connection_error) == cause
+
+
+def test_spec_with_backup():
+    spec = compile_printer_spec("Cocina", {"driver": "Dummy", "backup": " Cocina2 ",
+                                           "failover_on": "paper_out"})
+    assert spec.backup == "Cocina2"
+    assert spec.failover_on == {"paper_out"}
+    assert "backup" not in spec.driver_ops
+
+    default = compile_printer_spec("Cocina", {"driver": "Dummy", "backup": "Cocina2"})
+    assert default.failover_on == DEFAULT_FAILOVER_ON
+    assert compile_printer_spec("Cocina", {"driver": "Dummy"}).backup is None
+
+
+@pytest.mark.parametrize("section", [
+    {"driver": "Dummy", "backup": "Cocina"},
+    {"driver": "Dummy", "backup": "Cocina2", "failover_on": "humo"},
+])
+def test_invalid_backup_config(section):
+    with pytest.raises(PrinterSpecError):
+        compile_printer_spec("Cocina", section)
+
+
+class FakeSpecs:
+    """printer_specs de prueba: secciones ya compiladas por nombre."""
+
+    def __init__(self, sections):
+        self.specs = {name: compile_printer_spec(name, section) for name, section in sections.items()}
+
+    def get(self, printer_name):
+        return self.specs[printer_name]
+
+
+@pytest.fixture
+def failover(monkeypatch, tmp_path):
+    """
+    Configura Cocina (con respaldo Cocina2) sobre archivos de tmp_path con su
+    propio planificador, breakers y monitor de estado. Devuelve la función que
+    encola un ticket para Cocina.
+    """
+    monkeypatch.setattr(handler_module, "publish_error", lambda **kwargs: None)
+    monkeypatch.setattr(printer_error_detector, "publish_error", lambda **kwargs: None)
+    schedulers = []
+
+    def configure(cocina=None, cocina2=None):
+        sections = {
+            "Cocina": dict({"driver": "File", "devfile": str(tmp_path / "cocina.bin"), "backup": "Cocina2"},
+                           **(cocina or {})),
+            "Cocina2": dict({"driver": "File", "devfile": str(tmp_path / "cocina2.bin")}, **(cocina2 or {})),
+        }
+        specs = FakeSpecs(sections)
+        monkeypatch.setattr(handler_module, "printer_specs", specs)
+        monkeypatch.setattr(handler_module, "circuit_breakers", CircuitBreakerRegistry(failure_threshold=1))
+        monkeypatch.setattr(handler_module, "printer_health", PrinterHealthMonitor(specs, interval=0))
+        scheduler = PrintScheduler(handler_module.process_print_job, max_workers=2, prepare_workers=0,
+                                   concurrency_for=handler_module.printer_concurrency)
+        schedulers.append(scheduler)
+        monkeypatch.setattr(handler_module, "print_scheduler", scheduler)
+
+        def submit(ticket=None, deadline=None):
+            job = PrintJob("Cocina", dict(ticket or {"printTexto": {"texto": "hola\n"}}, printerName="Cocina"),
+                           deadline=deadline)
+            scheduler.submit(job)
+            return job
+        return submit
+
+    yield configure
+    for scheduler in schedulers:
+        scheduler.stop(timeout=0.5)
+
+
+def lane_count(name, counter):
+    """Contador de la cola de una impresora, una vez que el worker lo actualizó."""
+    deadline = time.time() + TIMEOUT
+    while time.time() < deadline:
+        lane = handler_module.print_scheduler.lanes_status().get(name)
+        if lane and lane[counter]:
+            break
+        time.sleep(0.02)
+    return handler_module.print_scheduler.lanes_status().get(name, {}).get(counter)
+
+
+def unreachable(tmp_path):
+    return {"devfile": str(tmp_path / "no-existe" / "impresora.bin")}
+
+
+def test_health_problem_goes_to_backup(failover, tmp_path, monkeypatch):
+    submit = failover()
+    monkeypatch.setattr(handler_module.printer_health, "problem",
+                        lambda name: "paper_out" if name == "Cocina" else None)
+
+    result = submit().future.result(TIMEOUT)
+    assert result["success"]
+    assert result["result"]["rerouted"] == {"from": "Cocina", "to": "Cocina2", "reason": "paper_out"}
+    assert b"hola" in (tmp_path / "cocina2.bin").read_bytes()
+    assert not (tmp_path / "cocina.bin").exists()
+    # el desvío pasa por la cola de la impresora de respaldo
+    assert lane_count("Cocina2", "processed") == 1
+
+
+def test_open_breaker_goes_to_backup(failover, tmp_path):
+    submit = failover()
+    handler_module.circuit_breakers.get("Cocina").record_failure(OSError("sin conexión"))
+
+    result = submit().future.result(TIMEOUT)
+    assert result["success"]
+    assert result["result"]["rerouted"]["reason"] == "offline"
+    assert b"hola" in (tmp_path / "cocina2.bin").read_bytes()
+
+
+@pytest.mark.parametrize("backup_columns,renders", [(None, ["Cocina"]), ("32", ["Cocina", "Cocina2"])])
+def test_backup_renders_only_for_another_format(failover, tmp_path, monkeypatch, backup_columns, renders):
+    submit = failover(cocina=unreachable(tmp_path), cocina2={"columns": backup_columns} if backup_columns else None)
+    rendered_for = []
+    render_ticket = handler_module.render_ticket
+
+    def recording_render(spec, actions):
+        rendered_for.append(spec.name)
+        return render_ticket(spec, actions)
+    monkeypatch.setattr(handler_module, "render_ticket", recording_render)
+
+    result = submit().future.result(TIMEOUT)
+    assert result["success"]
+    assert result["result"]["rerouted"] == {"from": "Cocina", "to": "Cocina2", "reason": "offline"}
+    assert rendered_for == renders
+    assert b"hola" in (tmp_path / "cocina2.bin").read_bytes()
+
+
+def test_backup_failure_fails_the_job(failover, tmp_path):
+    submit = failover(cocina=unreachable(tmp_path), cocina2=unreachable(tmp_path))
+
+    result = submit().future.result(TIMEOUT)
+    assert not result["success"]
+    assert "respaldo 'Cocina2'" in result["error"]
+    assert lane_count("Cocina2", "failed") == 1
+
+
+def test_backup_failure_raises_failover_error(failover, tmp_path):
+    failover(cocina2=unreachable(tmp_path))
+    spec = handler_module.printer_specs.get("Cocina")
+    with pytest.raises(FailoverError) as info:
+        handler_module.run_failover(spec, {"printTexto": {"texto": "hola\n"}}, None, "paper_out", "sin papel")
+    assert "respaldo 'Cocina2'" in str(info.value)
+
+    # con el circuito de la de respaldo abierto ni se intenta
+    handler_module.circuit_breakers.get("Cocina2").record_failure(OSError("sin conexión"))
+    with pytest.raises(FailoverError):
+        handler_module.run_failover(spec, {"printTexto": {"texto": "hola\n"}}, None, "paper_out", "sin papel",
+                                    PrintJob("Cocina", {}))
+    assert "Cocina2" not in handler_module.print_scheduler.lanes_status()
+
+
+@pytest.mark.parametrize("dropped", ["cancelled", "expired"])
+def test_dropped_job_is_not_rerouted(failover, tmp_path, dropped):
+    failover()
+    spec = handler_module.printer_specs.get("Cocina")
+    job = PrintJob("Cocina", {}, deadline=time.time() - 1 if dropped == "expired" else None)
+    job.cancelled = dropped == "cancelled"
+    with pytest.raises(handler_module.JobDroppedError):
+        handler_module.run_failover(spec, {"printTexto": {"texto": "hola\n"}}, None, "offline", "caída", job)
+    assert not (tmp_path / "cocina2.bin").exists()
+    assert "Cocina2" not in handler_module.print_scheduler.lanes_status()
+
+
+def test_rerouted_job_is_not_rerouted_again(failover, tmp_path):
+    submit = failover(cocina=unreachable(tmp_path), cocina2=dict(unreachable(tmp_path), backup="Cocina"))
+
+    result = submit().future.result(TIMEOUT)
+    assert not result["success"]
+    # Cocina2 también tiene respaldo (Cocina), pero un desvío no se vuelve a desviar
+    assert lane_count("Cocina", "processed") == 1
+    assert lane_count("Cocina2", "failed") == 1
@@ -0,0 +1,127 @@
+from concurrent.futures import Future
+
+import pytest
+
+from fiscalberry.common.printer_groups import PrinterGroupDispatcher
+from fiscalberry.common.printer_spec import PrinterSpecError
+
+
+class Spec:
+    def __init__(self, name, driver_name="Network", members=()):
+        self.name = name
+        self.driver_name = driver_name
+        self.members = members
+
+
+class Specs:
+    def __init__(self, *specs):
+        self.specs = {spec.name: spec for spec in specs}
+
+    def get(self, name):
+        if name not in self.specs:
+            raise PrinterSpecError(f"Impresora '{name}' no configurada")
+        return self.specs[name]
+
+
+class Job:
+    def __init__(self):
+        self.future = Future()
+        self.transmit_started = None
+        self.transmit_finished = None
+
+
+GROUP = Spec("Mostrador", "Group", ("Caja1", "Caja2", "Caja3"))
+
+
+@pytest.fixture
+def printers():
+    """Carga y disponibilidad de cada impresora, modificables desde el test."""
+    return {"load": {"Caja1": 0, "Caja2": 0, "Caja3": 0}, "down": set()}
+
+
+@pytest.fixture
+def dispatcher(printers):
+    specs = Specs(GROUP, Spec("Caja1"), Spec("Caja2"), Spec("Caja3"))
+    return PrinterGroupDispatcher(specs, load=lambda name: printers["load"][name],
+                                  available=lambda name: name not in printers["down"])
+
+
+def test_least_loaded_member(dispatcher, printers):
+    printers["load"].update(Caja1=3, Caja2=1, Caja3=2)
+    assert dispatcher.select(GROUP) == "Caja2"
+
+
+def test_round_robin_on_equal_load(dispatcher):
+    assert [dispatcher.select(GROUP) for _ in range(3)] == ["Caja1", "Caja2", "Caja3"]
+
+
+def test_unavailable_members_are_skipped(dispatcher, printers):
+    printers["down"].update({"Caja1", "Caja2"})
+    assert dispatcher.select(GROUP) == "Caja3"
+    # si todas están caídas se elige igual
+    printers["down"].add("Caja3")
+    assert dispatcher.select(GROUP) in GROUP.members
+
+
+def test_order_key_sticks_while_pending(dispatcher, printers):
+    first_job, second_job = Job(), Job()
+    first = dispatcher.select(GROUP, order_key="pedido-7")
+    dispatcher.track(GROUP.name, first, first_job, order_key="pedido-7")
+    printers["load"][first] = 5
+    second = dispatcher.select(GROUP, order_key="pedido-7")
+    dispatcher.track(GROUP.name, second, second_job, order_key="pedido-7")
+    assert second == first
+    # otra clave no queda atada
+    assert dispatcher.select(GROUP, order_key="pedido-8") != first
+
+    first_job.future.set_result({"success": True})
+    assert dispatcher.select(GROUP, order_key="pedido-7") == first
+    dispatcher.release(GROUP.name, first, order_key="pedido-7")
+    second_job.future.set_result({"success": True})
+    # sin trabajos pendientes con la clave, vuelve a la menos cargada
+    assert dispatcher.select(GROUP, order_key="pedido-7") != first
+
+
+def test_release_undoes_select(dispatcher):
+    member = dispatcher.select(GROUP, order_key="pedido-1")
+    dispatcher.release(GROUP.name, member, order_key="pedido-1")
+    status = dispatcher.status(GROUP.name)[member]
+    assert status["dispatched"] == 0 and status["outstanding"] == 0
+    assert dispatcher._ordered == {}
+
+
+def test_stats_and_latency(dispatcher):
+    ok, failed = Job(), Job()
+    member = "Caja1"
+    dispatcher.track(GROUP.name, member, ok)
+    ok.transmit_started, ok.transmit_finished = 10.0, 10.5
+    ok.future.set_result({"success": True})
+    dispatcher.track(GROUP.name, member, failed)
+    failed.future.set_result({"success": False})
+
+    status = dispatcher.status(GROUP.name)[member]
+    assert status["completed"] == 1 and status["failed"] == 1
+    assert status["latency_ms"] == 500.0
+
+
+def test_faster_member_gets_more_work(dispatcher, printers):
+    for member, seconds in (("Caja1", 2.0), ("Caja2", 0.2), ("Caja3", 2.0)):
+        job = Job()
+        dispatcher.track(GROUP.name, member, job)
+        job.transmit_started, job.transmit_finished = 0.0, seconds
+        job.future.set_result({"success": True})
+    printers["load"].update(Caja1=0, Caja2=3, Caja3=0)
+    # (3 + 1) x 0.2 s < (0 + 1) x 2 s
+    assert dispatcher.select(GROUP) == "Caja2"
+
+
+def test_invalid_members_are_skipped():
+    specs = Specs(Spec("Mostrador", "Group", ("Caja1", "Otro", "Falta")), Spec("Caja1"),
+                  Spec("Otro", "Group", ("Caja1",)))
+    dispatcher = PrinterGroupDispatcher(specs, load=lambda name: 0, available=lambda name: True)
+    group = specs.get("Mostrador")
+    assert dispatcher.members(group) == ["Caja1"]
+
+    empty = Spec("Vacio", "Group", ("Falta",))
+    with pytest.raises(PrinterSpecError):
+        dispatcher.select(empty)
@@ -0,0 +1,117 @@
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from fiscalberry.common.printer_health import (
+    OFFLINE, ONLINE, UNKNOWN, PrinterHealthMonitor, probe_printer,
+)
+
+
+def make_spec(name, driver_name, **ops):
+    return SimpleNamespace(name=name, driver_name=driver_name, driver_ops=ops, create_driver=None)
+
+
+class FakeSpecs:
+    """Registro de impresoras de prueba."""
+
+    def __init__(self, *specs):
+        self.specs = {spec.name: spec for spec in specs}
+
+    def get(self, name):
+        return self.specs[name]
+
+    def all(self):
+        return dict(self.specs)
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def monitor_factory():
+    def factory(*specs, interval=30.0):
+        return PrinterHealthMonitor(FakeSpecs(*specs), interval=interval, probe_timeout=0.5)
+    return factory
+
+
+def test_probe_network_closed_port():
+    health = probe_printer(make_spec("Cocina", "Network", host="127.0.0.1", port=closed_port()), timeout=0.5)
+    assert health.status == OFFLINE and health.error
+
+
+def test_probe_network_listening():
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        spec = make_spec("Cocina", "Network", host="127.0.0.1", port=server.getsockname()[1])
+        assert probe_printer(spec, timeout=0.5).status == ONLINE
+
+
+def test_probe_devfile(tmp_path):
+    missing = probe_printer(make_spec("Barra", "File", devfile="/dev/fiscalberry-test-lp0"))
+    assert missing.status == OFFLINE and "no existe" in missing.error
+    assert probe_printer(make_spec("Barra", "Serial", devfile="/dev/null")).status == ONLINE
+
+
+def test_probe_regular_file(tmp_path):
+    # un archivo común se crea al imprimir: alcanza con que exista el directorio
+    assert probe_printer(make_spec("Log", "File", devfile=str(tmp_path / "ticket.bin"))).status == ONLINE
+    assert probe_printer(make_spec("Log", "File", devfile=str(tmp_path / "no" / "ticket.bin"))).status == OFFLINE
+
+
+def test_probe_without_cheap_check():
+    assert probe_printer(make_spec("Caja", "Win32Raw", printer_name="Caja")).status == UNKNOWN
+
+
+def test_is_down_needs_two_failed_probes(monitor_factory):
+    monitor = monitor_factory(make_spec("Cocina", "Network", host="127.0.0.1", port=closed_port()))
+    monitor.check("Cocina")
+    # una verificación fallida puede ser un corte momentáneo
+    assert monitor.get("Cocina").status == OFFLINE
+    assert not monitor.is_down("Cocina")
+    monitor.check("Cocina")
+    assert monitor.get("Cocina").failures == 2
+    assert monitor.is_down("Cocina")
+
+
+def test_job_failure_marks_down_and_success_restores(monitor_factory):
+    monitor = monitor_factory()
+    monitor.report("Cocina", False, "Connection refused")
+    assert monitor.is_down("Cocina")
+    monitor.report("Cocina", True)
+    assert monitor.get("Cocina").status == ONLINE
+    assert not monitor.is_down("Cocina")
+
+
+def test_is_down_window(monitor_factory):
+    monitor = monitor_factory(interval=10.0)
+    monitor.report("Cocina", False, "Connection refused")
+    # el resultado vale 2 * interval: después no se sabe si sigue caída
+    monitor.get("Cocina").checked_at = time.time() - 19
+    assert monitor.is_down("Cocina")
+    monitor.get("Cocina").checked_at = time.time() - 21
+    assert not monitor.is_down("Cocina")
+
+
+def test_listeners_fire_on_status_change_only(monitor_factory):
+    monitor = monitor_factory()
+    changes = []
+    monitor.add_listener(lambda name, health: changes.append((name, health.status)))
+    monitor.report("Cocina", True)
+    monitor.report("Cocina", True)
+    monitor.report("Cocina", False, "timeout")
+    monitor.report("Cocina", False, "timeout")
+    monitor.report("Cocina", True)
+    assert changes == [("Cocina", ONLINE), ("Cocina", OFFLINE), ("Cocina", ONLINE)]
+
+
+def test_check_keeps_changed_at(monitor_factory):
+    monitor = monitor_factory(make_spec("Caja", "Dummy"))
+    first = monitor.check("Caja")
+    second = monitor.check("Caja")
+    assert second.status == ONLINE and second.changed_at == first.changed_at
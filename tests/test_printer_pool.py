@@ -0,0 +1,138 @@
+import socket
+import time
+
+import pytest
+
+from fiscalberry.common.printer_pool import PrinterConnectionPool, connection_key, is_connection_alive
+
+
+class FakeDriver:
+    def __init__(self, device=None):
+        self._device = device
+        self.closed = False
+        self.written = []
+
+    def _raw(self, data):
+        self.written.append(data)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def factory():
+    created = []
+
+    def create():
+        driver = FakeDriver()
+        created.append(driver)
+        return driver
+
+    create.created = created
+    return create
+
+
+def test_connection_is_reused(factory):
+    pool = PrinterConnectionPool()
+    with pool.connection("Network:a", factory) as driver:
+        driver._raw(b"uno")
+    with pool.connection("Network:a", factory) as driver:
+        driver._raw(b"dos")
+
+    assert len(factory.created) == 1
+    assert factory.created[0].written == [b"uno", b"dos"]
+    assert pool.stats()["reused"] == 1
+
+
+def test_closing_the_leased_driver_keeps_the_connection(factory):
+    pool = PrinterConnectionPool()
+    with pool.connection("Network:a", factory) as driver:
+        # EscposIO cierra la impresora al salir de su with
+        driver.close()
+    assert not factory.created[0].closed
+    with pool.connection("Network:a", factory):
+        pass
+    assert len(factory.created) == 1
+
+
+def test_failed_block_discards_the_connection(factory):
+    pool = PrinterConnectionPool()
+    with pytest.raises(OSError):
+        with pool.connection("Network:a", factory):
+            raise OSError("broken pipe")
+    assert factory.created[0].closed
+
+    with pool.connection("Network:a", factory):
+        pass
+    assert len(factory.created) == 2
+
+
+def test_busy_connection_opens_another(factory):
+    pool = PrinterConnectionPool()
+    with pool.connection("Network:a", factory):
+        with pool.connection("Network:a", factory):
+            pass
+    assert len(factory.created) == 2
+    assert pool.stats()["idle"] == 2
+
+
+def test_expired_connection_is_reopened(factory):
+    pool = PrinterConnectionPool(idle_timeout=0.05)
+    with pool.connection("Network:a", factory):
+        pass
+    time.sleep(0.1)
+    with pool.connection("Network:a", factory):
+        pass
+    assert len(factory.created) == 2
+    assert factory.created[0].closed
+
+
+def test_reaper_closes_idle_connections(factory):
+    pool = PrinterConnectionPool(idle_timeout=0.05, reap_interval=0.05)
+    with pool.connection("Network:a", factory):
+        pass
+    deadline = time.time() + 2
+    while pool.stats()["idle"] and time.time() < deadline:
+        time.sleep(0.02)
+    assert pool.stats()["idle"] == 0
+    assert pool.stats()["expired"] == 1
+    assert factory.created[0].closed
+
+
+def test_peer_closed_socket_is_detected():
+    local, remote = socket.socketpair()
+    try:
+        assert is_connection_alive(FakeDriver(local))
+        remote.close()
+        assert not is_connection_alive(FakeDriver(local))
+    finally:
+        local.close()
+
+
+def test_dead_connection_is_not_reused():
+    pool = PrinterConnectionPool()
+    pairs = []
+
+    def create():
+        local, remote = socket.socketpair()
+        pairs.append((local, remote))
+        return FakeDriver(local)
+
+    try:
+        with pool.connection("Network:a", create):
+            pass
+        # la impresora cerró la conexión mientras estaba libre en el pool
+        pairs[0][1].close()
+        with pool.connection("Network:a", create) as driver:
+            assert driver._device is pairs[1][0]
+        assert pool.stats()["discarded"] == 1
+    finally:
+        for local, remote in pairs:
+            local.close()
+            remote.close()
+
+
+def test_connection_key_ignores_option_order():
+    assert connection_key("Network", {"host": "10.0.0.5", "port": 9100}) == \
+        connection_key("Network", {"port": 9100, "host": "10.0.0.5"})
+    assert connection_key("Network", {"host": "10.0.0.5"}) != connection_key("Network", {"host": "10.0.0.6"})
@@ -0,0 +1,116 @@
+import configparser
+
+import pytest
+
+from fiscalberry.common import printer_spec
+from fiscalberry.common.Configberry import ConfigSnapshot
+from fiscalberry.common.printer_spec import PrinterSpecError, PrinterSpecRegistry, compile_printer_spec
+
+
+@pytest.fixture(autouse=True)
+def no_publish(monkeypatch):
+    monkeypatch.setattr(printer_spec, "publish_error", lambda **kwargs: None)
+
+
+def snapshot(sections):
+    parser = configparser.ConfigParser()
+    parser.optionxform = str
+    parser.read_dict(sections)
+    return ConfigSnapshot(parser)
+
+
+class FakeConfig:
+    """Configberry mínimo: un snapshot que el test reemplaza."""
+
+    def __init__(self, sections):
+        self.current = snapshot(sections)
+
+    def snapshot(self):
+        return self.current
+
+    def get_config_for_printer(self, printer_name):
+        if isinstance(printer_name, dict):
+            return dict(printer_name)
+        return dict(self.current.section(printer_name))
+
+
+def test_usb_options_are_converted():
+    spec = compile_printer_spec("Caja", {"driver": "usb", "idVendor": "0x04b8", "idProduct": "0e15",
+                                         "timeout": "5", "columns": "42"})
+    assert spec.driver_name == "Usb"
+    assert spec.driver_ops["idVendor"] == 0x04B8
+    assert spec.driver_ops["idProduct"] == 0x0E15
+    assert spec.driver_ops["timeout"] == 5
+    # columns es de fiscalberry, no del driver
+    assert spec.columns == 42
+    assert "columns" not in spec.driver_ops
+
+
+def test_network_and_serial_options_are_converted():
+    network = compile_printer_spec("Cocina", {"driver": "Network", "host": "10.0.0.5", "port": "9100",
+                                              "timeout": "2.5", "concurrency": "2"})
+    assert network.driver_ops == {"host": "10.0.0.5", "port": 9100, "timeout": 2.5}
+    assert network.concurrency == 2
+
+    serial = compile_printer_spec("Barra", {"driver": "Serial", "devfile": "/dev/ttyS0",
+                                            "baudrate": "19200", "dsrdtr": "true", "xonxoff": "no"})
+    assert serial.driver_ops["baudrate"] == 19200
+    assert serial.driver_ops["dsrdtr"] is True
+    assert serial.driver_ops["xonxoff"] is False
+
+
+def test_driver_ops_are_read_only():
+    spec = compile_printer_spec("Cocina", {"driver": "Dummy"})
+    with pytest.raises(TypeError):
+        spec.driver_ops["host"] = "x"
+
+
+@pytest.mark.parametrize("section,message", [
+    ({"driver": "Laser"}, "Invalid driver"),
+    ({"driver": "Network"}, "host"),
+    ({"driver": "Usb", "idVendor": "zz", "idProduct": "1"}, "idVendor"),
+    ({"driver": "Dummy", "columns": "ancho"}, "valor inválido"),
+])
+def test_invalid_sections(section, message):
+    with pytest.raises(PrinterSpecError, match=message):
+        compile_printer_spec("Mala", section)
+
+
+def test_registry_compiles_configured_printers():
+    registry = PrinterSpecRegistry(FakeConfig({
+        "SERVIDOR": {"uuid": "abc"},
+        "Cocina": {"driver": "Dummy", "columns": "32"},
+        "Mala": {"driver": "Network"},
+    }))
+    assert list(registry.all()) == ["Cocina"]
+    assert "Mala" in registry.errors()
+    assert registry.get("Cocina").columns == 32
+    with pytest.raises(PrinterSpecError):
+        registry.get("Mala")
+    with pytest.raises(KeyError):
+        registry.get("Inexistente")
+
+
+def test_registry_recompiles_when_snapshot_changes():
+    config = FakeConfig({"Cocina": {"driver": "Dummy", "columns": "32"}})
+    registry = PrinterSpecRegistry(config)
+    first = registry.get("Cocina")
+    # mismo snapshot: misma spec, sin recompilar
+    assert registry.get("Cocina") is first
+
+    config.current = snapshot({"Cocina": {"driver": "Dummy", "columns": "48"}, "Barra": {"driver": "Dummy"}})
+    assert registry.get("Cocina").columns == 48
+    assert set(registry.all()) == {"Cocina", "Barra"}
+
+
+def test_adhoc_printer_names_are_cached():
+    config = FakeConfig({})
+    registry = PrinterSpecRegistry(config)
+    name = {"driver": "Network", "host": "10.0.0.9"}
+    spec = registry.get(name)
+    assert spec.driver_name == "Network"
+    assert registry.get({"host": "10.0.0.9", "driver": "Network"}) is spec
+
+    # un cambio de configuración descarta las compiladas al vuelo
+    config.current = snapshot({"Cocina": {"driver": "Dummy"}})
+    assert registry.get(name) is not spec
@@ -0,0 +1,62 @@
+import pytest
+from escpos.escpos import EscposIO
+from escpos.printer import Dummy
+
+from fiscalberry.common import qr_codes
+from fiscalberry.common.block_cache import RenderedBlockCache
+from fiscalberry.common.qr_codes import NATIVE, RASTER, print_qr, qr_strategy
+
+URL = "https://www.afip.gob.ar/fe/qr/?p=eyJ2ZXIiOjF9"
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RenderedBlockCache(max_entries=2)
+    monkeypatch.setattr(qr_codes, "_qr_cache_instance", cache)
+    return cache
+
+
+def write_qr(printer, content, **kwargs):
+    print_qr(EscposIO(printer, autocut=False, autoclose=False), content, **kwargs)
+    return printer.output
+
+
+def test_strategy_by_profile():
+    # el perfil genérico anuncia qrCode, pero muchas impresoras sin perfil no implementan GS ( k
+    assert qr_strategy(Dummy()) == RASTER
+    assert qr_strategy(Dummy(profile="TM-T88V")) == NATIVE
+
+
+def test_native_qr_sends_gs_k(cache):
+    data = write_qr(Dummy(profile="TM-T88V"), URL)
+    assert b"\x1d(k" in data
+    assert URL.encode() in data
+    assert len(cache) == 0
+
+
+def test_raster_qr_is_cached(cache):
+    direct = Dummy()
+    EscposIO(direct, autocut=False, autoclose=False).printer.qr(URL)
+
+    first = write_qr(Dummy(), URL)
+    second = write_qr(Dummy(), URL)
+    assert first == second == direct.output
+    assert cache.status()["hits"] == 1 and cache.status()["misses"] == 1
+
+
+def test_raster_cache_is_bounded(cache):
+    for n in range(3):
+        write_qr(Dummy(), f"{URL}{n}")
+    assert len(cache) == 2
+    # el más viejo salió de la cache
+    write_qr(Dummy(), f"{URL}0")
+    assert cache.status()["misses"] == 4
+
+
+def test_raster_key_includes_size(cache):
+    assert write_qr(Dummy(), URL, size=3) != write_qr(Dummy(), URL, size=5)
+    assert len(cache) == 2
+
+
+def test_empty_content_prints_nothing(cache):
+    assert write_qr(Dummy(), "") == b""
@@ -0,0 +1,71 @@
+import pytest
+
+from fiscalberry.common.station_router import RoutingError, StationRouter
+
+TABLE = {
+    "bebidas": "Barra",
+    "Postres": "Cafeteria",
+    "parrilla": "Parrilla, Expo",
+    "default": "Cocina",
+}
+
+
+def comanda(**items):
+    base = {"id": "42", "observacion": "mesa 4"}
+    base.update(items)
+    return base
+
+
+def test_split_by_category_and_tags():
+    router = StationRouter(TABLE)
+    split = router.split(comanda(
+        entradas=[{"nombre": "Provoleta", "tags": ["PARRILLA"]}],
+        platos=[
+            {"nombre": "Agua", "categoria": "Bebidas"},
+            {"nombre": "Flan", "categoria": "sin tabla", "tags": "dulce, postres"},
+            {"nombre": "Milanesa"},
+        ],
+    ))
+
+    assert list(split) == ["Parrilla", "Expo", "Barra", "Cafeteria", "Cocina"]
+    assert [item["nombre"] for item in split["Parrilla"]["entradas"]] == ["Provoleta"]
+    assert split["Expo"]["entradas"] == split["Parrilla"]["entradas"]
+    assert [item["nombre"] for item in split["Barra"]["platos"]] == ["Agua"]
+    assert [item["nombre"] for item in split["Cafeteria"]["platos"]] == ["Flan"]
+    assert [item["nombre"] for item in split["Cocina"]["platos"]] == ["Milanesa"]
+    # los datos generales van en todas, las listas solo si tienen ítems
+    for sub in split.values():
+        assert sub["id"] == "42" and sub["observacion"] == "mesa 4"
+    assert "platos" not in split["Parrilla"]
+
+
+def test_category_wins_over_tags():
+    router = StationRouter(TABLE)
+    split = router.split(comanda(platos=[{"nombre": "Café", "categoria": "bebidas", "tags": ["postres"]}]))
+    assert list(split) == ["Barra"]
+
+
+def test_fallback_printer_name_wins_over_default():
+    router = StationRouter(TABLE)
+    split = router.split(comanda(platos=[{"nombre": "Milanesa"}]), fallback="Expo")
+    assert list(split) == ["Expo"]
+
+
+def test_unrouted_items_raise():
+    router = StationRouter({"bebidas": "Barra"})
+    with pytest.raises(RoutingError) as info:
+        router.split(comanda(platos=[{"nombre": "Agua", "categoria": "bebidas"}, {"nombre": "Milanesa"}]))
+    assert "Milanesa" in str(info.value)
+
+
+def test_comanda_without_items_goes_to_default():
+    router = StationRouter(TABLE)
+    assert list(router.split(comanda())) == ["Cocina"]
+    assert list(StationRouter({}).split(comanda())) == []
+
+
+def test_split_does_not_modify_comanda():
+    router = StationRouter(TABLE)
+    original = comanda(platos=[{"nombre": "Agua", "categoria": "bebidas"}])
+    router.split(original)
+    assert original == comanda(platos=[{"nombre": "Agua", "categoria": "bebidas"}])